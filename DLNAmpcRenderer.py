@@ -3,26 +3,35 @@
 # This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
 
 import threading
-import msvcrt
 import ctypes, ctypes.wintypes
 import os
 from functools import partial
+from collections import deque, OrderedDict
+import abc
+import heapq
+import json
+import re
 import socket
 import socketserver
 import selectors
+import errno
 import urllib.parse, urllib.request, urllib.error
 import ssl
 import struct
+import zlib
 import email.utils
 from xml.dom import minidom
 import time
 import uuid
 import subprocess
+import shlex
 import html
 from io import BytesIO
 import shutil
+import tempfile
 import locale
 import argparse
+import concurrent.futures
 
 
 NAME = 'DLNAmpcRenderer'
@@ -43,6 +52,17 @@ FR_STRINGS = {
   'parser_subtitles': 'active la recherche systématique de sous-titres [désactivé par défaut]',
   'parser_intermediate': 'intermédie les serveurs rejetant les requêtes partielles [désactivé par défaut, nécessite hormis pour WMPDMC la vérification d\'adresse]',
   'parser_verbosity': 'niveau de verbosité de 0 à 2 [0 par défaut]',
+  'parser_rotation_command': 'commande de rotation des images jpeg par jpegtrans, lisant l\'image sur son entrée standard et écrivant l\'image tournée sur sa sortie standard, {rot} étant remplacé par l\'angle [jpegtran.bat par défaut]',
+  'parser_rotation_cache': 'taille en Mo du cache en mémoire des images tournées par jpegtrans [64 par défaut]',
+  'parser_rotation_cache_disk': 'taille en Mo du cache sur disque des images tournées par jpegtrans, recevant les images évincées du cache en mémoire [0 par défaut]',
+  'parser_rotation_spill': 'taille en Mo au-delà de laquelle une image tournée par jpegtrans est conservée dans un fichier temporaire plutôt qu\'en mémoire, compté dans le cache sur disque [8 par défaut, 0 pour désactiver]',
+  'parser_rotation_pool': 'nombre maximal de rotations d\'images par jpegtrans menées en parallèle, hors de la file de traitement des actions [2 par défaut]',
+  'parser_proxy_cache': 'taille en Mo du cache disque, dans le dossier temporaire, par contenu intermédié, permettant les déplacements dans la lecture [0 par défaut, désactivé]',
+  'parser_proxy_cache_total': 'taille totale en Mo du cache disque des contenus intermédiés, les moins récemment utilisés étant supprimés [2048 par défaut]',
+  'parser_proxy_readahead': 'taille en Mo du tampon de lecture anticipée des contenus intermédiés sans cache disque, absorbant les blocages du serveur, 0 pour désactiver [16 par défaut]',
+  'parser_proxy_readahead_time': 'durée en secondes du tampon de lecture anticipée, remplaçant la taille si la longueur et la durée du contenu sont connues [0 par défaut, désactivé]',
+  'parser_prefetch': 'nombre d\'images préchargées et tournées à l\'avance lors d\'un diaporama, déduites des adresses des images précédentes [0 par défaut, désactivé]',
+  'parser_mpv': 'utilise mpv, piloté par son interface IPC JSON, au lieu de mpc-hc [désactivé par défaut, chemin de mpv optionnel]',
   'keyboard_s': 'Appuyez sur "S" ou fermez mpc-hc pour quitter',
   'enabled': 'activé',
   'disabled': 'désactivé',
@@ -73,6 +93,17 @@ EN_STRINGS = {
   'parser_subtitles': 'enable systematic search for subtitles [disabled by default]',
   'parser_intermediate': 'intermediate the servers rejecting partial requests [disabled by default, requires except for WMPDMC the checking of the addresses]',
   'parser_verbosity': 'level of verbosity from 0 to 2 [0 by default]',
+  'parser_rotation_command': 'command of rotation of jpeg images by jpegtrans, reading the image on its standard input and writing the rotated image on its standard output, {rot} being replaced by the angle [jpegtran.bat by default]',
+  'parser_rotation_cache': 'size in MB of the memory cache of the images rotated by jpegtrans [64 by default]',
+  'parser_rotation_cache_disk': 'size in MB of the disk cache of the images rotated by jpegtrans, receiving the images evicted from the memory cache [0 by default]',
+  'parser_rotation_spill': 'size in MB beyond which an image rotated by jpegtrans is kept in a temporary file instead of in memory, counted in the disk cache [8 by default, 0 to disable]',
+  'parser_rotation_pool': 'maximum number of rotations of images by jpegtrans run in parallel, outside of the queue of processing of the actions [2 by default]',
+  'parser_proxy_cache': 'size in MB of the disk cache, in the temporary folder, per intermediated content, allowing seeking in the playback [0 by default, disabled]',
+  'parser_proxy_cache_total': 'total size in MB of the disk cache of the intermediated contents, the least recently used being removed [2048 by default]',
+  'parser_proxy_readahead': 'size in MB of the read-ahead buffer of the intermediated contents without disk cache, absorbing the stalls of the server, 0 to disable [16 by default]',
+  'parser_proxy_readahead_time': 'duration in seconds of the read-ahead buffer, replacing the size if the length and the duration of the content are known [0 by default, disabled]',
+  'parser_prefetch': 'number of images prefetched and rotated ahead during a slideshow, guessed from the addresses of the previous images [0 by default, disabled]',
+  'parser_mpv': 'use mpv, driven through its JSON IPC interface, instead of mpc-hc [disabled by default, optional path of mpv]',
   'keyboard_s': 'Press "S" or close mpc-hc to exit',
   'enabled': 'enabled',
   'disabled': 'disabled',
@@ -137,6 +168,163 @@ def _open_url(url, method=None, timeout=None, test_reject_range=False):
   else:
     return rep
 
+def _parse_ranges(header, length):
+  unit, sep, specs = header.partition('=')
+  if unit.strip().lower() != 'bytes' or not sep:
+    return None
+  ranges = []
+  for spec in specs.split(','):
+    spec = spec.strip()
+    if not spec:
+      continue
+    first, sep, last = spec.partition('-')
+    try:
+      if not sep:
+        return None
+      if not first.strip():
+        suffix = int(last)
+        if suffix < 0:
+          return None
+        if suffix:
+          ranges.append((max(length - suffix, 0), length - 1))
+        continue
+      first = int(first)
+      last = int(last) if last.strip() else None
+    except:
+      return None
+    if first < 0 or (last is not None and last < first):
+      return None
+    if last is None:
+      last = length - 1
+    if first < length:
+      ranges.append((first, min(last, length - 1)))
+  merged = []
+  for first, last in sorted(ranges):
+    if merged and first <= merged[-1][1] + 1:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+    else:
+      merged.append((first, last))
+  return merged
+
+def _read_range(uri, start, length, timeout=None, ranged=True, stream_length=None):
+  if r'://' not in uri:
+    try:
+      with open(uri, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(max(size + start, 0) if start < 0 else start)
+        return f.read(length), size, True
+    except:
+      return None
+  if start != 0 and not ranged:
+    return None
+  header = {'User-Agent': 'Lavf'}
+  if ranged:
+    header['Range'] = ('bytes=%d' % start) if start < 0 else ('bytes=%d-%d' % (start, start + length - 1))
+  rep = None
+  try:
+    rep = urllib.request.urlopen(urllib.request.Request(uri, headers=header), data=None, timeout=timeout)
+    if rep.status == 206:
+      size = rep.getheader('Content-Range', '').rpartition('/')[2]
+    elif start == 0:
+      size = rep.getheader('Content-Length', '')
+      length = stream_length or length
+    else:
+      return None
+    return rep.read(length), (int(size) if size.isdecimal() else None), rep.status == 206
+  except:
+    return None
+  finally:
+    if rep:
+      try:
+        rep.close()
+      except:
+        pass
+
+def _pipe_filter(command, data, timeout=None, env=None, spill=None):
+  try:
+    process = subprocess.Popen(command if os.name == 'nt' else shlex.split(command), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0, env=env, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+  except:
+    return None
+  expired = threading.Event()
+  def kill():
+    expired.set()
+    try:
+      if os.name == 'nt':
+        os.system('taskkill /t /f /pid %s >nul 2>&1' % (process.pid))
+      else:
+        process.kill()
+    except:
+      pass
+  def write():
+    try:
+      mv = memoryview(data)
+      while mv:
+        mv = mv[process.stdin.write(mv[:0x100000]):]
+    except:
+      pass
+    finally:
+      try:
+        process.stdin.close()
+      except:
+        pass
+  timer = None
+  if timeout:
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+  writer = threading.Thread(target=write, daemon=True)
+  writer.start()
+  if spill is not None:
+    spill = max(spill, 0x10000)
+  buf = bytearray(len(data) + 0x10000 if spill is None else min(len(data) + 0x10000, spill))
+  pos = 0
+  size = 0
+  out = None
+  try:
+    while True:
+      if pos == len(buf):
+        if spill is None or len(buf) < spill:
+          buf.extend(bytes(len(buf) if spill is None else min(len(buf), spill - len(buf))))
+        else:
+          if not out:
+            out = tempfile.TemporaryFile(prefix='DLNAmpcRenderer_')
+          out.write(buf)
+          size += pos
+          pos = 0
+      with memoryview(buf)[pos:] as mv:
+        n = process.stdout.readinto(mv)
+      if not n:
+        break
+      pos += n
+    if out:
+      with memoryview(buf)[:pos] as mv:
+        out.write(mv)
+      out.flush()
+      size += pos
+      pos = 0
+  except:
+    pos = size = 0
+  finally:
+    try:
+      process.stdout.close()
+    except:
+      pass
+    writer.join()
+    try:
+      process.wait(timeout)
+    except:
+      kill()
+    if timer:
+      timer.cancel()
+  if expired.is_set() or process.returncode != 0 or not (pos or size):
+    if out:
+      out.close()
+    return None
+  if out:
+    return SpilledImage(out, size)
+  del buf[pos:]
+  return buf
+
 def _XMLGetNodeText(node):
   text = []
   for childNode in node.childNodes:
@@ -144,47 +332,89 @@ def _XMLGetNodeText(node):
       text.append(childNode.data)
   return(''.join(text))
 
-def _jpeg_exif_orientation(image):
+def _jpeg_probe(image, timeout=5, ranged=True, prefix=65536, seek_length=4096, stream_cap=1048576):
   f = None
-  try:
-    if isinstance(image, bytes):
-      f = BytesIO(image)
-    elif isinstance(image, str):
-      if r'://' in image:
-        f = _open_url(image, method='GET')
+  view = memoryview(image) if isinstance(image, (bytes, bytearray, memoryview)) else None
+  cache = [0, b'']
+  def read(offset, length):
+    nonlocal ranged
+    if view is not None:
+      return view[offset:offset + length]
+    if f:
+      f.seek(offset)
+      return memoryview(f.read(length))
+    if offset < cache[0] or offset + length > cache[0] + len(cache[1]):
+      r = _read_range(image, offset, length, timeout, ranged, stream_cap) if (ranged or not offset) else None
+      if r:
+        cache[:] = [offset, r[0]]
+        ranged = ranged and r[2]
+      elif ranged and offset + length <= stream_cap:
+        ranged = False
+        r = _read_range(image, 0, stream_cap, timeout, False)
+        if not r:
+          return memoryview(b'')
+        cache[:] = [0, r[0]]
       else:
+        return memoryview(b'')
+    return memoryview(cache[1])[offset - cache[0]:offset - cache[0] + length]
+  orientation = width = height = None
+  try:
+    if isinstance(image, str):
+      if r'://' not in image:
         f = open(image, 'rb')
-    else:
-      return
-    if f.read(2) != b'\xff\xd8':
-      raise
-    t = b''
-    l = 2
-    while t != b'\xff\xe1':
-      f.read(l - 2)
-      t = f.read(2)
-      if t[:1] != b'\xff' or t == b'\xff\xda':
-        raise
-      l = struct.unpack('!H', f.read(2))[0]
-    if f.read(6) != b'Exif\x00\x00':
-      raise
-    ba = {b'MM': '>', b'II': '<'}.get(f.read(2),'')
-    if ba == '':
-      raise
-    if f.read(2) != (b'\x00\x2a' if ba == '>' else b'\x2a\x00') :
-      raise
-    f.read(struct.unpack(ba + 'I', f.read(4))[0] - 8)
-    ne = struct.unpack(ba + 'H', f.read(2))[0]
-    for i in range(ne):
-      e = f.read(12)
-      if struct.unpack(ba + 'H', e[0:2])[0] == 0x0112:
-        nb = {1: 1, 3: 2, 4: 4}.get(struct.unpack(ba + 'H', e[2:4])[0], 0)
-        if nb == 0 or struct.unpack(ba + 'I', e[4:8])[0] != 1:
-          raise
-        return {1: 'upper-left', 3: 'lower-right', 6: 'upper-right', 8: 'lower-left'}.get(struct.unpack(ba + {1: 'B', 2: 'H', 4: 'I'}[nb], e[8:8+nb])[0], None)
-    return None
+    elif view is None:
+      return None, None, None
+    m = read(0, prefix)
+    base = 0
+    if m[:2] != b'\xff\xd8':
+      return None, None, None
+    pos = 2
+    while True:
+      if pos + 4 > base + len(m):
+        m = read(pos, seek_length)
+        base = pos
+        if len(m) < 4:
+          break
+      p = pos - base
+      if m[p] != 0xff:
+        break
+      t = m[p + 1]
+      if t == 0xff:
+        pos += 1
+        continue
+      if t == 0x01 or 0xd0 <= t <= 0xd8:
+        pos += 2
+        continue
+      if t in (0xd9, 0xda):
+        break
+      l = (m[p + 2] << 8) | m[p + 3]
+      if (t == 0xe1 and orientation is None) or (0xc0 <= t <= 0xcf and t not in (0xc4, 0xc8, 0xcc)):
+        if pos + 2 + l > base + len(m):
+          m = read(pos, 2 + l)
+          base = pos
+          p = 0
+          if len(m) < 2 + l:
+            break
+        if t != 0xe1:
+          height = (m[p + 5] << 8) | m[p + 6]
+          width = (m[p + 7] << 8) | m[p + 8]
+          break
+        e = m[p + 4:p + 2 + l]
+        if e[:6] == b'Exif\x00\x00' and e[6:10] in (b'MM\x00\x2a', b'II\x2a\x00'):
+          bo = 'big' if e[6] == 0x4d else 'little'
+          tiff = e[6:]
+          ifd = int.from_bytes(tiff[4:8], bo)
+          for i in range(int.from_bytes(tiff[ifd:ifd + 2], bo)):
+            en = tiff[ifd + 2 + 12 * i:ifd + 14 + 12 * i]
+            if int.from_bytes(en[0:2], bo) == 0x0112:
+              nb = {1: 1, 3: 2, 4: 4}.get(int.from_bytes(en[2:4], bo), 0)
+              if nb and int.from_bytes(en[4:8], bo) == 1:
+                orientation = {1: 'upper-left', 3: 'lower-right', 6: 'upper-right', 8: 'lower-left'}.get(int.from_bytes(en[8:8 + nb], bo), None)
+              break
+      pos += 2 + l
+    return orientation, width, height
   except:
-    return None
+    return orientation, width, height
   finally:
     if f:
       try:
@@ -192,6 +422,9 @@ def _jpeg_exif_orientation(image):
       except:
         pass
 
+def _jpeg_exif_orientation(image):
+  return _jpeg_probe(image)[0]
+
 
 class HTTPExplodedMessage():
 
@@ -449,6 +682,564 @@ class HTTPMessage():
     return http_message
 
 
+class MediaDurationProbe:
+
+  HeadLength = 65536
+  SeekLength = 4096
+  EntryCost = 64
+  MP3Bitrates = {
+    (3, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (3, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (3, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+  }
+  MP3Samplerates = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+  def __init__(self, budget=262144, timeout=2, total_timeout=4):
+    self.Budget = budget
+    self.Timeout = timeout
+    self.Total_timeout = total_timeout
+    self.Cache = OrderedDict()
+    self.Size = 0
+    self.Lock = threading.Lock()
+    self.Hits = 0
+    self.Misses = 0
+
+  def probe(self, uri, ranged=True, mime=''):
+    with self.Lock:
+      if uri in self.Cache:
+        self.Hits += 1
+        self.Cache.move_to_end(uri)
+        return self.Cache[uri]
+      self.Misses += 1
+    try:
+      duration = self._probe(uri, ranged, mime)
+    except OSError:
+      return None
+    except:
+      duration = None
+    with self.Lock:
+      cost = len(uri) + MediaDurationProbe.EntryCost
+      if uri not in self.Cache and cost <= self.Budget:
+        self.Cache[uri] = duration
+        self.Size += cost
+        while self.Size > self.Budget:
+          self.Size -= len(self.Cache.popitem(last=False)[0]) + MediaDurationProbe.EntryCost
+    return duration
+
+  def _probe(self, uri, ranged, mime):
+    deadline = time.monotonic() + self.Total_timeout
+    def read_range(start, length):
+      if start and not ranged:
+        return b'', None
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        raise OSError
+      rep = _read_range(uri, start, length, min(self.Timeout, remaining), ranged)
+      if not rep:
+        raise OSError
+      return rep[:2]
+    read = lambda start, length: read_range(start, length)[0]
+    data, size = read_range(0, MediaDurationProbe.HeadLength)
+    if data[4:8] == b'ftyp':
+      return self._mp4(data, read)
+    if data[:4] == b'\x1a\x45\xdf\xa3':
+      return self._mkv(data)
+    start = 0
+    if data[:3] == b'ID3' and len(data) >= 10:
+      start = 10 + ((data[6] & 0x7f) << 21 | (data[7] & 0x7f) << 14 | (data[8] & 0x7f) << 7 | (data[9] & 0x7f)) + (10 if data[5] & 0x10 else 0)
+      data = data[start:] if start + MediaDurationProbe.SeekLength <= len(data) else read(start, MediaDurationProbe.SeekLength)
+    if data[:4] == b'fLaC':
+      return self._flac(data)
+    cbr = start > 0 or mime.lower() == 'audio/mpeg' or (not mime and uri.lower().endswith('.mp3'))
+    return self._mp3(data, start, size, cbr)
+
+  def _mp4(self, data, read):
+    pos = 0
+    base = 0
+    for i in range(64):
+      if pos + 16 > base + len(data):
+        data = read(pos, MediaDurationProbe.SeekLength)
+        base = pos
+      p = pos - base
+      if p + 8 > len(data):
+        return None
+      size, typ = struct.unpack_from('>I4s', data, p)
+      hl = 8
+      if size == 1:
+        size = struct.unpack_from('>Q', data, p + 8)[0]
+        hl = 16
+      if typ == b'moov':
+        if p + hl + 128 > len(data):
+          data = read(pos, MediaDurationProbe.SeekLength)
+          base = pos
+          p = 0
+        q = p + hl
+        while q + 8 <= min(len(data), p + size):
+          csize, ctyp = struct.unpack_from('>I4s', data, q)
+          if ctyp == b'mvhd':
+            if data[q + 8] == 1:
+              timescale, duration = struct.unpack_from('>IQ', data, q + 28)
+              unknown = duration == 0xffffffffffffffff
+            else:
+              timescale, duration = struct.unpack_from('>II', data, q + 20)
+              unknown = duration == 0xffffffff
+            return duration / timescale if timescale and not unknown else None
+          if csize < 8:
+            return None
+          q += csize
+        return None
+      if size < hl:
+        return None
+      pos += size
+    return None
+
+  @staticmethod
+  def _ebml_vint(data, p, mask):
+    b = data[p]
+    l = 9 - b.bit_length()
+    if l > 8:
+      raise ValueError
+    value = (b & (0xff >> l)) if mask else b
+    for i in range(1, l):
+      value = (value << 8) | data[p + i]
+    return value, p + l
+
+  def _mkv(self, data):
+    p = 0
+    info_end = None
+    scale = 1000000
+    duration = None
+    while p < len(data):
+      eid, p = self._ebml_vint(data, p, False)
+      size, p = self._ebml_vint(data, p, True)
+      if eid == 0x18538067:
+        continue
+      if eid == 0x1549a966:
+        info_end = p + size
+        continue
+      if eid == 0x2ad7b1:
+        scale = int.from_bytes(data[p:p + size], 'big')
+      elif eid == 0x4489:
+        duration = struct.unpack('>f' if size == 4 else '>d', data[p:p + size])[0]
+      elif eid == 0x1f43b675:
+        break
+      p += size
+      if info_end is not None and p >= info_end:
+        break
+    return duration * scale / 1000000000 if duration else None
+
+  def _flac(self, data):
+    if data[4] & 0x7f != 0:
+      return None
+    v = int.from_bytes(data[18:26], 'big')
+    samplerate = v >> 44
+    samples = v & 0xfffffffff
+    return samples / samplerate if samplerate and samples else None
+
+  def _mp3(self, data, start, size, cbr):
+    for p in range(min(len(data) - 4, MediaDurationProbe.SeekLength)):
+      if data[p] != 0xff or data[p + 1] & 0xe0 != 0xe0:
+        continue
+      h = struct.unpack_from('>I', data, p)[0]
+      version = (h >> 19) & 3
+      layer = (h >> 17) & 3
+      br_idx = (h >> 12) & 15
+      sr_idx = (h >> 10) & 3
+      if version == 1 or layer == 0 or br_idx in (0, 15) or sr_idx == 3:
+        continue
+      mono = (h >> 6) & 3 == 3
+      bitrate = MediaDurationProbe.MP3Bitrates[(3 if version == 3 else 2, layer)][br_idx] * 1000
+      samplerate = MediaDurationProbe.MP3Samplerates[version][sr_idx]
+      samples = 384 if layer == 3 else (1152 if layer == 2 or version == 3 else 576)
+      q = p + 4 + ((17 if mono else 32) if version == 3 else (9 if mono else 17))
+      if data[q:q + 4] in (b'Xing', b'Info'):
+        if struct.unpack_from('>I', data, q + 4)[0] & 1:
+          return struct.unpack_from('>I', data, q + 8)[0] * samples / samplerate
+      elif data[p + 36:p + 40] == b'VBRI':
+        return struct.unpack_from('>I', data, p + 50)[0] * samples / samplerate
+      length = ((12 * bitrate // samplerate + ((h >> 9) & 1)) * 4) if layer == 3 else (samples // 8 * bitrate // samplerate + ((h >> 9) & 1))
+      if cbr and size and data[p + length:p + length + 1] == b'\xff' and data[p + length + 1] & 0xe0 == 0xe0:
+        return (size - start - p) * 8 / bitrate
+      return None
+    return None
+
+
+class SpilledImage:
+
+  def __init__(self, file, length, lock=None):
+    self.File = file
+    self.Length = length
+    self.Lock = lock or threading.Lock()
+
+  def __len__(self):
+    return self.Length
+
+  def read(self):
+    with self.Lock:
+      self.File.seek(0)
+      return self.File.read(self.Length)
+
+  def send(self, sock, offset=0, count=None):
+    with self.Lock:
+      sock.sendfile(self.File, offset, self.Length - offset if count is None else count)
+
+  def dup(self):
+    with self.Lock:
+      return SpilledImage(os.fdopen(os.dup(self.File.fileno()), 'rb'), self.Length, self.Lock)
+
+  def close(self):
+    with self.Lock:
+      try:
+        self.File.close()
+      except:
+        pass
+
+
+class RotatedImageCache:
+
+  def __init__(self, budget=67108864, disk_budget=0):
+    self.Budget = budget
+    self.Disk_budget = disk_budget
+    self.Directory = None
+    self.Memory = OrderedDict()
+    self.Size = 0
+    self.Disk = OrderedDict()
+    self.Disk_size = 0
+    self.Lock = threading.Lock()
+    self.Hits = 0
+    self.Disk_hits = 0
+    self.Misses = 0
+    self.Saved = 0
+
+  @staticmethod
+  def key(uri, size, rotation):
+    try:
+      size = int(size)
+    except:
+      size = None
+    return uri, size, rotation
+
+  def get(self, key):
+    t = time.monotonic()
+    with self.Lock:
+      entry = self.Memory.get(key)
+      if entry:
+        self.Memory.move_to_end(key)
+        self.Hits += 1
+        saved = max(entry[1] - (time.monotonic() - t), 0)
+        self.Saved += saved
+        return entry[0], saved
+      entry = self.Disk.get(key)
+      if entry and isinstance(entry[0], SpilledImage):
+        try:
+          image = entry[0].dup()
+        except:
+          image = None
+        if image is not None:
+          self.Disk.move_to_end(key)
+          self.Disk_hits += 1
+          saved = max(entry[2] - (time.monotonic() - t), 0)
+          self.Saved += saved
+          return image, saved
+        self.Misses += 1
+        return None
+      if entry:
+        self.Disk_size -= self.Disk.pop(key)[1]
+      else:
+        self.Misses += 1
+        return None
+    image = None
+    try:
+      with open(entry[0], 'rb') as f:
+        image = f.read()
+      os.remove(entry[0])
+    except:
+      pass
+    if not image:
+      with self.Lock:
+        self.Misses += 1
+      return None
+    self.put(key, image, entry[2])
+    with self.Lock:
+      self.Disk_hits += 1
+      saved = max(entry[2] - (time.monotonic() - t), 0)
+      self.Saved += saved
+    return image, saved
+
+  def put(self, key, image, cost):
+    if isinstance(image, SpilledImage):
+      self._put_spilled(key, image, cost)
+      return
+    evicted = []
+    with self.Lock:
+      if key in self.Memory:
+        self.Size -= len(self.Memory.pop(key)[0])
+      if len(image) <= self.Budget:
+        self.Memory[key] = (image, cost)
+        self.Size += len(image)
+      else:
+        evicted.append((key, (image, cost)))
+      while self.Size > self.Budget:
+        evicted.append(self.Memory.popitem(last=False))
+        self.Size -= len(evicted[-1][1][0])
+    for key, (image, cost) in evicted:
+      self._spill(key, image, cost)
+
+  def _put_spilled(self, key, image, cost):
+    removed = []
+    try:
+      image = image.dup() if len(image) <= self.Disk_budget else None
+    except:
+      image = None
+    with self.Lock:
+      if key in self.Memory:
+        self.Size -= len(self.Memory.pop(key)[0])
+      if key in self.Disk:
+        self.Disk_size -= self.Disk[key][1]
+        removed.append(self.Disk.pop(key)[0])
+      if image is not None:
+        self.Disk[key] = (image, len(image), cost)
+        self.Disk_size += len(image)
+        while self.Disk_size > self.Disk_budget:
+          k, (p, l, c) = self.Disk.popitem(last=False)
+          self.Disk_size -= l
+          removed.append(p)
+    for p in removed:
+      self._discard(p)
+
+  @staticmethod
+  def _discard(entry):
+    if isinstance(entry, SpilledImage):
+      entry.close()
+    else:
+      try:
+        os.remove(entry)
+      except:
+        pass
+
+  def _spill(self, key, image, cost):
+    if len(image) > self.Disk_budget:
+      return
+    try:
+      with self.Lock:
+        if not self.Directory:
+          self.Directory = tempfile.mkdtemp(prefix='DLNAmpcRenderer_')
+      path = os.path.join(self.Directory, uuid.uuid4().hex + '.jpg')
+      with open(path, 'wb') as f:
+        f.write(image)
+    except:
+      return
+    removed = []
+    with self.Lock:
+      if key in self.Disk:
+        self.Disk_size -= self.Disk[key][1]
+        removed.append(self.Disk.pop(key)[0])
+      self.Disk[key] = (path, len(image), cost)
+      self.Disk_size += len(image)
+      while self.Disk_size > self.Disk_budget:
+        k, (p, l, c) = self.Disk.popitem(last=False)
+        self.Disk_size -= l
+        removed.append(p)
+    for p in removed:
+      self._discard(p)
+
+  def hit_rate(self):
+    with self.Lock:
+      hits = self.Hits + self.Disk_hits
+      return hits / (hits + self.Misses) if hits + self.Misses else 0
+
+  def close(self):
+    with self.Lock:
+      spilled = [entry[0] for entry in self.Disk.values() if isinstance(entry[0], SpilledImage)]
+      self.Memory.clear()
+      self.Disk.clear()
+      self.Size = self.Disk_size = 0
+      directory = self.Directory
+      self.Directory = None
+    for image in spilled:
+      image.close()
+    if directory:
+      shutil.rmtree(directory, ignore_errors=True)
+
+
+class ImagePrefetcher:
+
+  MaxSize = 52428800
+  MaxStep = 1000
+  TakeTimeout = 10
+
+  def __init__(self, renderer, ahead=2, budget=33554432):
+    self.Renderer = renderer
+    self.Ahead = ahead
+    self.Budget = budget
+    self.Images = OrderedDict()
+    self.Size = 0
+    self.Queue = deque()
+    self.Explicit = set()
+    self.Pending = set()
+    self.Run = []
+    self.Condition = threading.Condition()
+    self.Thread = None
+    self.Closed = False
+    self.Hits = 0
+    self.Misses = 0
+    self.Fetched = 0
+    self.Failed = 0
+
+  def _predict(self):
+    if len(self.Run) < 2:
+      return []
+    ta = re.split(r'(\d+)', self.Run[-2])
+    tb = re.split(r'(\d+)', self.Run[-1])
+    if len(ta) != len(tb) or any(ta[i] != tb[i] for i in range(0, len(ta), 2)):
+      return []
+    diffs = [i for i in range(1, len(ta), 2) if ta[i] != tb[i]]
+    if len(diffs) != 1:
+      return []
+    i = diffs[0]
+    step = int(tb[i]) - int(ta[i])
+    if not step or abs(step) > ImagePrefetcher.MaxStep:
+      return []
+    width = len(tb[i]) if tb[i][:1] == '0' else 0
+    candidates = []
+    for k in range(1, self.Ahead + 1):
+      n = int(tb[i]) + k * step
+      if n < 0:
+        break
+      candidates.append(''.join(tb[:i] + [str(n).zfill(width)] + tb[i + 1:]))
+    return candidates
+
+  def _start(self):
+    if not self.Thread:
+      self.Thread = threading.Thread(target=self._worker, daemon=True)
+      self.Thread.start()
+    self.Condition.notify_all()
+
+  def observe(self, uri):
+    with self.Condition:
+      if self.Closed or r'://' not in uri:
+        return
+      if self.Run and urllib.parse.urlsplit(self.Run[-1]).netloc != urllib.parse.urlsplit(uri).netloc:
+        self.Run.clear()
+      if self.Run and self.Run[-1] == uri:
+        return
+      self.Run.append(uri)
+      del self.Run[:-2]
+      explicit = [c for c in self.Queue if c in self.Explicit]
+      self.Queue = deque(c for c in explicit + self._predict() if c != uri and c not in self.Images and c not in self.Pending)
+      if self.Queue:
+        self._start()
+
+  def add(self, uri):
+    with self.Condition:
+      if self.Closed or r'://' not in uri or uri in self.Images or uri in self.Pending:
+        return
+      if uri in self.Queue:
+        self.Queue.remove(uri)
+      self.Queue.appendleft(uri)
+      self.Explicit.add(uri)
+      self._start()
+
+  def reset(self):
+    with self.Condition:
+      self.Run.clear()
+      self.Queue.clear()
+      self.Explicit.clear()
+
+  def take(self, uri):
+    with self.Condition:
+      end_time = time.monotonic() + ImagePrefetcher.TakeTimeout
+      while (uri in self.Pending or uri in self.Explicit) and not self.Closed and time.monotonic() < end_time:
+        self.Condition.wait(end_time - time.monotonic())
+      entry = self.Images.get(uri)
+      if entry:
+        self.Images.move_to_end(uri)
+        self.Hits += 1
+        return entry
+      if uri in self.Queue:
+        self.Queue.remove(uri)
+        self.Explicit.discard(uri)
+      if self.Run:
+        self.Misses += 1
+      return None
+
+  def _fetch(self, uri):
+    t = time.monotonic()
+    if self.Renderer.JpegRotate == 'j':
+      head = _read_range(uri, 0, 65536, 10)
+      if head and head[1]:
+        rotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_probe(head[0])[0], 0)
+        cached = self.Renderer.RotatedImages.get(RotatedImageCache.key(uri, head[1], rotation)) if rotation else None
+        if cached:
+          return cached[0], rotation
+    rep = _open_url(uri, method='GET', timeout=10)
+    if not rep:
+      return None
+    try:
+      if 'image' not in (rep.getheader('Content-Type') or 'image').lower():
+        return None
+      uri_size = rep.getheader('Content-Length')
+      image = rep.read(ImagePrefetcher.MaxSize + 1)
+    finally:
+      rep.close()
+    if len(image) > ImagePrefetcher.MaxSize or image[:2] != b'\xff\xd8':
+      return None
+    rotation = 0
+    if self.Renderer.JpegRotate == 'j':
+      rotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_probe(image)[0], 0)
+      if rotation:
+        rot_key = RotatedImageCache.key(uri, uri_size, rotation)
+        cached = self.Renderer.RotatedImages.get(rot_key)
+        if cached:
+          image = cached[0]
+        else:
+          image = self.Renderer.RotateExecutor.submit(self.Renderer._rotate_jpeg, image, rotation).result()
+          if not image:
+            return None
+          self.Renderer.RotatedImages.put(rot_key, image, time.monotonic() - t)
+    return image, rotation
+
+  def _worker(self):
+    while True:
+      with self.Condition:
+        while not self.Queue and not self.Closed:
+          self.Condition.wait()
+        if self.Closed:
+          self.Thread = None
+          return
+        uri = self.Queue.popleft()
+        self.Explicit.discard(uri)
+        if uri in self.Images:
+          continue
+        self.Pending.add(uri)
+      try:
+        entry = self._fetch(uri)
+      except:
+        entry = None
+      with self.Condition:
+        self.Pending.discard(uri)
+        if entry and len(entry[0]) <= self.Budget:
+          self.Fetched += 1
+          self.Images[uri] = entry
+          self.Size += len(entry[0])
+          while self.Size > self.Budget:
+            self.Size -= len(self.Images.popitem(last=False)[1][0])
+        else:
+          self.Failed += 1
+        self.Condition.notify_all()
+
+  def close(self):
+    with self.Condition:
+      self.Closed = True
+      self.Queue.clear()
+      self.Images.clear()
+      self.Size = 0
+      self.Condition.notify_all()
+
+
 class HTTPRequest():
 
   SSLContext = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
@@ -459,7 +1250,7 @@ class HTTPRequest():
     'Host: %s\r\n%s' \
     '\r\n'
 
-  def __new__(cls, url, method=None, headers=None, data=None, timeout=30, max_length=1073741824, max_hlength=1048576, pconnection=None, ip=''):
+  def __new__(cls, url, method=None, headers=None, data=None, timeout=30, max_length=1073741824, max_hlength=1048576, pconnection=None, ip='', stream=False):
     if url is None:
       return HTTPMessage()
     if method is None:
@@ -505,7 +1296,7 @@ class HTTPRequest():
         pconnection[0].sendall(msg.encode('iso-8859-1') + (data or b''))
         code = '100'
         while code == '100':
-          resp = HTTPMessage(pconnection[0], body=(method.upper() != 'HEAD'), decode=None, timeout=timeout, max_length=max_length, max_hlength=max_hlength)
+          resp = HTTPMessage(pconnection[0], body=(method.upper() != 'HEAD' and not stream), decode=None, timeout=timeout, max_length=max_length, max_hlength=max_hlength)
           code = resp.code
           if code == '100':
             redir += 1
@@ -518,7 +1309,7 @@ class HTTPRequest():
             url = urllib.parse.urljoin(url, resp.header('location'))
             urlo_p = url_p
             url_p = urllib.parse.urlsplit(url, allow_fragments=False)
-            if headers['Connection'] == 'close' or resp.expect_close or (urlo_p.scheme != url_p.scheme or urlo_p.netloc != url_p.netloc):
+            if headers['Connection'] == 'close' or resp.expect_close or stream or (urlo_p.scheme != url_p.scheme or urlo_p.netloc != url_p.netloc):
               try:
                 pconnection[0].close()
               except:
@@ -546,7 +1337,7 @@ class HTTPRequest():
           pass
         pconnection[0] = None
         return HTTPMessage()
-    if headers['Connection'] == 'close' or resp.expect_close:
+    if (headers['Connection'] == 'close' or resp.expect_close) and not stream:
       try:
         pconnection[0].close()
       except:
@@ -555,261 +1346,1384 @@ class HTTPRequest():
     return resp
 
 
-ULONG = ctypes.wintypes.ULONG
-DWORD = ctypes.wintypes.DWORD
-LPDWORD = ctypes.wintypes.LPDWORD
-USHORT = ctypes.wintypes.USHORT
-UINT = ctypes.wintypes.UINT
-INT = ctypes.wintypes.INT
-LRESULT = ctypes.wintypes.LPARAM
-WPARAM = ctypes.wintypes.WPARAM
-LPARAM = ctypes.wintypes.LPARAM
-ULONG_PTR = ctypes.wintypes.WPARAM
-LONG_PTR = ctypes.wintypes.LPARAM
-PVOID = ctypes.wintypes.LPVOID
-LPVOID = ctypes.wintypes.LPVOID
-POINTER = ctypes.POINTER
-pointer = ctypes.pointer
-HANDLE = ctypes.wintypes.HANDLE
-LPCWSTR = ctypes.wintypes.LPCWSTR
-HWND = ctypes.wintypes.HWND
-MSG = ctypes.wintypes.MSG
-LPMSG = ctypes.wintypes.LPMSG
-BOOL = ctypes.wintypes.BOOL
-ATOM = ctypes.wintypes.ATOM
-WINFUNCTYPE = ctypes.WINFUNCTYPE
-kernel32 = ctypes.WinDLL('kernel32',  use_last_error=True)
-kernel32.GetModuleHandleW.restype = HANDLE
-kernel32.GetModuleHandleW.argtypes = (LPCWSTR,)
-kernel32.CreateNamedPipeW.restype = HANDLE
-kernel32.CreateNamedPipeW.argtypes = (LPCWSTR, DWORD, DWORD, DWORD, DWORD, DWORD, DWORD, LPVOID)
-kernel32.DisconnectNamedPipe.restype = BOOL
-kernel32.DisconnectNamedPipe.argtypes = (HANDLE,)
-kernel32.CloseHandle.restype = BOOL
-kernel32.CloseHandle.argtypes = (HANDLE,)
-kernel32.WriteFile.restype = BOOL
-kernel32.WriteFile.argtypes = (HANDLE, LPVOID, DWORD, LPDWORD, LPVOID)
-kernel32.FlushFileBuffers.restype = BOOL
-kernel32.FlushFileBuffers.argtypes = (HANDLE,)
-kernel32.ReadFile.restype = BOOL
-kernel32.ReadFile.argtypes = (HANDLE, LPVOID, DWORD, LPDWORD, LPVOID)
-user32 = ctypes.WinDLL('user32',  use_last_error=True)
-user32.FindWindowExW.restype = HWND
-user32.FindWindowExW.argtypes = (HWND, HWND, LPCWSTR, LPCWSTR)
-user32.PostMessageW.restype = BOOL
-user32.PostMessageW.argtypes = (HWND, UINT, WPARAM, LPARAM)
-user32.DefWindowProcW.restype = LRESULT
-user32.DefWindowProcW.argtypes = (HWND, UINT, WPARAM, LPARAM)
-user32.SendMessageW.restype = LRESULT
-user32.SendMessageW.argtypes = (HWND, UINT, WPARAM, LPARAM)
-user32.ShowWindow.restype = BOOL
-user32.ShowWindow.argtypes = (HWND, INT)
-user32.GetWindowLongPtrW.restype = LONG_PTR
-user32.GetWindowLongPtrW.argtypes = (HWND, INT)
-user32.SetForegroundWindow.restype = BOOL
-user32.SetForegroundWindow.argtypes = (HWND,)
-user32.GetWindow.restype = HWND
-user32.GetWindow.argtypes = (HWND, UINT)
-user32.SetWindowTextW.restype = BOOL
-user32.SetWindowTextW.argtypes = (HWND, LPCWSTR)
-user32.RegisterClassExW.restype = ATOM
-user32.RegisterClassExW.argtypes = (LPVOID,)
-user32.CreateWindowExW.restype = HWND
-user32.CreateWindowExW.argtypes = (DWORD, LPCWSTR, LPCWSTR, DWORD, INT, INT, INT, INT, HWND, HANDLE, HANDLE, LPVOID)
-user32.GetMessageW.restype = BOOL
-user32.GetMessageW.argtypes = (LPMSG, HWND, UINT, UINT)
-user32.DispatchMessageW.restype = LRESULT
-user32.DispatchMessageW.argtypes = (LPMSG,)
-
-class COPYDATA_STRUCT(ctypes.Structure):
-  _fields_ = [('dwData', ULONG_PTR), ('cbData', DWORD), ('lpData', PVOID)]
+class ReadAheadBuffer:
 
-LPCOPYDATA = POINTER(COPYDATA_STRUCT)
+  def __init__(self, size):
+    self.Ring = bytearray(size)
+    self.Size = size
+    self.Head = 0
+    self.Tail = 0
+    self.Ended = False
+    self.Failed = False
+    self.Closed = False
+    self.Stalls = 0
+    self.Underruns = 0
+    self.Peak = 0
+    self.Condition = threading.Condition()
 
-WNDPROC = WINFUNCTYPE(LRESULT, HWND, UINT, WPARAM, LPARAM)
+  def fill_level(self):
+    return self.Head - self.Tail
 
-class WNDCLASSEXW(ctypes.Structure):
-    _fields_ = [("cbSize", UINT),
-                ("style", UINT),
-                ("lpfnWndProc", WNDPROC),
-                ("cbClsExtra", INT),
-                ("cbWndExtra", INT),
-                ("hInstance", HANDLE),
-                ("hIcon", HANDLE),
-                ("hCursor", HANDLE),
-                ("hBrush", HANDLE),
-                ("lpszMenuName", LPCWSTR),
-                ("lpszClassName", LPCWSTR),
-                ("hIconSm", HANDLE)]
+  def fill(self, upstream, remaining, stall_time, logger):
+    try:
+      with memoryview(self.Ring) as mv:
+        while remaining is None or remaining > 0:
+          with self.Condition:
+            while self.Head - self.Tail >= self.Size and not self.Closed:
+              self.Condition.wait()
+            if self.Closed:
+              return
+            slot = self.Head % self.Size
+            n = min(self.Size - (self.Head - self.Tail), self.Size - slot, MediaProxy.MaxChunk)
+          if remaining is not None:
+            n = min(n, remaining)
+          recv_time = time.monotonic()
+          n = upstream.recv_into(mv[slot:slot + n])
+          if not n:
+            break
+          recv_time = time.monotonic() - recv_time
+          with self.Condition:
+            if recv_time >= stall_time:
+              self.Stalls += 1
+              logger.log('Proxy - blocage du serveur pendant %.1f s, tampon de lecture anticipée: %d ko' % (recv_time, (self.Head - self.Tail) // 1024), 2)
+            self.Head += n
+            self.Peak = max(self.Peak, self.Head - self.Tail)
+            self.Condition.notify_all()
+          if remaining is not None:
+            remaining -= n
+    except:
+      with self.Condition:
+        self.Failed = not self.Closed
+    finally:
+      with self.Condition:
+        self.Ended = True
+        self.Condition.notify_all()
 
-class IPCmpcControler(threading.Thread):
 
-  SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+class MediaProxy:
 
-  def _PyWndProcedure(self, hWnd, uMsg, wParam, lParam):
-      self.logger.log('Fenêtre de contrôle - message reçu: %s' % hex(uMsg), 2)
-      if uMsg == 0x4A:
-        copydata = ctypes.cast(lParam, LPCOPYDATA).contents
-        not_code = copydata.dwData
-        not_msg = ctypes.wstring_at(copydata.lpData, max(copydata.cbData // 2 - 1, 0))
-        self.logger.log('Lecteur - notification reçue - code:%s - message:%s' % (hex(not_code), not_msg), 2)
-        if not_code == 0x50000000:
-          self.wnd_mpc = int(not_msg)
-          self.logger.log('Lecteur - handle de mpc: %s' % self.wnd_mpc, 1)
-          self.Player_event_event.set()
-          self.wnd_mpc_mute = user32.FindWindowExW(self.wnd_mpc, None, 'ToolbarWindow32', None)
-          self.wnd_mpc_volume = user32.FindWindowExW(self.wnd_mpc_mute, None, 'msctls_trackbar32', None)
-          self.set_title(self.title_name)
-        else:
-          if not_code == 0x5000000B:
-            self.Msg_buffer[0] = "quit"
-            user32.PostMessageW(self.wnd_ctrl, 0x0012, 0, 0)
-          else:
-            self.Msg_buffer.append((not_code, not_msg))
-          self.Msg_event.set()
-      return user32.DefWindowProcW(hWnd, uMsg, wParam, lParam)
+  MinChunk = 16384
+  MaxChunk = 1048576
+  ChunkTime = 0.05
+  SocketBuffer = 1048576
+  PoolSize = 8
+  StallTime = 0.5
+  MaxReadAhead = 268435456
 
-  def __init__(self, title_name='mpc', verbosity=0):
-    self.verbosity = verbosity
+  def __init__(self, timeout=30, readahead=16777216, readahead_time=0, verbosity=0):
+    self.Timeout = timeout
+    self.ReadAhead = readahead
+    self.ReadAheadTime = readahead_time
     self.logger = log_event(verbosity)
-    self.title_name = title_name
-    threading.Thread.__init__(self)
-    self.WndProc = WNDPROC(self._PyWndProcedure)
-    self.wnd_ctrl = None
-    self.wnd_mpc = None
-    self.wnd_mpc_mute = None
-    self.wnd_mpc_volume = None
-    self.Cmd_Event = threading.Event()
-    self.Msg_event = threading.Event()
-    self.Cmd_buffer = ["run"]
-    self.Msg_buffer = ["run"]
-    self.Player_events = []
-    self.Player_status = "NO_MEDIA_PRESENT"
-    self.Player_time_pos = ""
-    self.Player_duration = ""
-    self.Player_mute = False
-    self.mute_changed = False
-    self.Player_volume = 0
-    self.Player_paused = True
-    self.Player_image = False
-    self.Player_fullscreen = False
-    self.Player_rotation = 0
-    self.Player_subtitles = ""
-    self.Player_title = ""
+    self.Pool = []
+    self.Lock = threading.Lock()
+    self.Sent = 0
+    self.Aborted = 0
+    self.Stalls = 0
+    self.Underruns = 0
+    self.Buffers = []
+
+  def _acquire(self):
+    with self.Lock:
+      if self.Pool:
+        return self.Pool.pop()
+    return bytearray(MediaProxy.MaxChunk)
+
+  def _release(self, buf):
+    with self.Lock:
+      if len(self.Pool) < MediaProxy.PoolSize:
+        self.Pool.append(buf)
+
+  @staticmethod
+  def _set_buffer(sock, option):
+    try:
+      sock.setsockopt(socket.SOL_SOCKET, option, MediaProxy.SocketBuffer)
+    except:
+      pass
+
+  def _depth(self, length, duration):
+    if self.ReadAheadTime and length and duration:
+      return min(max(int(length / duration * self.ReadAheadTime), MediaProxy.MaxChunk), MediaProxy.MaxReadAhead)
+    return min(self.ReadAhead, MediaProxy.MaxReadAhead)
+
+  def _aborted(self, sent):
+    with self.Lock:
+      self.Aborted += 1
+    self.logger.log('Proxy - déconnexion du client après %d ko, fermeture de la connexion au serveur' % (sent // 1024), 1)
+
+  def _relay(self, upstream, sock, remaining, sent):
+    buf = self._acquire()
+    selector = selectors.DefaultSelector()
+    try:
+      selector.register(upstream, selectors.EVENT_READ)
+      selector.register(sock, selectors.EVENT_READ)
+      chunk = MediaProxy.MinChunk
+      rate = None
+      last_time = time.monotonic()
+      with memoryview(buf) as mv:
+        while remaining is None or remaining > 0:
+          select_time = time.monotonic()
+          events = selector.select(self.Timeout)
+          if not events:
+            raise TimeoutError
+          ready = [key.fileobj for (key, mask) in events]
+          select_time = time.monotonic() - select_time
+          if upstream in ready and select_time >= MediaProxy.StallTime:
+            with self.Lock:
+              self.Stalls += 1
+            self.logger.log('Proxy - blocage du serveur pendant %.1f s' % select_time, 2)
+          if sock in ready:
+            try:
+              peek = sock.recv(1, socket.MSG_PEEK)
+            except:
+              peek = b''
+            if not peek:
+              self._aborted(sent)
+              raise ConnectionAbortedError
+            selector.unregister(sock)
+          if upstream not in ready:
+            continue
+          n = upstream.recv_into(mv[:chunk if remaining is None else min(chunk, remaining)])
+          if not n:
+            break
+          try:
+            sock.sendall(mv[:n])
+          except:
+            self._aborted(sent)
+            raise
+          sent += n
+          if remaining is not None:
+            remaining -= n
+          now = time.monotonic()
+          if now > last_time:
+            rate = n / (now - last_time) if rate is None else 0.8 * rate + 0.2 * n / (now - last_time)
+            chunk = min(max(1 << max(int(rate * MediaProxy.ChunkTime).bit_length() - 1, 0), MediaProxy.MinChunk), MediaProxy.MaxChunk)
+          last_time = now
+      return sent, 'segment final: %d ko' % (chunk // 1024)
+    finally:
+      selector.close()
+      self._release(buf)
+
+  def _relay_ahead(self, upstream, sock, remaining, sent, depth):
+    ring = ReadAheadBuffer(depth)
+    with self.Lock:
+      self.Buffers.append(ring)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    upstream.settimeout(self.Timeout)
+    fill_thread = threading.Thread(target=ring.fill, args=(upstream, remaining, MediaProxy.StallTime, self.logger), daemon=True)
+    fill_thread.start()
+    try:
+      with memoryview(ring.Ring) as mv:
+        while True:
+          with ring.Condition:
+            if ring.Head == ring.Tail and not ring.Ended and sent:
+              ring.Underruns += 1
+            while ring.Head == ring.Tail and not ring.Ended:
+              ring.Condition.wait(MediaProxy.StallTime)
+              if selector.select(0):
+                try:
+                  peek = sock.recv(1, socket.MSG_PEEK)
+                except:
+                  peek = b''
+                if not peek:
+                  self._aborted(sent)
+                  raise ConnectionAbortedError
+                selector.unregister(sock)
+            if ring.Head == ring.Tail:
+              if ring.Failed:
+                raise ConnectionError
+              break
+            slot = ring.Tail % ring.Size
+            n = min(ring.Head - ring.Tail, ring.Size - slot, MediaProxy.MaxChunk)
+          try:
+            sock.sendall(mv[slot:slot + n])
+          except:
+            self._aborted(sent)
+            raise
+          sent += n
+          with ring.Condition:
+            ring.Tail += n
+            ring.Condition.notify_all()
+      return sent, 'lecture anticipée: %d ko, remplissage maximal: %d ko, blocages du serveur: %d, tampon vidé: %d' % (depth // 1024, ring.Peak // 1024, ring.Stalls, ring.Underruns)
+    finally:
+      with ring.Condition:
+        ring.Closed = True
+        ring.Condition.notify_all()
+      try:
+        upstream.shutdown(socket.SHUT_RDWR)
+      except:
+        pass
+      fill_thread.join()
+      selector.close()
+      with self.Lock:
+        self.Buffers.remove(ring)
+        self.Stalls += ring.Stalls
+        self.Underruns += ring.Underruns
+
+  def serve(self, uri, method, sock, duration=None):
+    pconnection = [None]
+    rep = HTTPRequest(uri, method=method, headers={'User-Agent': 'Lavf', 'Connection': 'close'}, timeout=self.Timeout, pconnection=pconnection, stream=True)
+    upstream = pconnection[0]
+    if not rep.code or upstream is None:
+      return None
+    start_time = time.monotonic()
+    try:
+      resp_h = '%s %s %s\r\n' % (rep.version, rep.code, rep.message) + ''.join('%s: %s\r\n' % (k, v) for (k, v) in rep.headers.items() if k not in ('Connection', 'Keep-Alive')) + 'Connection: close\r\n\r\n'
+      if method.upper() == 'HEAD' or rep.code in ('204', '304'):
+        sock.sendall(resp_h.encode('ISO-8859-1'))
+        return rep.code
+      remaining = None
+      if not rep.in_header('Transfer-Encoding', 'chunked'):
+        try:
+          remaining = max(0, int(rep.header('Content-Length')))
+        except:
+          remaining = None
+      MediaProxy._set_buffer(sock, socket.SO_SNDBUF)
+      MediaProxy._set_buffer(upstream, socket.SO_RCVBUF)
+      sock.sendall(resp_h.encode('ISO-8859-1'))
+      head = rep.body or b''
+      if remaining is not None:
+        head = head[:remaining]
+        remaining -= len(head)
+      if head:
+        sock.sendall(head)
+      sent = len(head)
+      depth = self._depth(None if remaining is None else remaining + sent, duration)
+      if remaining is not None:
+        depth = min(depth, remaining)
+      if depth:
+        sent, detail = self._relay_ahead(upstream, sock, remaining, sent, depth)
+      else:
+        sent, detail = self._relay(upstream, sock, remaining, sent)
+      with self.Lock:
+        self.Sent += sent
+      self.logger.log('Proxy - fin du transfert: %d ko en %.1f s - %s' % (sent // 1024, time.monotonic() - start_time, detail), 1)
+      return rep.code
+    finally:
+      try:
+        upstream.close()
+      except:
+        pass
+
+
+class ProxyCacheEntry:
+
+  def __init__(self, uri, path, cap):
+    self.URI = uri
+    self.Path = path
+    self.Cap = cap
+    self.Headers = None
+    self.Length = None
+    self.Low = 0
+    self.Cursor = 0
+    self.Gen = 0
+    self.Active = False
+    self.Failed = False
+    self.Closed = False
+    self.Readers = {}
+    self.Floor = 0
+    self.Idle = time.monotonic()
+    self.Condition = threading.Condition()
+
+
+class ProxySegmentCache:
+
+  IdleTimeout = 30
+  WaitStep = 0.5
+  EntityHeaders = ('Connection', 'Keep-Alive', 'Transfer-Encoding', 'Content-Length', 'Content-Range', 'Accept-Ranges', 'Date')
+
+  def __init__(self, proxy, cap=1073741824, budget=4294967296, verbosity=0):
+    self.Proxy = proxy
+    self.Cap = cap
+    self.Budget = budget
+    self.logger = log_event(verbosity)
+    self.Directory = None
+    self.Entries = OrderedDict()
+    self.Lock = threading.Lock()
+    self.Hits = 0
+    self.Waits = 0
+    self.Restarts = 0
+    self.Directs = 0
+
+  def _entry(self, uri):
+    evicted = []
+    with self.Lock:
+      entry = self.Entries.get(uri)
+      if entry:
+        self.Entries.move_to_end(uri)
+        return entry
+      if not self.Directory:
+        self.Directory = tempfile.mkdtemp(prefix='DLNAmpcRenderer_')
+      entry = ProxyCacheEntry(uri, os.path.join(self.Directory, uuid.uuid4().hex + '.part'), self.Cap)
+      self.Entries[uri] = entry
+      size = sum(e.Cap for e in self.Entries.values())
+      for k, e in list(self.Entries.items()):
+        if size <= self.Budget:
+          break
+        if e is not entry and not e.Readers:
+          del self.Entries[k]
+          size -= e.Cap
+          evicted.append(e)
+    for e in evicted:
+      self._discard(e)
+    return entry
+
+  def _discard(self, entry):
+    with entry.Condition:
+      entry.Closed = True
+      entry.Gen += 1
+      entry.Condition.notify_all()
+    try:
+      os.remove(entry.Path)
+    except:
+      pass
+
+  def _start(self, entry, skip):
+    entry.Gen += 1
+    entry.Active = True
+    entry.Failed = False
+    entry.Idle = time.monotonic()
+    download_thread = threading.Thread(target=self._download, args=(entry, entry.Gen, skip), daemon=True)
+    download_thread.start()
+
+  def _download(self, entry, gen, skip):
+    pconnection = [None]
+    rep = HTTPRequest(entry.URI, method='GET', headers={'User-Agent': 'Lavf', 'Connection': 'close'}, timeout=self.Proxy.Timeout, pconnection=pconnection, stream=True)
+    upstream = pconnection[0]
+    f = None
+    buf = None
+    try:
+      if not rep.code or upstream is None:
+        raise ConnectionError
+      length = None
+      if rep.code == '200' and not rep.in_header('Transfer-Encoding', 'chunked'):
+        try:
+          length = int(rep.header('Content-Length'))
+        except:
+          length = None
+      with entry.Condition:
+        if gen != entry.Gen:
+          return
+        if entry.Headers is None:
+          entry.Headers = (rep.code, tuple((k, v) for (k, v) in rep.headers.items() if k not in ProxySegmentCache.EntityHeaders))
+          entry.Length = length
+          if length:
+            entry.Cap = min(entry.Cap, length)
+        elif length != entry.Length:
+          raise ConnectionError
+        entry.Condition.notify_all()
+      if not length:
+        return
+      f = open(entry.Path, 'r+b' if os.path.exists(entry.Path) else 'w+b', buffering=0)
+      buf = self.Proxy._acquire()
+      pending = memoryview(rep.body or b'')
+      pos = 0
+      with memoryview(buf) as mv:
+        while pos < length:
+          if pending:
+            chunk = pending
+            pending = None
+          else:
+            recv_time = time.monotonic()
+            n = upstream.recv_into(mv)
+            if not n:
+              raise ConnectionError
+            recv_time = time.monotonic() - recv_time
+            if recv_time >= MediaProxy.StallTime:
+              with self.Proxy.Lock:
+                self.Proxy.Stalls += 1
+              with entry.Condition:
+                floor = min(entry.Readers.values(), default=pos)
+              self.logger.log('Cache du proxy - blocage du serveur pendant %.1f s, avance du téléchargement: %d ko' % (recv_time, max(pos - floor, 0) // 1024), 2)
+            chunk = mv[:n]
+          if pos + len(chunk) <= skip:
+            pos += len(chunk)
+            continue
+          if pos < skip:
+            chunk = chunk[skip - pos:]
+            pos = skip
+          while chunk:
+            with entry.Condition:
+              while True:
+                if gen != entry.Gen:
+                  return
+                if not entry.Readers and time.monotonic() - entry.Idle > ProxySegmentCache.IdleTimeout:
+                  self.logger.log('Cache du proxy - arrêt du téléchargement inutilisé à %d ko: %s' % (pos // 1024, entry.URI), 2)
+                  return
+                behind = [p for p in entry.Readers.values() if p < pos]
+                if len(behind) < len(entry.Readers):
+                  floor = pos
+                else:
+                  floor = min(behind) if behind else entry.Floor
+                if pos - floor < entry.Cap:
+                  break
+                entry.Condition.wait(ProxySegmentCache.WaitStep)
+              room = entry.Cap - (pos - floor)
+            slot = pos % entry.Cap
+            n = min(len(chunk), room, entry.Cap - slot)
+            f.seek(slot)
+            written = 0
+            while written < n:
+              written += f.write(chunk[written:n])
+            pos += n
+            chunk = chunk[n:]
+            with entry.Condition:
+              if gen != entry.Gen:
+                return
+              entry.Cursor = pos
+              entry.Low = max(entry.Low, pos - entry.Cap)
+              entry.Condition.notify_all()
+    except:
+      with entry.Condition:
+        if gen == entry.Gen:
+          entry.Failed = True
+      self.logger.log('Cache du proxy - échec du téléchargement: %s' % entry.URI, 1)
+    finally:
+      with entry.Condition:
+        if gen == entry.Gen:
+          entry.Active = False
+        entry.Condition.notify_all()
+      if f:
+        f.close()
+      if buf is not None:
+        self.Proxy._release(buf)
+      try:
+        upstream.close()
+      except:
+        pass
+
+  def _serve_direct(self, entry, sock, start, end):
+    pconnection = [None]
+    rep = HTTPRequest(entry.URI, method='GET', headers={'User-Agent': 'Lavf', 'Connection': 'close'}, timeout=self.Proxy.Timeout, pconnection=pconnection, stream=True)
+    upstream = pconnection[0]
+    if rep.code != '200' or upstream is None:
+      raise ConnectionError
+    buf = None
+    try:
+      head = rep.body or b''
+      pos = len(head)
+      sent = max(min(pos, end + 1) - start, 0)
+      if sent:
+        sock.sendall(head[start:start + sent])
+      buf = self.Proxy._acquire()
+      with memoryview(buf) as mv:
+        while pos < start:
+          n = upstream.recv_into(mv[:start - pos])
+          if not n:
+            raise ConnectionError
+          pos += n
+      if sent < end + 1 - start:
+        sent = self.Proxy._relay(upstream, sock, end + 1 - start - sent, sent)[0]
+        if sent < end + 1 - start:
+          raise ConnectionError
+      with self.Proxy.Lock:
+        self.Proxy.Sent += sent
+    finally:
+      if buf is not None:
+        self.Proxy._release(buf)
+      try:
+        upstream.close()
+      except:
+        pass
+
+  def serve(self, uri, req, sock, duration=None):
+    if req.method != 'GET':
+      with self.Lock:
+        entry = self.Entries.get(uri)
+      if not entry or not entry.Headers:
+        return self.Proxy.serve(uri, req.method, sock, duration)
+    entry = self._entry(uri)
+    with entry.Condition:
+      if entry.Headers is None and not entry.Active:
+        self._start(entry, 0)
+      end_time = time.monotonic() + self.Proxy.Timeout
+      while entry.Headers is None and entry.Active and time.monotonic() < end_time:
+        entry.Condition.wait(ProxySegmentCache.WaitStep)
+      headers = entry.Headers
+      length = entry.Length
+    if not headers or not length or headers[0] != '200':
+      return self.Proxy.serve(uri, req.method, sock, duration)
+    ranges = _parse_ranges(req.header('Range'), length) if req.header('Range') else None
+    resp_h = ''.join('%s: %s\r\n' % (k, v) for (k, v) in headers[1]) + \
+    ('' if any(k == 'Content-Type' for (k, v) in headers[1]) else 'Content-Type: application/octet-stream\r\n') + \
+    'Date: %s\r\n' \
+    'Accept-Ranges: bytes\r\n' \
+    'Connection: close\r\n' % email.utils.formatdate(time.time(), usegmt=True)
+    if ranges == []:
+      sock.sendall(('HTTP/1.1 416 Range Not Satisfiable\r\nContent-Range: bytes */%d\r\nContent-Length: 0\r\n' % length + resp_h + '\r\n').encode('ISO-8859-1'))
+      return '416'
+    if ranges:
+      start, end = min(r[0] for r in ranges), max(r[1] for r in ranges)
+      code = '206'
+      sock.sendall(('HTTP/1.1 206 Partial Content\r\nContent-Range: bytes %d-%d/%d\r\nContent-Length: %d\r\n' % (start, end, length, end - start + 1) + resp_h + '\r\n').encode('ISO-8859-1'))
+    else:
+      start, end = 0, length - 1
+      code = '200'
+      sock.sendall(('HTTP/1.1 200 OK\r\nContent-Length: %d\r\n' % length + resp_h + '\r\n').encode('ISO-8859-1'))
+    if req.method != 'GET':
+      return code
+    reader = object()
+    pos = start
+    f = None
+    buf = self.Proxy._acquire()
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    with entry.Condition:
+      entry.Readers[reader] = pos
+      if entry.Low <= pos < entry.Cursor:
+        self.Hits += 1
+      else:
+        self.Waits += 1
+    try:
+      with memoryview(buf) as mv:
+        while pos <= end:
+          with entry.Condition:
+            if pos > start and entry.Active and pos >= entry.Cursor:
+              with self.Proxy.Lock:
+                self.Proxy.Underruns += 1
+            while not (entry.Low <= pos < entry.Cursor):
+              if entry.Closed or (entry.Failed and not entry.Active):
+                raise ConnectionError
+              if pos < entry.Low and len(entry.Readers) > 1:
+                del entry.Readers[reader]
+                self.Directs += 1
+                self.logger.log('Cache du proxy - lecture directe depuis %d ko, en amont de la fenêtre partagée à %d ko: %s' % (pos // 1024, entry.Low // 1024, uri), 2)
+                break
+              if pos < entry.Low or not entry.Active:
+                if pos < entry.Low:
+                  entry.Low = entry.Cursor = 0
+                self.Restarts += 1
+                self.logger.log('Cache du proxy - reprise du téléchargement depuis %d ko pour atteindre %d ko: %s' % (entry.Cursor // 1024, pos // 1024, uri), 2)
+                self._start(entry, entry.Cursor)
+              entry.Condition.wait(ProxySegmentCache.WaitStep)
+              if selector.select(0):
+                try:
+                  peek = sock.recv(1, socket.MSG_PEEK)
+                except:
+                  peek = b''
+                if not peek:
+                  raise ConnectionAbortedError
+                selector.unregister(sock)
+            if reader not in entry.Readers:
+              break
+            slot = pos % entry.Cap
+            n = min(entry.Cursor - pos, end + 1 - pos, entry.Cap - slot, len(buf))
+          if not f:
+            f = open(entry.Path, 'rb', buffering=0)
+          f.seek(slot)
+          n = f.readinto(mv[:n])
+          if not n:
+            raise ConnectionError
+          with entry.Condition:
+            if pos < entry.Low:
+              continue
+          sock.sendall(mv[:n])
+          pos += n
+          with entry.Condition:
+            entry.Readers[reader] = pos
+            entry.Condition.notify_all()
+      if pos <= end:
+        self._serve_direct(entry, sock, pos, end)
+      return code
+    finally:
+      with entry.Condition:
+        if entry.Readers.pop(reader, None) is not None:
+          entry.Floor = pos
+        entry.Idle = time.monotonic()
+        entry.Condition.notify_all()
+      selector.close()
+      if f:
+        f.close()
+      self.Proxy._release(buf)
+
+  def close(self):
+    with self.Lock:
+      entries = list(self.Entries.values())
+      self.Entries.clear()
+      directory = self.Directory
+      self.Directory = None
+    for entry in entries:
+      self._discard(entry)
+    if directory:
+      shutil.rmtree(directory, ignore_errors=True)
+
+
+ULONG = ctypes.wintypes.ULONG
+DWORD = ctypes.wintypes.DWORD
+LPDWORD = ctypes.wintypes.LPDWORD
+USHORT = ctypes.wintypes.USHORT
+UINT = ctypes.wintypes.UINT
+INT = ctypes.wintypes.INT
+LRESULT = ctypes.wintypes.LPARAM
+WPARAM = ctypes.wintypes.WPARAM
+LPARAM = ctypes.wintypes.LPARAM
+ULONG_PTR = ctypes.wintypes.WPARAM
+LONG_PTR = ctypes.wintypes.LPARAM
+PVOID = ctypes.wintypes.LPVOID
+LPVOID = ctypes.wintypes.LPVOID
+POINTER = ctypes.POINTER
+pointer = ctypes.pointer
+HANDLE = ctypes.wintypes.HANDLE
+LPCWSTR = ctypes.wintypes.LPCWSTR
+HWND = ctypes.wintypes.HWND
+MSG = ctypes.wintypes.MSG
+LPMSG = ctypes.wintypes.LPMSG
+BOOL = ctypes.wintypes.BOOL
+ATOM = ctypes.wintypes.ATOM
+WINFUNCTYPE = getattr(ctypes, 'WINFUNCTYPE', ctypes.CFUNCTYPE)
+if hasattr(ctypes, 'WinDLL'):
+  kernel32 = ctypes.WinDLL('kernel32',  use_last_error=True)
+  kernel32.GetModuleHandleW.restype = HANDLE
+  kernel32.GetModuleHandleW.argtypes = (LPCWSTR,)
+  kernel32.CreateFileW.restype = HANDLE
+  kernel32.CreateFileW.argtypes = (LPCWSTR, DWORD, DWORD, LPVOID, DWORD, DWORD, HANDLE)
+  kernel32.CreateEventW.restype = HANDLE
+  kernel32.CreateEventW.argtypes = (LPVOID, BOOL, BOOL, LPCWSTR)
+  kernel32.ReadFile.restype = BOOL
+  kernel32.ReadFile.argtypes = (HANDLE, LPVOID, DWORD, LPDWORD, LPVOID)
+  kernel32.WriteFile.restype = BOOL
+  kernel32.WriteFile.argtypes = (HANDLE, LPVOID, DWORD, LPDWORD, LPVOID)
+  kernel32.GetOverlappedResult.restype = BOOL
+  kernel32.GetOverlappedResult.argtypes = (HANDLE, LPVOID, LPDWORD, BOOL)
+  kernel32.CancelIoEx.restype = BOOL
+  kernel32.CancelIoEx.argtypes = (HANDLE, LPVOID)
+  kernel32.CloseHandle.restype = BOOL
+  kernel32.CloseHandle.argtypes = (HANDLE,)
+  user32 = ctypes.WinDLL('user32',  use_last_error=True)
+  user32.FindWindowExW.restype = HWND
+  user32.FindWindowExW.argtypes = (HWND, HWND, LPCWSTR, LPCWSTR)
+  user32.PostMessageW.restype = BOOL
+  user32.PostMessageW.argtypes = (HWND, UINT, WPARAM, LPARAM)
+  user32.DefWindowProcW.restype = LRESULT
+  user32.DefWindowProcW.argtypes = (HWND, UINT, WPARAM, LPARAM)
+  user32.SendMessageW.restype = LRESULT
+  user32.SendMessageW.argtypes = (HWND, UINT, WPARAM, LPARAM)
+  user32.ShowWindow.restype = BOOL
+  user32.ShowWindow.argtypes = (HWND, INT)
+  user32.GetWindowLongPtrW.restype = LONG_PTR
+  user32.GetWindowLongPtrW.argtypes = (HWND, INT)
+  user32.SetForegroundWindow.restype = BOOL
+  user32.SetForegroundWindow.argtypes = (HWND,)
+  user32.IsIconic.restype = BOOL
+  user32.IsIconic.argtypes = (HWND,)
+  user32.GetWindow.restype = HWND
+  user32.GetWindow.argtypes = (HWND, UINT)
+  user32.SetWindowTextW.restype = BOOL
+  user32.SetWindowTextW.argtypes = (HWND, LPCWSTR)
+  user32.RegisterClassExW.restype = ATOM
+  user32.RegisterClassExW.argtypes = (LPVOID,)
+  user32.CreateWindowExW.restype = HWND
+  user32.CreateWindowExW.argtypes = (DWORD, LPCWSTR, LPCWSTR, DWORD, INT, INT, INT, INT, HWND, HANDLE, HANDLE, LPVOID)
+  user32.GetMessageW.restype = BOOL
+  user32.GetMessageW.argtypes = (LPMSG, HWND, UINT, UINT)
+  user32.DispatchMessageW.restype = LRESULT
+  user32.DispatchMessageW.argtypes = (LPMSG,)
+
+class COPYDATA_STRUCT(ctypes.Structure):
+  _fields_ = [('dwData', ULONG_PTR), ('cbData', DWORD), ('lpData', PVOID)]
+
+LPCOPYDATA = POINTER(COPYDATA_STRUCT)
+
+WNDPROC = WINFUNCTYPE(LRESULT, HWND, UINT, WPARAM, LPARAM)
+
+class WNDCLASSEXW(ctypes.Structure):
+    _fields_ = [("cbSize", UINT),
+                ("style", UINT),
+                ("lpfnWndProc", WNDPROC),
+                ("cbClsExtra", INT),
+                ("cbWndExtra", INT),
+                ("hInstance", HANDLE),
+                ("hIcon", HANDLE),
+                ("hCursor", HANDLE),
+                ("hBrush", HANDLE),
+                ("lpszMenuName", LPCWSTR),
+                ("lpszClassName", LPCWSTR),
+                ("hIconSm", HANDLE)]
+
+class OVERLAPPED(ctypes.Structure):
+  _fields_ = [('Internal', ULONG_PTR), ('InternalHigh', ULONG_PTR), ('Offset', DWORD), ('OffsetHigh', DWORD), ('hEvent', HANDLE)]
+
+class OverlappedPipe:
+
+  ReadSize = 65536
+
+  def __init__(self, path):
+    self.Handle = kernel32.CreateFileW(path, 0xC0000000, 0, None, 3, 0x40000000, None)
+    if self.Handle in (None, HANDLE(-1).value):
+      raise ctypes.WinError(ctypes.get_last_error())
+    self.Read_buffer = ctypes.create_string_buffer(OverlappedPipe.ReadSize)
+    self.Buffer = b''
+    self.Lock = threading.Lock()
+    self.Closed = False
+
+  def _transfer(self, func, buf, size):
+    if self.Closed:
+      return None
+    ov = OVERLAPPED()
+    ov.hEvent = kernel32.CreateEventW(None, True, False, None)
+    if not ov.hEvent:
+      return None
+    try:
+      n = DWORD(0)
+      if not func(self.Handle, buf, size, None, ctypes.byref(ov)) and ctypes.get_last_error() != 997:
+        return None
+      if not kernel32.GetOverlappedResult(self.Handle, ctypes.byref(ov), ctypes.byref(n), True):
+        return None
+      return n.value
+    finally:
+      kernel32.CloseHandle(ov.hEvent)
+
+  def write(self, data):
+    while data:
+      n = self._transfer(kernel32.WriteFile, data, len(data))
+      if not n:
+        raise ConnectionError
+      data = data[n:]
+
+  def readline(self):
+    while b'\n' not in self.Buffer:
+      n = self._transfer(kernel32.ReadFile, self.Read_buffer, OverlappedPipe.ReadSize)
+      if not n:
+        line, self.Buffer = self.Buffer, b''
+        return line
+      self.Buffer += self.Read_buffer.raw[:n]
+    line, self.Buffer = self.Buffer.split(b'\n', 1)
+    return line + b'\n'
+
+  def close(self):
+    with self.Lock:
+      if self.Closed:
+        return
+      self.Closed = True
+      kernel32.CancelIoEx(self.Handle, None)
+      kernel32.CloseHandle(self.Handle)
+
+class PlayerCommandQueue:
+
+  Kinds = {0xA0000002: 'stop', 0xA0000004: 'playback', 0xA0000005: 'playback', 0xA0002000: 'seek', 'volume': 'volume'}
+  Barriers = (0xA0000000, 0xA0000002)
+  Settled = ('seek', 'volume')
+  SettleDelay = 0.05
+  SettleMax = 0.2
+
+  def __init__(self, coalesce=True):
+    self.Coalesce = coalesce
+    self.Items = deque()
+    self.Condition = threading.Condition()
+    self.Closed = False
+    self.Woken = False
+    self.Coalesced = 0
+    self.Settle_time = None
+
+  def put(self, code, msg):
+    with self.Condition:
+      if self.Closed:
+        return False
+      kind = self.Kinds.get(code) if self.Coalesce else None
+      if kind:
+        for i in range(len(self.Items) - 1, -1, -1):
+          p_code = self.Items[i][0]
+          if self.Kinds.get(p_code) == kind:
+            del self.Items[i]
+            self.Coalesced += 1
+            break
+          if p_code in self.Barriers:
+            break
+        if kind in self.Settled:
+          self.Settle_time = time.monotonic() + self.SettleDelay
+      self.Items.append((code, msg))
+      self.Condition.notify()
+      return True
+
+  def get_all(self, timeout=None):
+    with self.Condition:
+      if not self.Items and not self.Closed and not self.Woken:
+        self.Condition.wait(timeout)
+      self.Woken = False
+      if self.Settle_time is not None:
+        max_time = time.monotonic() + self.SettleMax
+        while not self.Closed:
+          delay = min(self.Settle_time, max_time) - time.monotonic()
+          if delay <= 0:
+            break
+          self.Condition.wait(delay)
+        self.Settle_time = None
+      items = list(self.Items)
+      self.Items.clear()
+      return items
+
+  def wake(self):
+    with self.Condition:
+      self.Woken = True
+      self.Condition.notify()
+
+  def close(self):
+    with self.Condition:
+      self.Closed = True
+      self.Condition.notify_all()
+
+
+class HousekeepingTask:
+
+  __slots__ = ('Callback', 'Min_interval', 'Max_interval', 'Interval', 'Next_time', 'Paused')
+
+  def __init__(self, callback, min_interval, max_interval, next_time):
+    self.Callback = callback
+    self.Min_interval = min_interval
+    self.Max_interval = max_interval
+    self.Interval = min_interval
+    self.Next_time = next_time
+    self.Paused = False
+
+
+class HousekeepingScheduler:
+
+  def __init__(self, clock=time.monotonic):
+    self.Clock = clock
+    self.Tasks = {}
+    self.Lock = threading.Lock()
+    self.Runs = 0
+
+  def add(self, name, callback, min_interval, max_interval):
+    with self.Lock:
+      self.Tasks[name] = HousekeepingTask(callback, min_interval, max_interval, self.Clock())
+
+  def kick(self, *names):
+    now = self.Clock()
+    with self.Lock:
+      for name in (names or self.Tasks):
+        task = self.Tasks[name]
+        task.Interval = task.Min_interval
+        task.Next_time = now
+
+  def pause(self, name, paused=True):
+    now = self.Clock()
+    with self.Lock:
+      task = self.Tasks[name]
+      if task.Paused and not paused:
+        task.Interval = task.Min_interval
+        task.Next_time = now
+      task.Paused = paused
+
+  def next_delay(self):
+    with self.Lock:
+      next_time = min((task.Next_time for task in self.Tasks.values() if not task.Paused), default=None)
+    return None if next_time is None else max(next_time - self.Clock(), 0)
+
+  def run_due(self):
+    now = self.Clock()
+    with self.Lock:
+      due = [(task, task.Next_time) for task in self.Tasks.values() if not task.Paused and task.Next_time <= now]
+    for task, next_time in due:
+      self.Runs += 1
+      try:
+        active = task.Callback()
+      except:
+        active = False
+      with self.Lock:
+        if task.Next_time == next_time:
+          task.Interval = task.Min_interval if active else min(task.Interval * 2, task.Max_interval)
+          task.Next_time = self.Clock() + task.Interval
+    return self.next_delay()
+
+
+class PlaybackClock:
+
+  DriftInterval = 15
+  MinResyncInterval = 1
+
+  def __init__(self, clock=time.monotonic):
+    self.Clock = clock
+    self.Position = None
+    self.Duration = None
+    self.Running = False
+    self.Ref_time = None
+    self.Sync_time = None
+    self.Request_time = None
+    self.Resync = False
+    self.Drift = 0
+
+  def position(self):
+    if self.Position is None:
+      return None
+    pos = self.Position
+    if self.Running:
+      pos += self.Clock() - self.Ref_time
+    if self.Duration:
+      pos = min(pos, self.Duration)
+    return max(pos, 0)
+
+  def sync(self, position):
+    now = self.Clock()
+    if self.Position is not None and self.Sync_time is not None:
+      self.Drift = position - self.position()
+    self.Position = position
+    self.Ref_time = now
+    self.Sync_time = now
+    self.Request_time = None
+    self.Resync = False
+
+  def set_running(self, running):
+    if running != self.Running:
+      self.Position = self.position()
+      self.Ref_time = self.Clock()
+      self.Running = running
+    self.Resync = True
+
+  def reset(self):
+    self.Position = None
+    self.Running = False
+    self.Ref_time = None
+    self.Sync_time = None
+    self.Request_time = None
+    self.Resync = False
+    self.Drift = 0
+
+  def request_resync(self):
+    if self.Resync or (self.Sync_time is not None and self.Clock() - self.Sync_time < self.MinResyncInterval):
+      return False
+    self.Resync = True
+    return True
+
+  def request_sent(self):
+    self.Request_time = self.Clock()
+
+  def resync_due(self):
+    if self.Request_time is not None and self.Clock() - self.Request_time < self.MinResyncInterval:
+      return False
+    if self.Resync:
+      return True
+    return self.Running and self.Sync_time is not None and self.Clock() - self.Sync_time >= self.DriftInterval
+
+
+class PlayerEvent:
+
+  __slots__ = ('Seq', 'Time', 'Name', 'Value')
+
+  def __init__(self, seq, name, value):
+    self.Seq = seq
+    self.Time = time.monotonic()
+    self.Name = name
+    self.Value = value
+
+
+class PlayerEventBuffer:
+
+  def __init__(self, capacity=256):
+    self.Capacity = capacity
+    self.Records = deque()
+    self.Lock = threading.Lock()
+    self.Seq = 0
+    self.Consumed_seq = 0
+    self.Overwritten = 0
+    self.Dropped = 0
+    self.Last_lag = 0
+    self.Max_lag = 0
+
+  def __len__(self):
+    return len(self.Records)
+
+  def append(self, event):
+    with self.Lock:
+      self.Seq += 1
+      record = PlayerEvent(self.Seq, *event)
+      if len(self.Records) >= self.Capacity:
+        stale = next((i for i in range(len(self.Records) - 1, -1, -1) if self.Records[i].Name == record.Name), None)
+        if stale is None:
+          names = set()
+          for i in range(len(self.Records) - 1, -1, -1):
+            if self.Records[i].Name in names:
+              stale = i
+            names.add(self.Records[i].Name)
+        if stale is not None:
+          del self.Records[stale]
+          self.Overwritten += 1
+        else:
+          self.Records.popleft()
+          self.Dropped += 1
+      self.Records.append(record)
+    return record
+
+  def pop_all(self):
+    with self.Lock:
+      records = list(self.Records)
+      self.Records.clear()
+    if records:
+      self.Consumed_seq = records[-1].Seq
+      self.Last_lag = time.monotonic() - records[0].Time
+      self.Max_lag = max(self.Max_lag, self.Last_lag)
+    return records
+
+  def lag(self):
+    with self.Lock:
+      return (time.monotonic() - self.Records[0].Time) if self.Records else 0
+
+  def clear(self):
+    with self.Lock:
+      self.Records.clear()
+
+
+class PlayerBackend(threading.Thread, metaclass=abc.ABCMeta):
+
+  PushedState = False
+  WindowCheck = 1
+
+  def __init__(self, title_name='player', verbosity=0):
+    self.verbosity = verbosity
+    self.logger = log_event(verbosity)
+    self.title_name = title_name
+    threading.Thread.__init__(self)
+    self.Cmd_queue = PlayerCommandQueue()
+    self.Msg_queue = PlayerCommandQueue(coalesce=False)
+    self.Player_events = PlayerEventBuffer()
+    self.Player_status = "NO_MEDIA_PRESENT"
+    self.Player_clock = PlaybackClock()
+    self.Player_duration = ""
+    self.Player_mute = False
+    self.mute_changed = False
+    self.Player_volume = 0
+    self.Player_paused = True
+    self.Player_image = False
+    self.Player_fullscreen = False
+    self.Player_rotation = 0
+    self.Player_subtitles = ""
+    self.Player_next = False
+    self.Player_title = ""
     self.stopped_received = False
     self.Player_event_event = threading.Event()
+    self.Housekeeping = HousekeepingScheduler()
+    self.Housekeeping.add('title', self._title_task, 0.25, 0.25)
+    self.Housekeeping.add('position', self._position_task, 0.5, 5)
+    self.Housekeeping.add('mixer', self._mixer_task, 0.5, 60)
+
+  def launched(self):
+    return False
+
+  def ready(self):
+    return False
+
+  def open(self, uri):
+    self.Cmd_queue.put(0xA0000000, uri)
+
+  def play(self):
+    self.Cmd_queue.put(0xA0000004, '')
+
+  def pause(self):
+    self.Cmd_queue.put(0xA0000005, '')
+
+  def stop_playback(self):
+    self.Cmd_queue.put(0xA0000002, '')
+
+  def seek(self, position):
+    self.Cmd_queue.put(0xA0002000, str(position))
+
+  def set_volume(self, volume):
+    self.Cmd_queue.put('volume', volume)
+
+  def set_mute(self, mute):
+    if not self.ready():
+      return
+    self.send_mute(mute)
+    self.mute_changed = True
+    self.Housekeeping.kick('mixer')
+    self.Cmd_queue.wake()
+
+  @abc.abstractmethod
+  def send_command(self, cmd_code, cmd_msg):
+    pass
+
+  def close_player(self):
+    pass
+
+  def send_minimize(self):
+    pass
+
+  def send_restore(self):
+    pass
+
+  def send_fullscreen(self):
+    pass
+
+  def is_minimized(self):
+    return False
+
+  def send_subtitles(self, uri):
+    pass
+
+  def send_rotate(self, rotation):
+    pass
+
+  def set_title(self, title):
+    pass
+
+  def get_mute(self):
+    return None
+
+  def send_mute(self, mute):
+    pass
+
+  def get_volume(self):
+    return None
+
+  def send_volume(self, volume):
+    pass
+
+  def _record(self, event, level):
+    self.Player_events.append(event)
+    self.logger.log('Lecteur - événement enregistré: %s = "%s"' % event, level)
+
+  def _set_status(self, status, level=1):
+    self.Player_status = status
+    self._record(PlayerBackend.TransportEvents[status], level)
+
+  def _not_stopped(self, not_msg):
+    self._set_status("STOPPED")
+    self.Player_clock.reset()
+    self.stopped_received = time.time()
+
+  def _not_transitioning(self, not_msg):
+    self.Player_clock.reset()
+    self.Player_clock.Duration = None
+    self.Player_duration = ""
+    self._set_status("TRANSITIONING", 2)
+
+  def _not_opened(self, not_msg):
+    self.set_title(self.title_name + ' - ' + self.Player_title)
+    if self.Player_subtitles:
+      self.send_subtitles(self.Player_subtitles)
+    if self.Player_image:
+       self.send_rotate(self.Player_rotation)
+
+  def _not_error(self, not_msg):
+    self._record(('TransportStatus', "ERROR_OCCURRED"), 2)
+
+  def _not_playing(self, not_msg):
+    self.Player_paused = False
+    self.Player_clock.set_running(True)
+    self._set_status("PLAYING")
+    if self.Player_image:
+      self.send_command(0xA0000005, '')
+
+  def _not_paused(self, not_msg):
+    self.Player_paused = True
+    self.Player_clock.set_running(False)
+    if self.Player_status == "PLAYING" and not self.Player_image:
+      self._set_status("PAUSED_PLAYBACK")
+
+  def _not_play_stopped(self, not_msg):
+    self.Player_clock.reset()
+    self._set_status("STOPPED")
+
+  def _not_duration(self, not_msg):
+    durat = not_msg.rsplit('|')[-1]
+    if durat:
+      try:
+        durat_sec = int(float(durat))
+        self.Player_clock.Duration = durat_sec
+        durat = '%d:%02d:%02d' % (durat_sec // 3600, (durat_sec % 3600) // 60, durat_sec % 60)
+        if self.Player_duration != durat:
+          self.Player_duration = durat
+          self._record(('CurrentMediaDuration', durat), 1)
+      except:
+        pass
+
+  def _not_position(self, not_msg):
+    if not not_msg:
+      self.Player_clock.reset()
+      return
+    try:
+      self.Player_clock.sync(float(not_msg))
+      self.logger.log('Lecteur - position synchronisée: %.3f s - dérive: %.3f s' % (self.Player_clock.Position, self.Player_clock.Drift), 2)
+    except:
+      pass
+
+  def _not_seek(self, not_msg):
+    if not not_msg:
+      self.Player_clock.reset()
+      return
+    self._set_status("TRANSITIONING", 2)
+    self._not_position(not_msg)
+    self._set_status("PAUSED_PLAYBACK" if self.Player_paused else "PLAYING", 2)
+
+  def _not_end(self, not_msg):
+    if self.Player_image:
+      self.Player_paused = False
+      self._set_status("PLAYING")
+      if self.Player_fullscreen:
+        time.sleep(0.1)
+        self.send_fullscreen()
+    elif self.Player_next:
+      self._record(('EndOfMedia', ''), 1)
+    else:
+      self.send_command(0xA0000002, '')
+
+  TransportEvents = {status: ('TransportState', status) for status in ("STOPPED", "TRANSITIONING", "PLAYING", "PAUSED_PLAYBACK")}
+  NotificationHandlers = {
+    (0x50000001, '0'): _not_stopped,
+    (0x50000001, '1'): _not_transitioning,
+    (0x50000001, '2'): _not_opened,
+    (0x50000001, '4'): _not_error,
+    (0x50000002, '0'): _not_playing,
+    (0x50000002, '1'): _not_paused,
+    (0x50000002, '2'): _not_play_stopped,
+    (0x50000003, None): _not_duration,
+    (0x50000007, None): _not_position,
+    (0x50000008, None): _not_seek,
+    (0x50000009, None): _not_end
+  }
+  StateNotifications = (0x50000001, 0x50000002, 0x50000008)
+  LatestOnlyNotifications = (0x50000003, 0x50000007)
+
+  def dispatch_notifications(self, notifications):
+    recorded = self.Player_events.Seq
+    state_changed = False
+    latest = {}
+    for i, (not_code, not_msg) in enumerate(notifications):
+      if not_code in PlayerBackend.LatestOnlyNotifications:
+        latest[not_code] = i
+    for i, (not_code, not_msg) in enumerate(notifications):
+      if not not_code or latest.get(not_code, i) != i:
+        continue
+      handler = PlayerBackend.NotificationHandlers.get((not_code, not_msg)) or PlayerBackend.NotificationHandlers.get((not_code, None))
+      if not handler:
+        continue
+      if not_code in PlayerBackend.StateNotifications:
+        state_changed = True
+      handler(self, not_msg)
+    if self.Player_events.Seq != recorded:
+      self.Player_event_event.set()
+    return state_changed
 
   def manage_incoming_msg(self):
-    while self.Msg_buffer[0] == "run":
-      while len(self.Msg_buffer) > 1:
-        self.Msg_event.clear()
-        not_code, not_msg = self.Msg_buffer.pop(1)
-        if not not_code:
+    while not self.Msg_queue.Closed:
+      if self.dispatch_notifications(self.Msg_queue.get_all()):
+        self.Housekeeping.kick()
+        self.Cmd_queue.wake()
+
+  def get_time_pos(self):
+    time_sec = self.Player_clock.position()
+    if time_sec is None:
+      return ""
+    time_sec = int(time_sec)
+    return '%d:%02d:%02d' % (time_sec // 3600, (time_sec % 3600) // 60, time_sec % 60)
+
+  def request_time_pos(self):
+    if self.Player_status in ("PLAYING", "PAUSED_PLAYBACK") and self.Player_clock.request_resync():
+      self.Housekeeping.kick('position')
+      self.Cmd_queue.wake()
+    return self.get_time_pos()
+
+  def _title_task(self):
+    if self.stopped_received:
+      if self.Player_status == "STOPPED":
+        self.set_title(self.title_name)
+        if time.time() - self.stopped_received >= 0.5:
+          self.stopped_received = False
+        if self.Player_status != "STOPPED":
+          self.set_title(self.title_name + ' - ' + self.Player_title)
+      else:
+        self.stopped_received = False
+    return bool(self.stopped_received)
+
+  def _position_task(self):
+    if self.Player_clock.resync_due():
+      self.Player_clock.request_sent()
+      self.send_command(0xA0003004, '')
+      return True
+    return False
+
+  def _mixer_task(self):
+    changed = self.mute_changed
+    self.mute_changed = False
+    t = self.get_mute()
+    if t != None and t != self.Player_mute:
+      changed = True
+      self.Player_mute = t
+      self.Player_events.append(('Mute', self.Player_mute))
+      self.Player_event_event.set()
+      self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('Mute', self.Player_mute), 2)
+    t = self.get_volume()
+    if t != None and t != self.Player_volume:
+      changed = True
+      self.Player_volume = t
+      self.Player_events.append(('Volume', self.Player_volume))
+      self.Player_event_event.set()
+      self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('Volume', self.Player_volume), 2)
+    return changed
+
+  def send_commands(self):
+    timeout = 0
+    while True:
+      cmds = self.Cmd_queue.get_all(timeout)
+      for cmd_code, cmd_msg in cmds:
+        if not cmd_code:
           continue
-        if not_code == 0x50000001:
-          if not_msg == '0':
-            self.Player_status = "STOPPED"
-            self.Player_events.append(('TransportState', "STOPPED"))
-            self.Player_time_pos = ""
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "STOPPED"), 1)
-            self.stopped_received = time.time()
-          elif not_msg == '1':
-            self.Player_time_pos = ""
-            self.Player_duration = ""
-            self.Player_status = "TRANSITIONING"
-            self.Player_events.append(('TransportState', "TRANSITIONING"))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "TRANSITIONING"), 2)
-          elif not_msg == '2':
-            self.set_title(self.title_name + ' - ' + self.Player_title)
-            if self.Player_subtitles:
-              self.send_subtitles(self.Player_subtitles)
-            if self.Player_image:
-               self.send_rotate(self.Player_rotation)
-          elif not_msg == '4':
-            self.Player_events.append(('TransportStatus', "ERROR_OCCURRED"))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportStatus', "ERROR_OCCURRED"), 2)
-        elif not_code == 0x50000002:
-          if not_msg == '0':
-            self.Player_paused = False
-            self.Player_status = "PLAYING"
-            self.Player_events.append(('TransportState', "PLAYING"))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PLAYING"), 1)
-            if self.Player_image:
-              self.send_command(0xA0000005, '')
-          elif not_msg == '1':
-            self.Player_paused = True
-            if self.Player_status == "PLAYING" and not self.Player_image:
-              self.Player_status = "PAUSED_PLAYBACK"
-              self.Player_events.append(('TransportState', "PAUSED_PLAYBACK"))
-              self.Player_event_event.set()
-              self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PAUSED_PLAYBACK"), 1)
-          elif not_msg == '2':
-            self.Player_status = "STOPPED"
-            self.Player_events.append(('TransportState', "STOPPED"))
-            self.Player_time_pos = ""
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "STOPPED"), 1)
-        elif not_code == 0x50000003:
-          durat = not_msg.rsplit('|')[-1]
-          if durat:
-            try:
-              durat_sec = int(float(durat))
-              durat = '%d:%02d:%02d' % (durat_sec // 3600, (durat_sec % 3600) // 60, durat_sec % 60)
-              if self.Player_duration != durat:
-                self.Player_duration = durat
-                self.Player_events.append(('CurrentMediaDuration', durat))
-                self.Player_event_event.set()
-                self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('CurrentMediaDuration', durat), 1)
-            except:
-              pass
-        elif not_code == 0x50000007 or not_code == 0x50000008:
-          if not_msg:
-            if not_code == 0x50000008:
-              self.Player_status = "TRANSITIONING"
-              self.Player_events.append(('TransportState', "TRANSITIONING"))
-              self.Player_event_event.set()
+        if cmd_code == 'volume':
+          self.send_volume(cmd_msg)
+        else:
+          if cmd_code == 0xA0002000:
             try:
-              time_sec = int(float(not_msg))
-              time_pos = '%d:%02d:%02d' % (time_sec // 3600, (time_sec % 3600) // 60, time_sec % 60)
-              if self.Player_time_pos != time_pos:
-                self.Player_time_pos = time_pos
-                self.Player_events.append(('RelativeTimePosition', time_pos))
-                self.Player_event_event.set()
-                self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('RelativeTimePosition', time_pos), 2)
+              self.Player_clock.sync(float(cmd_msg))
+              self.Player_clock.Resync = True
             except:
               pass
-            if not_code == 0x50000008:
-              if self.Player_paused:
-                self.Player_status = "PAUSED_PLAYBACK"
-                self.Player_events.append(('TransportState', "PAUSED_PLAYBACK"))
-                self.Player_event_event.set()
-              else:
-                self.Player_status = "PLAYING"
-                self.Player_events.append(('TransportState', "PLAYING"))
-                self.Player_event_event.set()
-          else:
-            self.Player_time_pos = ""
-            self.Player_events.append(('RelativeTimePosition', ""))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('RelativeTimePosition', ''), 2)
-        elif not_code == 0x50000009:
-          if self.Player_image:
-            self.Player_paused = False
-            self.Player_status = "PLAYING"
-            self.Player_events.append(('TransportState', "PLAYING"))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PLAYING"), 1)
-            if self.Player_fullscreen:
-              time.sleep(0.1)
-              self.send_fullscreen()
+          self.send_command(cmd_code, cmd_msg)
+      if self.Cmd_queue.Closed:
+        break
+      if any(cmd_code != 0xA0003004 for cmd_code, cmd_msg in cmds):
+        self.Housekeeping.kick()
+      playing = self.Player_status == "PLAYING" or self.Player_status == "PAUSED_PLAYBACK"
+      self.Housekeeping.pause('title', not self.stopped_received)
+      self.Housekeeping.pause('position', self.PushedState or not playing)
+      minimized = not self.PushedState and not playing and self.is_minimized()
+      self.Housekeeping.pause('mixer', self.PushedState or minimized)
+      timeout = self.Housekeeping.run_due()
+      if minimized:
+        timeout = PlayerBackend.WindowCheck if timeout is None else min(timeout, PlayerBackend.WindowCheck)
+    self.Msg_queue.close()
+    self.close_player()
+
+
+class IPCmpcControler(PlayerBackend):
+
+  SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+  def _PyWndProcedure(self, hWnd, uMsg, wParam, lParam):
+      self.logger.log('Fenêtre de contrôle - message reçu: %s' % hex(uMsg), 2)
+      if uMsg == 0x4A:
+        copydata = ctypes.cast(lParam, LPCOPYDATA).contents
+        not_code = copydata.dwData
+        not_msg = ctypes.wstring_at(copydata.lpData, max(copydata.cbData // 2 - 1, 0))
+        self.logger.log('Lecteur - notification reçue - code:%s - message:%s' % (hex(not_code), not_msg), 2)
+        if not_code == 0x50000000:
+          self.wnd_mpc = int(not_msg)
+          self.logger.log('Lecteur - handle de mpc: %s' % self.wnd_mpc, 1)
+          self.Player_event_event.set()
+          self.wnd_mpc_mute = user32.FindWindowExW(self.wnd_mpc, None, 'ToolbarWindow32', None)
+          self.wnd_mpc_volume = user32.FindWindowExW(self.wnd_mpc_mute, None, 'msctls_trackbar32', None)
+          self.set_title(self.title_name)
+        else:
+          if not_code == 0x5000000B:
+            self.Msg_queue.close()
+            user32.PostMessageW(self.wnd_ctrl, 0x0012, 0, 0)
           else:
-            self.send_command(0xA0000002, '')
-      if self.Msg_buffer[0] == "run":
-        self.Msg_event.wait()
+            self.Msg_queue.put(not_code, not_msg)
+      return user32.DefWindowProcW(hWnd, uMsg, wParam, lParam)
+
+  def __init__(self, title_name='mpc', verbosity=0):
+    PlayerBackend.__init__(self, title_name, verbosity)
+    self.WndProc = WNDPROC(self._PyWndProcedure)
+    self.wnd_ctrl = None
+    self.wnd_mpc = None
+    self.wnd_mpc_mute = None
+    self.wnd_mpc_volume = None
+
+  def launched(self):
+    return bool(self.wnd_ctrl)
+
+  def ready(self):
+    return bool(self.wnd_mpc)
 
   def run_mpc(self):
     self.logger.log('Lecteur - lancement', 1)
@@ -825,10 +2739,9 @@ class IPCmpcControler(threading.Thread):
         self.Player_events.append(('TransportState', "STOPPED"))
     else:
       self.logger.log(LSTRINGS['player_failure'], 0)
-    self.Cmd_buffer[0] = "quit"
-    self.Msg_buffer[0] = "quit"
+    self.Cmd_queue.close()
+    self.Msg_queue.close()
     self.Player_event_event.set()
-    self.Cmd_Event.set()
 
   def send_command(self, cmd_code, cmd_msg):
     if not self.wnd_mpc:
@@ -838,6 +2751,9 @@ class IPCmpcControler(threading.Thread):
     user32.SendMessageW(self.wnd_mpc, 0x4a, self.wnd_ctrl, ctypes.addressof(copydata))
     self.logger.log('Lecteur - commande envoyée - code:%s - message:%s' % (hex(cmd_code), cmd_msg), 2)
 
+  def close_player(self):
+    self.send_command(0xA0004006, '')
+
   def send_key(self, key_code):
     if not self.wnd_mpc:
       return
@@ -864,6 +2780,9 @@ class IPCmpcControler(threading.Thread):
       self.send_command(0xA0004000, '')
     user32.SetForegroundWindow(self.wnd_mpc)
 
+  def is_minimized(self):
+    return bool(self.wnd_mpc) and bool(user32.IsIconic(self.wnd_mpc))
+
   def send_subtitles(self, uri):
     if not self.wnd_mpc:
       return
@@ -892,21 +2811,20 @@ class IPCmpcControler(threading.Thread):
       return
     return True if user32.SendMessageW(self.wnd_mpc_mute, 0x40a, 909, 0) else False
 
-  def set_mute(self, mute):
+  def send_mute(self, mute):
     if not self.wnd_mpc:
       return
     if self.get_mute() != mute:
       self.send_key(909)
       self.send_key(819)
       self.send_key(819)
-    self.mute_changed = True
 
   def get_volume(self):
     if not self.wnd_mpc:
       return
     return user32.SendMessageW(self.wnd_mpc_volume, 0x400, 909, 0)
 
-  def set_volume(self, volume):
+  def send_volume(self, volume):
     if not self.wnd_mpc:
       return
     user32.SendMessageW(self.wnd_mpc_volume, 0x422, 0, volume)
@@ -921,83 +2839,442 @@ class IPCmpcControler(threading.Thread):
     elif rotation == 180:
       self.send_key(878)
 
-  def set_title(self, title):
-    if not self.wnd_mpc:
-      return
-    user32.SetWindowTextW(self.wnd_mpc, title)
+  def set_title(self, title):
+    if not self.wnd_mpc:
+      return
+    user32.SetWindowTextW(self.wnd_mpc, title)
+
+  def run(self):
+    hInst = kernel32.GetModuleHandleW(None)
+    wclassName = 'mpcControler'
+    wname = 'mpcControl'
+    wndClass = WNDCLASSEXW(ctypes.sizeof(WNDCLASSEXW), 3, self.WndProc, 0, 0, hInst, 0, 0, 0, 0, LPCWSTR(wclassName), 0)
+    regRes = user32.RegisterClassExW(ctypes.byref(wndClass))
+    self.wnd_ctrl = user32.CreateWindowExW(0, wclassName, wname, 0x40000000, 0, 0, 0, 0, -3, 0, hInst, None)
+    if not self.wnd_ctrl:
+      self.logger.log(LSTRINGS['wndctrl_fail'], 0)
+      self.Msg_queue.close()
+      self.Player_event_event.set()
+      return
+    self.logger.log('Création de la fenêtre de contrôle: %s' % self.wnd_ctrl, 1)
+    self.mpc_thread = threading.Thread(target=self.run_mpc)
+    self.mpc_thread.start()
+    self.incoming_msg_thread = threading.Thread(target=self.manage_incoming_msg)
+    self.incoming_msg_thread.start()
+    self.cmd_thread = threading.Thread(target=self.send_commands)
+    self.cmd_thread.start()
+    msg = MSG()
+    lpMsg = pointer(msg)
+    while not self.Msg_queue.Closed and not self.Cmd_queue.Closed:
+      user32.GetMessageW(lpMsg, self.wnd_ctrl, 0, 0)
+      user32.DispatchMessageW(lpMsg)
+
+  def stop(self):
+    self.Cmd_queue.close()
+    user32.PostMessageW(self.wnd_ctrl, 0x0012, 0, 0)
+
+
+class IPCmpvControler(PlayerBackend):
+
+  PushedState = True
+  ObservedProperties = ('time-pos', 'duration', 'pause', 'mute', 'volume', 'idle-active')
+  PositionTolerance = 0.25
+
+  def __init__(self, title_name='mpv', verbosity=0, mpv_path='mpv', ipc_path=None, launch=True):
+    PlayerBackend.__init__(self, title_name, verbosity)
+    self.Mpv_path = mpv_path
+    if ipc_path:
+      self.Ipc_path = ipc_path
+    elif os.name == 'nt':
+      self.Ipc_path = r'\\.\pipe\mpv_' + urllib.parse.quote(title_name, safe='')
+    else:
+      self.Ipc_path = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'mpv_%s_%s' % (urllib.parse.quote(title_name, safe=''), os.getpid()))
+    self.Launch = launch
+    self.Mpv_process = None
+    self.Mpv_conn = None
+    self.Mpv_reader = None
+    self.Mpv_lock = threading.Lock()
+    self.Mpv_request_id = 0
+    self.Mpv_position_requests = set()
+    self.Mpv_ready = False
+    self.Mpv_closed = False
+    self.Mpv_idle = True
+    self.Mpv_seeking = False
+    self.Mpv_pause = False
+    self.Mpv_mute = None
+    self.Mpv_volume = None
+
+  def launched(self):
+    return self.Mpv_process is not None or self.Mpv_conn is not None
+
+  def ready(self):
+    return self.Mpv_ready
+
+  def _connect(self):
+    for i in range(40):
+      if self.Mpv_process and self.Mpv_process.poll() is not None:
+        return False
+      try:
+        if self.Ipc_path.startswith('\\\\'):
+          self.Mpv_conn = OverlappedPipe(self.Ipc_path)
+          self.Mpv_reader = self.Mpv_conn
+        else:
+          sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+          sock.connect(self.Ipc_path)
+          self.Mpv_conn = sock
+          self.Mpv_reader = sock.makefile('rb')
+        return True
+      except:
+        time.sleep(0.25)
+    return False
+
+  def _send(self, *command):
+    if not self.Mpv_conn or self.Mpv_closed:
+      return None
+    with self.Mpv_lock:
+      self.Mpv_request_id += 1
+      request_id = self.Mpv_request_id
+      data = json.dumps({'command': command, 'request_id': request_id}).encode('utf-8') + b'\n'
+      try:
+        if isinstance(self.Mpv_conn, socket.socket):
+          self.Mpv_conn.sendall(data)
+        else:
+          self.Mpv_conn.write(data)
+      except:
+        return None
+    self.logger.log('Lecteur - commande envoyée: %s' % json.dumps(command), 2)
+    return request_id
+
+  def send_command(self, cmd_code, cmd_msg):
+    if cmd_code == 0xA0000000:
+      self._send('loadfile', cmd_msg, 'replace')
+    elif cmd_code == 0xA0000004:
+      self._send('set_property', 'pause', False)
+    elif cmd_code == 0xA0000005:
+      self._send('set_property', 'pause', True)
+    elif cmd_code == 0xA0000002:
+      self._send('stop')
+    elif cmd_code == 0xA0002000:
+      try:
+        self._send('seek', float(cmd_msg), 'absolute')
+      except:
+        pass
+    elif cmd_code == 0xA0003004:
+      request_id = self._send('get_property', 'time-pos')
+      if request_id:
+        self.Mpv_position_requests.add(request_id)
+    elif cmd_code == 0xA0004000:
+      self._send('set_property', 'fullscreen', True)
+
+  def close_player(self):
+    if self.Mpv_process:
+      self._send('quit')
+    self.Mpv_closed = True
+    try:
+      if isinstance(self.Mpv_conn, socket.socket):
+        self.Mpv_conn.shutdown(socket.SHUT_RDWR)
+      else:
+        self.Mpv_conn.close()
+    except:
+      pass
+
+  def send_fullscreen(self):
+    self.send_command(0xA0004000, '')
+
+  def send_subtitles(self, uri):
+    self._send('sub-add', uri, 'select')
+
+  def send_rotate(self, rotation):
+    self._send('set_property', 'video-rotate', rotation)
+
+  def set_title(self, title):
+    self._send('set_property', 'title', title)
+
+  def get_mute(self):
+    return self.Mpv_mute
+
+  def send_mute(self, mute):
+    self._send('set_property', 'mute', mute)
+
+  def get_volume(self):
+    return self.Mpv_volume
+
+  def send_volume(self, volume):
+    self._send('set_property', 'volume', volume)
+
+  def _property_changed(self, name, value):
+    if name == 'time-pos':
+      if value is None or self.Mpv_idle:
+        return
+      if self.Mpv_seeking:
+        self.Mpv_seeking = False
+        self.Msg_queue.put(0x50000008, str(value))
+      else:
+        pos = self.Player_clock.position()
+        if pos is None or abs(pos - value) > IPCmpvControler.PositionTolerance:
+          self.Msg_queue.put(0x50000007, str(value))
+    elif name == 'duration':
+      if value:
+        self.Msg_queue.put(0x50000003, str(value))
+    elif name == 'pause':
+      self.Mpv_pause = bool(value)
+      if not self.Mpv_idle:
+        self.Msg_queue.put(0x50000002, '1' if value else '0')
+    elif name == 'idle-active':
+      if value and not self.Mpv_idle:
+        self.Msg_queue.put(0x50000002, '2')
+      self.Mpv_idle = bool(value)
+    elif name == 'mute':
+      if value is not None and value != self.Player_mute:
+        self.Mpv_mute = self.Player_mute = bool(value)
+        self._record(('Mute', self.Player_mute), 2)
+        self.Player_event_event.set()
+    elif name == 'volume':
+      if value is not None and int(round(value)) != self.Player_volume:
+        self.Mpv_volume = self.Player_volume = int(round(value))
+        self._record(('Volume', self.Player_volume), 2)
+        self.Player_event_event.set()
+
+  def _process_message(self, msg):
+    event = msg.get('event')
+    if event is None:
+      if msg.get('request_id') in self.Mpv_position_requests:
+        self.Mpv_position_requests.discard(msg['request_id'])
+        if msg.get('error') == 'success' and msg.get('data') is not None:
+          self.Msg_queue.put(0x50000007, str(msg['data']))
+      return
+    if event == 'property-change':
+      self._property_changed(msg.get('name'), msg.get('data'))
+    elif event == 'start-file':
+      self.Mpv_idle = False
+      self.Msg_queue.put(0x50000001, '1')
+    elif event == 'file-loaded':
+      self.Msg_queue.put(0x50000001, '2')
+      self.Msg_queue.put(0x50000002, '1' if self.Mpv_pause else '0')
+    elif event == 'seek':
+      self.Mpv_seeking = True
+    elif event == 'end-file':
+      reason = msg.get('reason')
+      if reason == 'eof':
+        self.Msg_queue.put(0x50000009, '')
+      elif reason == 'error':
+        self.Msg_queue.put(0x50000001, '4')
+
+  def run(self):
+    self.logger.log('Lecteur - lancement', 1)
+    if self.Launch:
+      try:
+        self.Mpv_process = subprocess.Popen([self.Mpv_path, '--idle=yes', '--force-window=yes', '--keep-open=no', '--input-ipc-server=' + self.Ipc_path, '--title=' + self.title_name])
+      except:
+        self.Mpv_process = None
+    if (self.Launch and not self.Mpv_process) or not self._connect():
+      self.logger.log(LSTRINGS['player_failure'], 0)
+      self.Cmd_queue.close()
+      self.Msg_queue.close()
+      self.Player_event_event.set()
+      return
+    for prop_id, prop_name in enumerate(IPCmpvControler.ObservedProperties, 1):
+      self._send('observe_property', prop_id, prop_name)
+    self.set_title(self.title_name)
+    self.Mpv_ready = True
+    self.Player_event_event.set()
+    self.incoming_msg_thread = threading.Thread(target=self.manage_incoming_msg)
+    self.incoming_msg_thread.start()
+    self.cmd_thread = threading.Thread(target=self.send_commands)
+    self.cmd_thread.start()
+    while True:
+      try:
+        line = self.Mpv_reader.readline()
+      except:
+        line = b''
+      if not line:
+        break
+      try:
+        msg = json.loads(line)
+      except:
+        continue
+      self.logger.log('Lecteur - message reçu: %s' % line.decode('utf-8', 'replace').rstrip(), 2)
+      self._process_message(msg)
+    self.logger.log('Lecteur: fermeture', 1)
+    if self.Player_status != "STOPPED":
+      self.Player_status = "STOPPED"
+      self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "STOPPED"), 1)
+      self.Player_events.append(('TransportState', "STOPPED"))
+    self.Mpv_ready = False
+    self.Cmd_queue.close()
+    self.Msg_queue.close()
+    self.Player_event_event.set()
+    try:
+      self.Mpv_conn.close()
+    except:
+      pass
+
+  def stop(self):
+    self.Cmd_queue.close()
+
+
+class SimulatedPlayer(PlayerBackend):
+
+  def __init__(self, title_name='simulated', verbosity=0, open_latency=0.2, command_latency=0.02, media_duration=600):
+    PlayerBackend.__init__(self, title_name, verbosity)
+    self.Open_latency = open_latency
+    self.Command_latency = command_latency
+    self.Media_duration = media_duration
+    self.Sim_clock = PlaybackClock()
+    self.Sim_volume = 50
+    self.Sim_mute = False
+    self.Sim_minimized = False
+    self.Sim_pending = []
+    self.Sim_condition = threading.Condition()
+    self.Sim_seq = 0
+    self.Sim_gen = 0
+    self.Sim_loaded_time = 0
+    self.Sim_running = False
+
+  def launched(self):
+    return self.Sim_running
+
+  def ready(self):
+    return self.Sim_running
+
+  def _emit(self, due_time, action, *args):
+    with self.Sim_condition:
+      self.Sim_seq += 1
+      heapq.heappush(self.Sim_pending, (due_time, self.Sim_seq, action, args))
+      self.Sim_condition.notify()
+
+  def _schedule_end(self):
+    self.Sim_gen += 1
+    if self.Sim_clock.Running:
+      self._emit(time.monotonic() + max(self.Media_duration - self.Sim_clock.position(), 0), self._sim_end, self.Sim_gen)
+
+  def _sim_open(self, uri):
+    self.Sim_gen += 1
+    self.Sim_clock.reset()
+    return ((0x50000001, '1'),)
+
+  def _sim_loaded(self, uri):
+    self.Sim_clock.sync(0)
+    self.Sim_clock.Duration = self.Media_duration
+    return ((0x50000003, '|||%s|%.3f' % (uri, self.Media_duration)), (0x50000001, '2'))
+
+  def _sim_play(self):
+    if self.Sim_clock.Position is None:
+      return ()
+    self.Sim_clock.set_running(True)
+    self._schedule_end()
+    return ((0x50000002, '0'),)
+
+  def _sim_pause(self):
+    if self.Sim_clock.Position is None:
+      return ()
+    self.Sim_clock.set_running(False)
+    self.Sim_gen += 1
+    return ((0x50000002, '1'),)
+
+  def _sim_stop(self):
+    if self.Sim_clock.Position is None:
+      return ()
+    self.Sim_clock.set_running(False)
+    self.Sim_clock.sync(0)
+    self.Sim_gen += 1
+    return ((0x50000002, '2'),)
+
+  def _sim_seek(self, position):
+    if self.Sim_clock.Position is None:
+      return ()
+    self.Sim_clock.sync(min(position, self.Media_duration))
+    self._schedule_end()
+    return ((0x50000008, '%.3f' % self.Sim_clock.position()),)
+
+  def _sim_position(self):
+    pos = self.Sim_clock.position()
+    return ((0x50000007, '' if pos is None else '%.3f' % pos),)
+
+  def _sim_end(self, gen):
+    if gen != self.Sim_gen or not self.Sim_clock.Running:
+      return ()
+    self.Sim_clock.set_running(False)
+    return ((0x50000009, ''),)
+
+  def send_command(self, cmd_code, cmd_msg):
+    if not self.Sim_running:
+      return
+    now = time.monotonic()
+    due_time = max(now + self.Command_latency, self.Sim_loaded_time)
+    if cmd_code == 0xA0000000:
+      self.Sim_loaded_time = now + self.Open_latency
+      self._emit(now, self._sim_open, cmd_msg)
+      self._emit(self.Sim_loaded_time, self._sim_loaded, cmd_msg)
+    elif cmd_code == 0xA0000004:
+      self._emit(due_time, self._sim_play)
+    elif cmd_code == 0xA0000005:
+      self._emit(due_time, self._sim_pause)
+    elif cmd_code == 0xA0000002:
+      self._emit(due_time, self._sim_stop)
+    elif cmd_code == 0xA0002000:
+      try:
+        self._emit(due_time, self._sim_seek, float(cmd_msg))
+      except:
+        pass
+    elif cmd_code == 0xA0003004:
+      self._emit(now + self.Command_latency, self._sim_position)
+    self.logger.log('Lecteur simulé - commande reçue - code:%s - message:%s' % (hex(cmd_code), cmd_msg), 2)
+
+  def send_minimize(self):
+    self.Sim_minimized = True
+
+  def send_restore(self):
+    self.Sim_minimized = False
 
-  def send_commands(self):
-    iter = 0
-    while self.Cmd_buffer[0] == "run":
-      self.Cmd_Event.clear()
-      while len(self.Cmd_buffer) > 1:
-        cmd_code, cmd_msg = self.Cmd_buffer.pop(1)
-        if not cmd_code:
-          continue
-        self.send_command(cmd_code, cmd_msg)
-      if self.Cmd_buffer[0] == "run":
-        if self.Player_status == "PLAYING" or self.Player_status == "PAUSED_PLAYBACK":
-          self.send_command(0xA0003004, '')
-        if self.stopped_received:
-          if self.Player_status == "STOPPED":
-            self.set_title(self.title_name)
-            if time.time() - self.stopped_received >= 0.5:
-              self.stopped_received = False
-            if self.Player_status != "STOPPED":
-              self.set_title(self.title_name + ' - ' + self.Player_title)
-          else:
-            self.stopped_received = False
-        if self.mute_changed or not iter:
-          t = self.get_mute()
-          if t != None and t != self.Player_mute:
-            self.mute_changed = False
-            self.Player_mute = t
-            self.Player_events.append(('Mute', self.Player_mute))
-            self.Player_event_event.set()
-            self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('Mute', self.Player_mute), 2)
-          t = self.get_volume()
-          if t != None and t != self.Player_volume:
-             self.Player_volume = t
-             self.Player_events.append(('Volume', self.Player_volume))
-             self.Player_event_event.set()
-             self.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('Volume', self.Player_volume), 2)
-          iter = 1
-        else:
-          iter = 0
-        self.Cmd_Event.wait(0.5)
-    self.Msg_buffer[0] = "quit"
-    self.Msg_event.set()
-    self.send_command(0xA0004006, '')
+  def send_fullscreen(self):
+    self.Sim_minimized = False
+
+  def is_minimized(self):
+    return self.Sim_minimized
+
+  def get_mute(self):
+    return self.Sim_mute
+
+  def send_mute(self, mute):
+    self.Sim_mute = mute
+
+  def get_volume(self):
+    return self.Sim_volume
+
+  def send_volume(self, volume):
+    self.Sim_volume = volume
 
   def run(self):
-    hInst = kernel32.GetModuleHandleW(None)
-    wclassName = 'mpcControler'
-    wname = 'mpcControl'
-    wndClass = WNDCLASSEXW(ctypes.sizeof(WNDCLASSEXW), 3, self.WndProc, 0, 0, hInst, 0, 0, 0, 0, LPCWSTR(wclassName), 0)
-    regRes = user32.RegisterClassExW(ctypes.byref(wndClass))
-    self.wnd_ctrl = user32.CreateWindowExW(0, wclassName, wname, 0x40000000, 0, 0, 0, 0, -3, 0, hInst, None)
-    if not self.wnd_ctrl:
-      self.logger.log(LSTRINGS['wndctrl_fail'], 0)
-      self.Msg_buffer[0] = "quit"
-      self.Player_event_event.set()
-      return
-    self.logger.log('Création de la fenêtre de contrôle: %s' % self.wnd_ctrl, 1)
-    self.mpc_thread = threading.Thread(target=self.run_mpc)
-    self.mpc_thread.start()
+    self.logger.log('Lecteur simulé - lancement', 1)
+    self.Sim_running = True
+    self.Player_event_event.set()
     self.incoming_msg_thread = threading.Thread(target=self.manage_incoming_msg)
     self.incoming_msg_thread.start()
     self.cmd_thread = threading.Thread(target=self.send_commands)
     self.cmd_thread.start()
-    msg = MSG()
-    lpMsg = pointer(msg)
-    while self.Msg_buffer[0] == "run" and self.Cmd_buffer[0] == "run":
-      user32.GetMessageW(lpMsg, self.wnd_ctrl, 0, 0)
-      user32.DispatchMessageW(lpMsg)
+    while not self.Cmd_queue.Closed:
+      with self.Sim_condition:
+        if not self.Sim_pending:
+          self.Sim_condition.wait()
+          continue
+        delay = self.Sim_pending[0][0] - time.monotonic()
+        if delay > 0:
+          self.Sim_condition.wait(delay)
+          continue
+        due_time, seq, action, args = heapq.heappop(self.Sim_pending)
+      for not_code, not_msg in action(*args):
+        self.logger.log('Lecteur simulé - notification émise - code:%s - message:%s' % (hex(not_code), not_msg), 2)
+        self.Msg_queue.put(not_code, not_msg)
+    self.Sim_running = False
+    self.cmd_thread.join()
+    self.incoming_msg_thread.join()
+    self.logger.log('Lecteur simulé: fermeture', 1)
 
   def stop(self):
-    self.Cmd_buffer[0] = "quit"
-    self.Cmd_Event.set()
-    user32.PostMessageW(self.wnd_ctrl, 0x0012, 0, 0)
+    self.Cmd_queue.close()
+    with self.Sim_condition:
+      self.Sim_condition.notify()
 
 
 class DLNAArgument:
@@ -1148,6 +3425,51 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
     except:
       pass
 
+  def _send_slice(self, body, start, count):
+    if isinstance(body, SpilledImage):
+      body.send(self.request, start, count)
+    else:
+      with memoryview(body) as mv:
+        self.request.sendall(mv[start:start + count])
+
+  def _send_entity(self, req, body, ctype, etag):
+    length = len(body)
+    resp_h = 'Date: ' + email.utils.formatdate(time.time(), usegmt=True) + '\r\n' \
+    'Accept-Ranges: bytes\r\n' \
+    'ETag: ' + etag + '\r\n' \
+    'Connection: close\r\n' \
+    'Server: DLNAmpcRenderer\r\n'
+    if etag in (t.strip() for t in req.header('If-None-Match', '').split(',')) or req.header('If-None-Match', '').strip() == '*':
+      self.request.sendall(('HTTP/1.1 304 Not Modified\r\n' + resp_h + '\r\n').encode('ISO-8859-1'))
+      return '304'
+    ranges = None
+    if req.header('Range') and req.header('If-Range', etag).strip() == etag:
+      ranges = _parse_ranges(req.header('Range'), length)
+    if ranges is None:
+      self.request.sendall(('HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n' % (ctype, length) + resp_h + '\r\n').encode('ISO-8859-1'))
+      if req.method == 'GET':
+        self._send_slice(body, 0, length)
+      return '200'
+    if not ranges:
+      self.request.sendall(('HTTP/1.1 416 Range Not Satisfiable\r\nContent-Range: bytes */%d\r\nContent-Length: 0\r\n' % length + resp_h + '\r\n').encode('ISO-8859-1'))
+      return '416'
+    if len(ranges) == 1:
+      start, end = ranges[0]
+      self.request.sendall(('HTTP/1.1 206 Partial Content\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\nContent-Length: %d\r\n' % (ctype, start, end, length, end - start + 1) + resp_h + '\r\n').encode('ISO-8859-1'))
+      if req.method == 'GET':
+        self._send_slice(body, start, end - start + 1)
+      return '206'
+    boundary = uuid.uuid4().hex
+    parts = [('\r\n--%s\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\n\r\n' % (boundary, ctype, start, end, length)).encode('ISO-8859-1') for (start, end) in ranges]
+    closing = ('\r\n--%s--\r\n' % boundary).encode('ISO-8859-1')
+    self.request.sendall(('HTTP/1.1 206 Partial Content\r\nContent-Type: multipart/byteranges; boundary=%s\r\nContent-Length: %d\r\n' % (boundary, sum(map(len, parts)) + sum(end - start + 1 for (start, end) in ranges) + len(closing)) + resp_h + '\r\n').encode('ISO-8859-1'))
+    if req.method == 'GET':
+      for part, (start, end) in zip(parts, ranges):
+        self.request.sendall(part)
+        self._send_slice(body, start, end - start + 1)
+      self.request.sendall(closing)
+    return '206'
+
   def handle(self):
     if not self.Renderer.is_request_manager_running:
       return
@@ -1196,50 +3518,57 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
         except:
           self.server.logger.log('Échec de la réponse à la requête %s: %s' % (req.method, dict_scpd[req.path]), 1)
       elif req.path.lower() == '/icon.png':
-        resp_body = self.Renderer.Icon
         try:
-          if req.method == 'GET':
-            self.request.sendall(resp.replace('##type##', 'image/png').replace('##len##', str(len(resp_body))).encode('ISO-8859-1') + resp_body)
-          else:
-            self.request.sendall(resp.replace('##type##', 'image/png').replace('##len##', str(len(resp_body))).encode('ISO-8859-1'))
-          self.server.logger.log('Réponse à la requête %s /ICON.PNG' % req.method, 1)
+          code = self._send_entity(req, self.Renderer.Icon, 'image/png', self.Renderer.IconETag)
+          self.server.logger.log('Réponse à la requête %s /ICON.PNG - code %s' % (req.method, code), 1)
         except:
           self.server.logger.log('Échec de la réponse à la requête %s /ICON.PNG' % req.method, 1)
       elif self.Renderer.rot_image and req.path[:8].lower() == '/rotated':
+        with self.Renderer.ItemLock:
+          rot_image = self.Renderer.rot_image
+          rot_etag = self.Renderer.rot_etag
         try:
-          if req.method == 'GET':
-            self.request.sendall(resp.replace('##type##', 'image/jpeg').replace('##len##', str(len(self.Renderer.rot_image))).encode('ISO-8859-1') + self.Renderer.rot_image)
+          if isinstance(rot_image, concurrent.futures.Future):
+            rot_image = rot_image.result()
+          if isinstance(rot_image, str) and r'://' not in rot_image:
+            with open(rot_image, 'rb') as f:
+              rot_image = f.read()
+        except:
+          rot_image = b''
+        try:
+          if isinstance(rot_image, str):
+            self.request.settimeout(None)
+            code = self.Renderer.MediaProxy.serve(rot_image, req.method, self.request)
+          elif rot_image:
+            code = self._send_entity(req, rot_image, 'image/jpeg', rot_etag)
           else:
-            self.request.sendall(resp.replace('##type##', 'image/jpeg').replace('##len##', str(len(self.Renderer.rot_image))).encode('ISO-8859-1'))
-          self.server.logger.log('Réponse à la requête %s: %s' % (req.method, req.path), 1)
+            code = None
+          if code:
+            self.server.logger.log('Réponse à la requête %s: %s - code %s' % (req.method, req.path, code), 1)
+          else:
+            self.request.sendall(resp_err.encode('ISO-8859-1'))
+            self.server.logger.log('Échec de la réponse à la requête %s: %s' % (req.method, req.path), 1)
         except:
           self.server.logger.log('Échec de la réponse à la requête %s: %s' % (req.method, req.path), 1)
       elif self.Renderer.proxy_uri and req.path[:6].lower() == '/proxy':
-        rep = None
         try:
-          try:
-            rep = _open_url(self.Renderer.AVTransportURI, method=req.method)
-          except:
+          self.request.settimeout(None)
+          if req.method == 'GET':
+            self.server.logger.log('Début de la réponse à la requête %s: %s' % (req.method, req.path), 1)
+          duration = sum(int(t[0])*t[1] for t in zip(reversed(self.Renderer.CurrentMediaDuration.split(':')), [1,60,3600]))
+          if self.Renderer.ProxyCache:
+            code = self.Renderer.ProxyCache.serve(self.Renderer.AVTransportURI, req, self.request, duration)
+          else:
+            code = self.Renderer.MediaProxy.serve(self.Renderer.AVTransportURI, req.method, self.request, duration)
+          if not code:
             try:
               self.request.sendall(resp_err.encode('ISO-8859-1'))
             except:
               pass
             raise
-          resp_h = {11: 'HTTP/1.1', 10:'HTTP/1.0'}[rep.version] + ' ' + str(rep.status) + ' ' + rep.reason + '\r\n' + '\r\n'.join('%s: %s' % (k,v) for (k,v) in rep.getheaders()) + '\r\n\r\n'
-          self.request.settimeout(None)
-          self.request.sendall(resp_h.encode('ISO-8859-1'))
-          if req.method == 'GET':
-            self.server.logger.log('Début de la réponse à la requête %s: %s' % (req.method, req.path), 1)
-            shutil.copyfileobj(rep, self.wfile, 256 * 1024)
-          self.server.logger.log('Réponse à la requête %s: %s' % (req.method, req.path), 1)
+          self.server.logger.log('Réponse à la requête %s: %s - code %s' % (req.method, req.path, code), 1)
         except:
           self.server.logger.log('Échec de la réponse à la requête %s: %s' % (req.method, req.path), 1)
-        finally:
-          if rep:
-            try:
-              rep.close()
-            except:
-              pass
       else:
         try:
           self.request.sendall(resp_err.encode('ISO-8859-1'))
@@ -1295,7 +3624,7 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
           callback = None
         if callback and self.Renderer.is_events_manager_running:
           event_sub = EventSubscription(self.Renderer, serv, timeout, callback, ip)
-          self.Renderer.EventSubscriptions.append(event_sub)
+          self.Renderer.EventSubscriptions[event_sub.SID.lower()] = event_sub
           event_sub.start_event_management()
           try:
             self.request.sendall(resp.replace('##sid##', event_sub.SID).replace('##sec##', str(timeout)).encode('ISO-8859-1'))
@@ -1312,7 +3641,9 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
           self.server.logger.log('Rejet de la requête SUBSCRIBE %s - code 412' % req.path, 2)
       else:
         sid = req.header('SID', '').lower()
-        event_sub = next((e_s for e_s in self.Renderer.EventSubscriptions if (e_s.Service.Id.lower()[23:] == serv.lower() and e_s.SID.lower() == sid)), None)
+        event_sub = self.Renderer.EventSubscriptions.get(sid)
+        if event_sub and event_sub.Service.Id.lower()[23:] != serv.lower():
+          event_sub = None
         timeout = req.header('TIMEOUT', '').lower()
         if timeout[:7].lower() == 'second-':
           timeout = timeout[7:]
@@ -1369,11 +3700,13 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
         self.server.logger.log('Rejet de la requête UNSUBSCRIBE %s - code 404' % req.path, 2)
       else:
         sid = req.header('SID', '').lower()
-        event_sub = next((e_s for e_s in self.Renderer.EventSubscriptions if (e_s.Service.Id.lower()[23:] == serv.lower() and e_s.SID.lower() == sid)), None)
+        event_sub = self.Renderer.EventSubscriptions.get(sid)
+        if event_sub and event_sub.Service.Id.lower()[23:] != serv.lower():
+          event_sub = None
         sub_time = time.time()
         if event_sub:
           if event_sub.End_time < sub_time:
-            event_sub.EventEvent.set()
+            self.Renderer.EventNotifier.wake()
             event_sub = None
         if event_sub:
           event_sub.stop_event_management()
@@ -1542,6 +3875,29 @@ class DLNARequestHandler(socketserver.BaseRequestHandler):
 
 class EventSubscription:
 
+  NotifyHeaders = {
+    'Content-Type': 'text/xml; charset="utf-8"',
+    'NT': 'upnp:event',
+    'NTS': 'upnp:propchange',
+    'Connection': 'keep-alive',
+    'User-Agent': 'DLNAmpcRenderer',
+    'Cache-Control': 'no-cache'
+  }
+  NotifyTimeout = 5
+  NotifyBackoff = 1
+  NotifyMaxBackoff = 60
+  NotifyMaxFailures = 6
+
+  @staticmethod
+  def build_notify_body(service, event):
+    if service.Id[23:].lower() == 'ConnectionManager'.lower():
+      msg_body = '<?xml version="1.0"?>\n' \
+      '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">%s</e:propertyset>' % ''.join('<e:property><' + prop_name + '>' + html.escape(prop_value) + '</' + prop_name + '></e:property>' for prop_name, prop_value in event)
+    else:
+      msg_body = '<?xml version="1.0"?>\n' \
+      '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0"><e:property><LastChange>&lt;Event xmlns=&quot;urn:schemas-upnp-org:metadata-1-0/%s/&quot;&gt;&lt;InstanceID val=&quot;0&quot;&gt;%s&lt;/InstanceID&gt;&lt;/Event&gt;</LastChange></e:property></e:propertyset>' % ('AVT' if 'AVTransport'.lower() in service.Id.lower() else 'RCS', ''.join(html.escape('<' + prop_name + ' val="' + html.escape(prop_value) + '"/>') for prop_name, prop_value in event))
+    return msg_body.encode('UTF-8')
+
   def __init__(self, renderer, service, timeout, callback, ip):
     self.Renderer = renderer
     self.logger = self.Renderer.logger
@@ -1552,10 +3908,28 @@ class EventSubscription:
     self.End_time = sub_time + timeout
     self.Callback = callback
     self.Ip = ip
-    self.EventEvent = threading.Event()
+    self.CallbackAddress = None
+    self.NotifyPrefix = None
+    try:
+      url_p = urllib.parse.urlsplit(callback, allow_fragments=False)
+      if url_p.scheme.lower() == 'http':
+        self.CallbackAddress = (url_p.hostname, url_p.port if url_p.port is not None else 80)
+        self.NotifyPrefix = (HTTPRequest.RequestPattern % ('NOTIFY', (url_p.path + ('?' + url_p.query if url_p.query else '')).replace(' ', '%20') or '/', url_p.netloc, ''.join(k + ': ' + v + '\r\n' for k, v in EventSubscription.NotifyHeaders.items()) + 'SID: ' + self.SID + '\r\n'))[:-2].encode('ISO-8859-1')
+    except:
+      self.CallbackAddress = None
+      self.NotifyPrefix = None
     self.SEQ = 0
     self.Events = []
+    self.EventsLock = threading.Lock()
+    self.Nb_skipped = 0
     self.PConnection = [None]
+    self.NotifyCount = 0
+    self.NotifyReused = 0
+    self.NotifyDuration = 0
+    self.Failures = 0
+    self.Retry_time = 0
+    self.EventsMerged = 0
+    self.EventsDropped = 0
 
   def set_end_time(self, end_time):
     self.End_time_lock.acquire()
@@ -1563,84 +3937,344 @@ class EventSubscription:
       self.End_time = end_time
     self.End_time_lock.release()
 
-  def _event_manager(self):
-    self.logger.log('Souscription %s - démarrage, sur l\'interface %s, du gestionnaire de notification d\'événement' % (self.SID, self.Ip), 2)
-    nb_skipped = 0
-    while self.End_time > 0:
-      self.EventEvent.clear()
-      while self.End_time > 0 and self.Events:
-        event = self.Events.pop(0)
+  def add_event(self, event, msg_body):
+    with self.EventsLock:
+      self.Events.append((event, msg_body))
+
+  def next_notification(self):
+    with self.EventsLock:
+      if self.Failures and len(self.Events) > 1:
+        event = {}
+        for ev, msg_body in self.Events:
+          for prop_name, prop_value in ev:
+            event.pop(prop_name, None)
+            event[prop_name] = prop_value
+        event = tuple(event.items())
+        self.EventsMerged += len(self.Events) - 1
+        self.Events = [(event, EventSubscription.build_notify_body(self.Service, event))]
+      while self.Events:
+        event, msg_body = self.Events.pop(0)
         if len(event) == 2 and event[0][0].lower() == 'CurrentMediaDuration'.lower():
           if len(self.Events) > 0:
-            if len(self.Events[0]) == 2 and self.Events[0][0][0].lower() == 'CurrentMediaDuration'.lower():
-              if len(self.Events) >= 5 or nb_skipped < len(self.Events) - 1:
-                nb_skipped += 1
+            if len(self.Events[0][0]) == 2 and self.Events[0][0][0][0].lower() == 'CurrentMediaDuration'.lower():
+              if len(self.Events) >= 5 or self.Nb_skipped < len(self.Events) - 1:
+                self.Nb_skipped += 1
                 continue
-        nb_skipped = 0
-        msg_headers= {
-          'Content-Type': 'text/xml; charset="utf-8"',
-          'NT': 'upnp:event',
-          'NTS': 'upnp:propchange',
-          'SID': self.SID,
-          'SEQ': str(self.SEQ),
-          'Connection': 'close',
-          'User-Agent': 'DLNAmpcRenderer',
-          'Cache-Control': 'no-cache'
-        }
-        if self.Service.Id[23:].lower() == 'ConnectionManager'.lower():
-          msg_body = '<?xml version="1.0"?>\n' \
-        '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">##prop##</e:propertyset>'
-          for prop_name, prop_value in event:
-            msg_body = msg_body.replace('##prop##', '<e:property><' + prop_name + '>' + html.escape(prop_value) + '</' + prop_name + '></e:property>' + '##prop##')
-          msg_body = msg_body.replace('##prop##', '').encode('UTF-8')
-        else:
-          msg_body = '<?xml version="1.0"?>\n' \
-        '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0"><e:property><LastChange>&lt;Event xmlns=&quot;urn:schemas-upnp-org:metadata-1-0/%s/&quot;&gt;&lt;InstanceID val=&quot;0&quot;&gt;##prop##&lt;/InstanceID&gt;&lt;/Event&gt;</LastChange></e:property></e:propertyset>' % ('AVT' if 'AVTransport'.lower() in self.Service.Id.lower() else 'RCS')
-          for prop_name, prop_value in event:
-            msg_body = msg_body.replace('##prop##', html.escape('<' + prop_name + ' val="' + html.escape(prop_value) + '"/>##prop##'))
-          msg_body = msg_body.replace('##prop##', '').encode('UTF-8')
-        msg_headers['Content-Length'] = str(len(msg_body))
-        try:
-          resp = HTTPRequest(self.Callback, method='NOTIFY', headers=msg_headers, data=msg_body, pconnection=self.PConnection, ip=self.Ip)
-          self.logger.log('Souscription %s - envoi de la notification d\'événement %d: ' % (self.SID, self.SEQ) + ', '.join('(' + prop_name + ': ' + prop_value + ')' for (prop_name, prop_value) in event), 2)
-          if resp.code == '200':
-            self.logger.log('Souscription %s - réception de l\'accusé de réception de la notification d\'événement %d' % (self.SID, self.SEQ), 2)
-          else:
-            self.logger.log('Souscription %s - échec de la réception de l\'accusé de réception de la notification d\'événement %d - code %s' % (self.SID, self.SEQ, resp.code), 2)
-        except:
-          self.logger.log('Souscription %s - échec de l\'envoi de la notification d\'événement %d' % (self.SID, self.SEQ), 2)
-        self.SEQ += 1
-      cur_time = time.time()
-      if self.End_time >= cur_time :
-        self.EventEvent.wait(self.End_time - cur_time + 1)
-        if self.End_time < time.time():
-          self.set_end_time(0)
-      else:
+        self.Nb_skipped = 0
+        return event, msg_body
+    return None
+
+  def build_notify_request(self, msg_body):
+    return self.NotifyPrefix + ('SEQ: %d\r\nContent-Length: %d\r\n\r\n' % (self.SEQ, len(msg_body))).encode('ISO-8859-1') + msg_body
+
+  def notification_done(self, event, msg_body, code, reused, duration):
+    self.NotifyCount += 1
+    self.NotifyReused += 1 if reused else 0
+    self.NotifyDuration += duration
+    self.logger.log('Souscription %s - envoi de la notification d\'événement %d: ' % (self.SID, self.SEQ) + ', '.join('(' + prop_name + ': ' + prop_value + ')' for (prop_name, prop_value) in event), 2)
+    self.logger.log('Souscription %s - notification d\'événement %d sur connexion %s en %.1f ms - taux de réutilisation: %d/%d - durée moyenne: %.1f ms' % (self.SID, self.SEQ, ('réutilisée' if reused else 'nouvelle'), duration * 1000, self.NotifyReused, self.NotifyCount, self.NotifyDuration * 1000 / self.NotifyCount), 2)
+    if code == '200':
+      self.logger.log('Souscription %s - réception de l\'accusé de réception de la notification d\'événement %d' % (self.SID, self.SEQ), 2)
+    else:
+      self.logger.log('Souscription %s - échec de la réception de l\'accusé de réception de la notification d\'événement %d - code %s' % (self.SID, self.SEQ, code), 2)
+    if code is None:
+      self.Failures += 1
+      if self.Failures >= EventSubscription.NotifyMaxFailures:
+        with self.EventsLock:
+          self.EventsDropped += 1 + len(self.Events)
+          self.Events = []
         self.set_end_time(0)
-    self.logger.log('Souscription %s - arrêt du gestionnaire de notification d\'événement' % self.SID, 2)
+        self.logger.log('Souscription %s - abandon après %d échecs consécutifs de notification - notifications évitées: %d fusionnées, %d abandonnées' % (self.SID, self.Failures, self.EventsMerged, self.EventsDropped), 1)
+      else:
+        with self.EventsLock:
+          self.Events.insert(0, (event, msg_body))
+        self.Retry_time = time.monotonic() + min(EventSubscription.NotifyBackoff * 2 ** (self.Failures - 1), EventSubscription.NotifyMaxBackoff)
+        self.logger.log('Souscription %s - échec %d de notification - nouvelle tentative dans %.0f s' % (self.SID, self.Failures, self.Retry_time - time.monotonic()), 2)
+      return
+    self.Failures = 0
+    if code == '412':
+      self.set_end_time(0)
+      self.logger.log('Souscription %s - abandon, souscription inconnue du contrôleur' % self.SID, 1)
+    self.SEQ += 1
 
   def start_event_management(self):
     if 'AVTransport'.lower() in self.Service.Id.lower():
-      self.Events = [(('TransportState', self.Renderer.TransportState), ('TransportStatus', "OK"), ('TransportPlaySpeed', "1"), ('NumberOfTracks', "1" if self.Renderer.AVTransportURI else "0"), ('CurrentMediaDuration', self.Renderer.CurrentMediaDuration), ('AVTransportURI', self.Renderer.AVTransportURI), ('AVTransportURIMetaData', self.Renderer.AVTransportURIMetaData), ('PlaybackStorageMedium', "NETWORK,NONE"), ('CurrentTrack', "1" if self.Renderer.AVTransportURI else "0"), ('CurrentTrackDuration', self.Renderer.CurrentMediaDuration), ('CurrentTrackMetaData', self.Renderer.AVTransportURIMetaData), ('CurrentTrackURI', self.Renderer.AVTransportURI), ('CurrentTransportActions', {'TRANSITIONING': "Stop", 'STOPPED': "Play,Seek",'PAUSED_PLAYBACK': "Play,Stop,Seek" ,'PLAYING': "Pause,Stop,Seek"}.get(self.Renderer.TransportState, "")), ('CurrentPlayMode', "NORMAL"))]
+      event = (('TransportState', self.Renderer.TransportState), ('TransportStatus', "OK"), ('TransportPlaySpeed', "1"), ('NumberOfTracks', "1" if self.Renderer.AVTransportURI else "0"), ('CurrentMediaDuration', self.Renderer.CurrentMediaDuration), ('AVTransportURI', self.Renderer.AVTransportURI), ('AVTransportURIMetaData', self.Renderer.AVTransportURIMetaData), ('NextAVTransportURI', self.Renderer.NextAVTransportURI), ('NextAVTransportURIMetaData', self.Renderer.NextAVTransportURIMetaData), ('PlaybackStorageMedium', "NETWORK,NONE"), ('CurrentTrack', "1" if self.Renderer.AVTransportURI else "0"), ('CurrentTrackDuration', self.Renderer.CurrentMediaDuration), ('CurrentTrackMetaData', self.Renderer.AVTransportURIMetaData), ('CurrentTrackURI', self.Renderer.AVTransportURI), ('CurrentTransportActions', {'TRANSITIONING': "Stop", 'STOPPED': "Play,Seek",'PAUSED_PLAYBACK': "Play,Stop,Seek" ,'PLAYING': "Pause,Stop,Seek"}.get(self.Renderer.TransportState, "")), ('CurrentPlayMode', "NORMAL"))
     elif 'RenderingControl'.lower() in self.Service.Id.lower():
-      self.Events = [(('Mute channel="Master"', self.Renderer.Mute), ('Volume channel="Master"', self.Renderer.Volume))]
+      event = (('Mute channel="Master"', self.Renderer.Mute), ('Volume channel="Master"', self.Renderer.Volume))
     elif 'ConnectionManager'.lower() in self.Service.Id.lower():
-      self.Events = [(('SourceProtocolInfo', ""), ('SinkProtocolInfo', DLNARenderer.Sink))]
-    manager_thread = threading.Thread(target=self._event_manager)
+      event = (('SourceProtocolInfo', ""), ('SinkProtocolInfo', DLNARenderer.Sink))
+    self.add_event(event, EventSubscription.build_notify_body(self.Service, event))
     if self.Renderer.is_events_manager_running:
-      manager_thread.start()
+      self.logger.log('Souscription %s - démarrage, sur l\'interface %s, de la notification d\'événement' % (self.SID, self.Ip), 2)
+      self.Renderer.EventNotifier.wake()
 
   def stop_event_management(self):
     self.set_end_time(0)
+    self.Renderer.EventNotifier.wake()
+
+
+class NotifyRequest:
+
+  __slots__ = ('Subscription', 'Event', 'Body', 'Data', 'Sock', 'Connected', 'Reused', 'Sent', 'Response', 'Start_time', 'Deadline')
+
+  def __init__(self, event_sub, event, msg_body):
+    self.Subscription = event_sub
+    self.Event = event
+    self.Body = msg_body
+    self.Data = memoryview(event_sub.build_notify_request(msg_body))
+    self.Sock = None
+    self.Connected = False
+    self.Reused = False
+    self.Sent = 0
+    self.Response = b''
+    self.Start_time = time.monotonic()
+    self.Deadline = self.Start_time + EventSubscription.NotifyTimeout
+
+
+class EventNotifier:
+
+  MaxConcurrent = 16
+
+  def __init__(self, renderer):
+    self.Renderer = renderer
+    self.logger = renderer.logger
+    self.is_running = None
+    self.WakeSockets = None
+    self.Requests = {}
+    self.Rotation = 0
+
+  def wake(self):
+    try:
+      self.WakeSockets[1].send(b'\x00')
+    except:
+      pass
+
+  @staticmethod
+  def _parse_response(buff):
+    body_pos = buff.find(b'\r\n\r\n')
+    if body_pos < 0:
+      return None, False
+    resp = HTTPMessage((buff[:body_pos + 4], None), body=False)
+    if not resp.code:
+      return resp, False
+    body_pos += 4
+    keep_alive = not (resp.in_header('Connection', 'close') or (resp.version != 'HTTP/1.1' and not resp.in_header('Connection', 'keep-alive')))
+    if resp.in_header('Transfer-Encoding', 'chunked'):
+      if not buff.endswith(b'0\r\n\r\n'):
+        return None, False
+    else:
+      try:
+        body_len = int(resp.header('Content-Length'))
+      except:
+        return resp, False
+      if len(buff) < body_pos + body_len:
+        return None, False
+    return resp, keep_alive
+
+  def _connect(self, selector, req):
+    event_sub = req.Subscription
+    req.Sent = 0
+    req.Response = b''
+    if event_sub.PConnection[0] is not None:
+      req.Sock = event_sub.PConnection[0]
+      req.Connected = True
+      req.Reused = True
+    else:
+      req.Reused = False
+      req.Connected = False
+      req.Sock = socket.socket(socket.AF_INET6 if ':' in event_sub.CallbackAddress[0] else socket.AF_INET, socket.SOCK_STREAM)
+      req.Sock.setblocking(False)
+      if event_sub.Ip:
+        req.Sock.bind((event_sub.Ip, 0))
+      err = req.Sock.connect_ex(event_sub.CallbackAddress)
+      if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+        raise ConnectionError(err)
+      event_sub.PConnection[0] = req.Sock
+    selector.register(req.Sock, selectors.EVENT_WRITE, req)
+
+  def _close(self, selector, req):
+    try:
+      selector.unregister(req.Sock)
+    except:
+      pass
     try:
-      self.PConnection[0].close()
+      req.Sock.close()
     except:
       pass
-    self.EventEvent.set()
+    if req.Subscription.PConnection[0] is req.Sock:
+      req.Subscription.PConnection[0] = None
+
+  def _finish(self, selector, req, resp, keep_alive=False):
+    event_sub = req.Subscription
+    if resp is None and req.Reused and time.monotonic() < req.Deadline and event_sub.End_time > 0:
+      self._close(selector, req)
+      try:
+        self._connect(selector, req)
+        return
+      except:
+        pass
+    if keep_alive:
+      try:
+        selector.unregister(req.Sock)
+      except:
+        pass
+    else:
+      self._close(selector, req)
+    del self.Requests[event_sub]
+    if event_sub.End_time > 0:
+      event_sub.notification_done(req.Event, req.Body, (resp.code if resp else None), req.Reused, time.monotonic() - req.Start_time)
+
+  def _start(self, selector):
+    event_subs = list(self.Renderer.EventSubscriptions.values())
+    nb_sub = len(event_subs)
+    if not nb_sub:
+      return
+    now = time.monotonic()
+    self.Rotation %= nb_sub
+    event_subs = event_subs[self.Rotation:] + event_subs[:self.Rotation]
+    self.Rotation += 1
+    for event_sub in event_subs:
+      if len(self.Requests) >= EventNotifier.MaxConcurrent:
+        break
+      if event_sub.End_time <= 0 or event_sub in self.Requests or not event_sub.Events:
+        continue
+      if event_sub.Failures and event_sub.Retry_time > now:
+        continue
+      if not event_sub.CallbackAddress:
+        event_sub.set_end_time(0)
+        continue
+      notification = event_sub.next_notification()
+      if not notification:
+        continue
+      req = NotifyRequest(event_sub, *notification)
+      self.Requests[event_sub] = req
+      try:
+        self._connect(selector, req)
+      except:
+        self._finish(selector, req, None)
+
+  def _process(self, selector, req):
+    try:
+      if not req.Connected:
+        err = req.Sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+          raise ConnectionError(err)
+        req.Connected = True
+      if req.Sent < len(req.Data):
+        req.Sent += req.Sock.send(req.Data[req.Sent:])
+        if req.Sent >= len(req.Data):
+          selector.modify(req.Sock, selectors.EVENT_READ, req)
+        return
+      bloc = req.Sock.recv(65536)
+      if not bloc:
+        raise ConnectionError
+      req.Response += bloc
+      resp, keep_alive = EventNotifier._parse_response(req.Response)
+      if resp is not None:
+        self._finish(selector, req, resp, keep_alive)
+    except (BlockingIOError, InterruptedError):
+      pass
+    except:
+      self._finish(selector, req, None)
+
+  def _cleanup(self, selector):
+    cur_time = time.time()
+    next_time = None
+    for event_sub in list(self.Renderer.EventSubscriptions.values()):
+      if 0 < event_sub.End_time < cur_time:
+        event_sub.set_end_time(0)
+      if event_sub.End_time <= 0:
+        req = self.Requests.pop(event_sub, None)
+        if req:
+          self._close(selector, req)
+        if event_sub.PConnection[0] is not None:
+          try:
+            event_sub.PConnection[0].close()
+          except:
+            pass
+          event_sub.PConnection[0] = None
+        self.Renderer.EventSubscriptions.pop(event_sub.SID.lower(), None)
+      elif next_time is None or event_sub.End_time < next_time:
+        next_time = event_sub.End_time
+    return None if next_time is None else next_time - cur_time + 1
+
+  def _notifier(self):
+    self.logger.log('Démarrage du gestionnaire de notification d\'événement', 2)
+    with selectors.DefaultSelector() as selector:
+      selector.register(self.WakeSockets[0], selectors.EVENT_READ, None)
+      while self.is_running:
+        self._start(selector)
+        timeout = self._cleanup(selector)
+        now = time.monotonic()
+        for event_sub in list(self.Renderer.EventSubscriptions.values()):
+          if event_sub.End_time > 0 and event_sub.Events and event_sub not in self.Requests:
+            delay = max(event_sub.Retry_time - now, 0) if event_sub.Failures else 0
+            timeout = delay if timeout is None else min(timeout, delay)
+        for req in self.Requests.values():
+          timeout = max(req.Deadline - now, 0) if timeout is None else min(timeout, max(req.Deadline - now, 0))
+        for key, mask in selector.select(timeout):
+          if key.data is None:
+            try:
+              self.WakeSockets[0].recv(4096)
+            except:
+              pass
+          elif key.data.Subscription in self.Requests:
+            self._process(selector, key.data)
+        now = time.monotonic()
+        for req in list(self.Requests.values()):
+          if now >= req.Deadline:
+            self._finish(selector, req, None)
+      for req in list(self.Requests.values()):
+        self._close(selector, req)
+      self.Requests = {}
+    for event_sub in list(self.Renderer.EventSubscriptions.values()):
+      try:
+        event_sub.PConnection[0].close()
+      except:
+        pass
+      event_sub.PConnection[0] = None
+    for sock in self.WakeSockets:
+      try:
+        sock.close()
+      except:
+        pass
+    self.logger.log('Arrêt du gestionnaire de notification d\'événement', 2)
+
+  def start(self):
+    self.WakeSockets = socket.socketpair()
+    for sock in self.WakeSockets:
+      sock.setblocking(False)
+    self.is_running = True
+    notifier_thread = threading.Thread(target=self._notifier)
+    notifier_thread.start()
+
+  def stop(self):
+    self.is_running = False
+    self.wake()
+
+
+class MediaItem:
+
+  def __init__(self):
+    self.URI = ''
+    self.SubURI = ''
+    self.MetaData = ''
+    self.Title = ''
+    self.UpnpClass = ''
+    self.Image = False
+    self.RotImage = b''
+    self.Rotation = 0
+    self.PlayerRotation = 0
+    self.ProxyURI = ''
+    self.Duration = "0:00:00"
 
 
 class DLNARenderer:
 
+  NextTimeout = 15
+  TransportActions = ('setavtransporturi', 'play', 'pause', 'stop', 'seek')
+
   Device_SCPD = \
   '''<?xml version="1.0" encoding="utf-8"?>
 <root xmlns="urn:schemas-upnp-org:device-1-0" xmlns:pnpx="http://schemas.microsoft.com/windows/pnpx/2005/11" xmlns:df="http://schemas.microsoft.com/windows/2008/09/devicefoundation" xmlns:sec="http://www.sec.co.kr/dlna">
@@ -2051,6 +4685,26 @@ class DLNARenderer:
         </argument>
       </argumentList>
     </action>
+    <action>
+      <name>SetNextAVTransportURI</name>
+      <argumentList>
+        <argument>
+          <name>InstanceID</name>
+          <direction>in</direction>
+          <relatedStateVariable>A_ARG_TYPE_InstanceID</relatedStateVariable>
+        </argument>
+        <argument>
+          <name>NextURI</name>
+          <direction>in</direction>
+          <relatedStateVariable>NextAVTransportURI</relatedStateVariable>
+        </argument>
+        <argument>
+          <name>NextURIMetaData</name>
+          <direction>in</direction>
+          <relatedStateVariable>NextAVTransportURIMetaData</relatedStateVariable>
+        </argument>
+      </argumentList>
+    </action>
     <action>
       <name>GetTransportInfo</name>
       <argumentList>
@@ -2766,7 +5420,7 @@ class DLNARenderer:
     t = ctypes.cast(ctypes.byref(r.table), POINTER(MIB_IPADDRROW * n)).contents
     return tuple(socket.inet_ntoa(e.dwAddr.to_bytes(4, 'little')) for e in t if e.wType & 1)
 
-  def __init__(self, RendererIp='', RendererPort=8000, Minimize=False, FullScreen=False, JpegRotate=False, WMPDMCHideMKV=False, TrustControler=False, SearchSubtitles=False, NoPartReqIntermediate=False, verbosity=0):
+  def __init__(self, RendererIp='', RendererPort=8000, Minimize=False, FullScreen=False, JpegRotate=False, WMPDMCHideMKV=False, TrustControler=False, SearchSubtitles=False, NoPartReqIntermediate=False, verbosity=0, Player=IPCmpcControler, RotateCommand=None, RotateTimeout=10, RotateCacheSize=64, RotateCacheDiskSize=0, Prefetch=0, RotatePool=2, RotateSpillSize=8, ProxyCacheSize=0, ProxyCacheTotalSize=2048, ProxyReadAhead=16, ProxyReadAheadTime=0):
     self.verbosity = verbosity
     self.logger = log_event(verbosity)
     if RendererIp:
@@ -2796,20 +5450,30 @@ class DLNARenderer:
     self.Minimize = Minimize
     self.FullScreen = FullScreen
     self.JpegRotate = False if JpegRotate.lower() == 'n' else JpegRotate.lower()
+    self.RotateCommand = RotateCommand or (r'"%s\%s"' % (IPCmpcControler.SCRIPT_PATH, 'jpegtran.bat') if os.name == 'nt' else 'jpegtran -copy none -rotate {rot}')
+    self.RotateTimeout = RotateTimeout
+    self.RotateSpill = RotateSpillSize * 1048576 if RotateSpillSize > 0 else None
+    self.RotatedImages = RotatedImageCache(RotateCacheSize * 1048576, RotateCacheDiskSize * 1048576)
+    self.MediaProxy = MediaProxy(readahead=max(ProxyReadAhead, 0) * 1048576, readahead_time=max(ProxyReadAheadTime, 0), verbosity=verbosity)
+    self.ProxyCache = ProxySegmentCache(self.MediaProxy, ProxyCacheSize * 1048576, ProxyCacheTotalSize * 1048576, verbosity=verbosity) if ProxyCacheSize > 0 else None
+    self.RotateExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, RotatePool), thread_name_prefix='rotation')
+    self.ImagePrefetcher = ImagePrefetcher(self, Prefetch) if Prefetch > 0 else None
     self.WMPDMCHideMKV = WMPDMCHideMKV
     self.TrustControler = TrustControler
     self.SearchSubtitles = SearchSubtitles
     self.NoPartReqIntermediate = NoPartReqIntermediate
-    self.IPCmpcControlerInstance = IPCmpcControler(title_name=NAME + ':%s' % RendererPort, verbosity=verbosity)
-    self.IPCmpcControlerInstance.Player_fullscreen = FullScreen
+    self.PlayerInstance = Player(title_name=NAME + ':%s' % RendererPort, verbosity=verbosity)
+    self.PlayerInstance.Player_fullscreen = FullScreen
     self.is_search_manager_running = None
     self.is_request_manager_running = None
     self.is_events_manager_running = None
     self.mpc_shutdown_event = threading.Event()
-    self.EventSubscriptions = []
+    self.EventSubscriptions = {}
+    self.EventNotifier = EventNotifier(self)
     self.ActionsProcessed = 0
     self.ActionsReceived = 0
     self.ActionsCondition = threading.Condition()
+    self.TransportGen = 0
     self.DescURL = 'http://%%s:%s/D_S' % self.Port
     root_xml = minidom.parseString(DLNARenderer.Device_SCPD)
     self.BaseURL = 'http://%%s:%s/' % self.Port
@@ -2827,6 +5491,7 @@ class DLNARenderer:
       f.close()
     except:
       self.Icon = b''
+    self.IconETag = '"%08x"' % zlib.crc32(self.Icon)
     self.Services = []
     for node in root_xml.getElementsByTagName('service'):
       service = DLNAService()
@@ -2880,10 +5545,17 @@ class DLNARenderer:
     self.AVTransportURI = ""
     self.AVTransportSubURI = ""
     self.AVTransportURIMetaData = ""
-    self.RelativeTimePosition = "0:00:00"
     self.CurrentMediaDuration = "0:00:00"
+    self.DurationProbe = MediaDurationProbe()
     self.rot_image = b''
+    self.rot_etag = ''
     self.proxy_uri = ''
+    self.ItemLock = threading.Lock()
+    self.NextAVTransportURI = ""
+    self.NextAVTransportURIMetaData = ""
+    self.NextItem = None
+    self.NextGen = 0
+    self.NextCondition = threading.Condition()
 
   def send_advertisement(self, alive):
     msg = 'NOTIFY * HTTP/1.1\r\n' \
@@ -2976,19 +5648,20 @@ class DLNARenderer:
       self.logger.log('Fin de l\'écoute des requêtes', 1)
       self._shutdown_request_manager()
 
-  def send_command(self, command):
-    self.IPCmpcControlerInstance.Cmd_buffer.append(command)
-    self.IPCmpcControlerInstance.Cmd_Event.set()
-
   def events_add(self, service, events):
-    for event_sub in self.EventSubscriptions:
+    msg_bodies = {}
+    for event_sub in list(self.EventSubscriptions.values()):
       if event_sub.End_time > 0 and service.lower() in event_sub.Service.Id.lower():
-        event_sub.Events.append(events)
-        event_sub.EventEvent.set()
+        msg_body = msg_bodies.get(event_sub.Service.Id)
+        if msg_body is None:
+          msg_body = msg_bodies[event_sub.Service.Id] = EventSubscription.build_notify_body(event_sub.Service, events)
+        event_sub.add_event(events, msg_body)
+    if msg_bodies:
+      self.EventNotifier.wake()
 
   def _send_delayed_minimize(self):
-    if self.IPCmpcControlerInstance.Player_status in ('STOPPED', 'PAUSED_PLAYBACK'):
-      self.IPCmpcControlerInstance.send_minimize()
+    if self.PlayerInstance.Player_status in ('STOPPED', 'PAUSED_PLAYBACK'):
+      self.PlayerInstance.send_minimize()
 
   def send_delayed_minimize(self):
     min_thread = threading.Timer(0.5, self._send_delayed_minimize)
@@ -2996,48 +5669,52 @@ class DLNARenderer:
 
   def _events_manager(self):
     while self.is_events_manager_running:
-      self.IPCmpcControlerInstance.Player_event_event.clear()
-      if self.IPCmpcControlerInstance.Msg_buffer[0] == "quit":
+      self.PlayerInstance.Player_event_event.clear()
+      if self.PlayerInstance.Msg_queue.Closed:
         self.mpc_shutdown_event.set()
-      while len(self.IPCmpcControlerInstance.Player_events) > 0:
-        event = self.IPCmpcControlerInstance.Player_events.pop(0)
-        ev = event[0]
-        if ev == 'RelativeTimePosition':
-          self.RelativeTimePosition = event[1] if event[1] else "0:00:00"
-        elif ev == 'CurrentMediaDuration':
-          self.CurrentMediaDuration = event[1] if event[1] else "0:00:00"
+      events = self.PlayerInstance.Player_events.pop_all()
+      if events:
+        self.logger.log('Événements du lecteur: %d - séquence: %d - délai: %.1f ms' % (len(events), events[-1].Seq, self.PlayerInstance.Player_events.Last_lag * 1000), 2)
+      for event in events:
+        ev = event.Name
+        if ev == 'CurrentMediaDuration':
+          self.CurrentMediaDuration = event.Value if event.Value else "0:00:00"
           self.events_add('AVTransport', (('CurrentMediaDuration', self.CurrentMediaDuration),('CurrentTrackDuration', self.CurrentMediaDuration)))
         elif ev == 'TransportState':
-          self.TransportState = event[1].upper()
+          self.TransportState = event.Value.upper()
           if self.TransportState == "STOPPED":
             if self.Minimize:
-              if self.IPCmpcControlerInstance.Player_image:
+              if self.PlayerInstance.Player_image:
                 self.send_delayed_minimize()
               else:
-                self.IPCmpcControlerInstance.send_minimize()
+                self.PlayerInstance.send_minimize()
           elif self.TransportState in ('PLAYING', 'PAUSED_PLAYBACK'):
             if self.Minimize:
-              self.IPCmpcControlerInstance.send_restore()
+              self.PlayerInstance.send_restore()
             if self.FullScreen:
-              self.IPCmpcControlerInstance.send_fullscreen()
+              self.PlayerInstance.send_fullscreen()
           self.events_add('AVTransport', (('TransportState', self.TransportState), ('CurrentTransportActions', {'TRANSITIONING': "Stop", 'STOPPED': "Play,Seek",'PAUSED_PLAYBACK': "Play,Stop,Seek" ,'PLAYING': "Pause,Stop,Seek"}.get(self.TransportState, ""))))
-        elif ev == 'TransportStatus' and event[1].upper() == "ERROR_OCCURRED":
+        elif ev == 'EndOfMedia':
+          next_thread = threading.Thread(target=self._advance_next, args=(self.TransportGen,))
+          next_thread.start()
+        elif ev == 'TransportStatus' and event.Value.upper() == "ERROR_OCCURRED":
           self.events_add('AVTransport', (('TransportStatus', "ERROR_OCCURRED"),))
           self.events_add('AVTransport', (('TransportStatus', "OK"),))
         elif ev == 'Mute':
-          self.Mute = "1" if event[1] else "0"
+          self.Mute = "1" if event.Value else "0"
           self.events_add('RenderingControl', (('Mute channel="Master"', self.Mute),))
         elif ev == 'Volume':
-          self.Volume = str(event[1])
+          self.Volume = str(event.Value)
           self.events_add('RenderingControl', (('Volume channel="Master"', self.Volume),))
       if self.is_events_manager_running:
-        self.IPCmpcControlerInstance.Player_event_event.wait()
+        self.PlayerInstance.Player_event_event.wait()
 
   def _shutdown_events_manager(self):
     self.is_events_manager_running = False
-    self.IPCmpcControlerInstance.Player_event_event.set()
-    for event_sub in self.EventSubscriptions:
+    self.PlayerInstance.Player_event_event.set()
+    for event_sub in list(self.EventSubscriptions.values()):
       event_sub.stop_event_management()
+    self.EventNotifier.stop()
 
   def start_events_management(self):
     if self.is_events_manager_running:
@@ -3045,6 +5722,7 @@ class DLNARenderer:
     else:
       self.is_events_manager_running = True
       self.logger.log('Démarrage de la gestion des événements', 1)
+      self.EventNotifier.start()
       manager_thread = threading.Thread(target=self._events_manager)
       manager_thread.start()
 
@@ -3054,82 +5732,250 @@ class DLNARenderer:
       self._shutdown_events_manager()
 
   def _rotate_jpeg(self, image, angle):
+    return _pipe_filter(self.RotateCommand.replace('{rot}', str(angle)), image, self.RotateTimeout, {**os.environ, 'jpegtrans_rot': str(angle)}, self.RotateSpill)
+
+  def _rotation_job(self, uri, rot_key):
+    rot_time = time.monotonic()
     try:
-      name = NAME + ':%s' % self.Port
-      pipe_w = kernel32.CreateNamedPipeW(r'\\.\pipe\write_' + urllib.parse.quote(name, safe=''), 0x00000002, 0, 1, 0x100000, 0x100000, 0, None)
-      pipe_r = kernel32.CreateNamedPipeW(r'\\.\pipe\read_' + urllib.parse.quote(name, safe=''), 0x00000001, 0, 1, 0x100000, 0x100000, 0, None)
-    except:
-      return None
-    b = ctypes.create_string_buffer(0x100000)
-    try:
-      process = subprocess.Popen(r'"%s\%s"' % (IPCmpcControler.SCRIPT_PATH, 'jpegtran.bat'), env={**os.environ, 'jpegtrans_rot': str(angle), 'jpegtrans_input': r'\\.\pipe\write_' + urllib.parse.quote(name, safe=''), 'jpegtrans_output': r'\\.\pipe\read_' + urllib.parse.quote(name, safe='')}, creationflags=subprocess.CREATE_NEW_CONSOLE, startupinfo=subprocess.STARTUPINFO(dwFlags=subprocess.STARTF_USESHOWWINDOW, wShowWindow=6))
+      if r'://' in uri:
+        f = _open_url(uri, method='GET')
+      else:
+        f = open(uri, 'rb')
+      image = f.read()
+      f.close()
     except:
-      try:
-        kernel32.DisconnectNamedPipe(pipe_w)
-        kernel32.CloseHandle(pipe_w)
-        kernel32.DisconnectNamedPipe(pipe_r)
-        kernel32.CloseHandle(pipe_r)
-      except:
-        pass
-      return None
-    n = DWORD()
+      image = None
+    rot_image = self._rotate_jpeg(image, rot_key[2]) if image else None
+    if not rot_image:
+      self.logger.log('Échec de la rotation de l\'image, transmission sans rotation: %s' % uri, 1)
+      return image or uri
+    self.RotatedImages.put(rot_key, rot_image, time.monotonic() - rot_time)
+    self.logger.log('Image tournée en %.0f ms: %s' % ((time.monotonic() - rot_time) * 1000, uri), 2)
+    return rot_image
+
+  def _prepare_item(self, cur_uri, metadata):
+    uri = None
+    protocol_info = ''
+    title = ''
+    upnp_class = ''
+    s_protocol_info = ''
+    caption_info = ''
+    caption_type = ''
     try:
-      while not kernel32.WriteFile(pipe_w, ctypes.cast(image, LPVOID), len(image), ctypes.byref(n), None):
-        if process.poll() != None:
-          kernel32.DisconnectNamedPipe(pipe_w)
-          kernel32.CloseHandle(pipe_w)
-          kernel32.DisconnectNamedPipe(pipe_r)
-          kernel32.CloseHandle(pipe_r)
-          return None
-        time.sleep(0.5)
-      kernel32.FlushFileBuffers(pipe_w)
-      kernel32.DisconnectNamedPipe(pipe_w)
-      kernel32.CloseHandle(pipe_w)
+      didl_root = minidom.parseString(metadata)
+      node = None
+      for ch_node in didl_root.documentElement.childNodes:
+        if ch_node.nodeType == ch_node.ELEMENT_NODE:
+          if ch_node.localName.lower() == 'item':
+            node = ch_node
+            break
+      for ch_node in node.childNodes:
+        if ch_node.nodeType == ch_node.ELEMENT_NODE:
+          if ch_node.localName.lower() == 'title':
+            title = _XMLGetNodeText(ch_node)[:501]
+          elif ch_node.localName.lower() == 'res':
+            for att in ch_node.attributes.itemsNS():
+              if att[0][1].lower() == 'protocolinfo':
+                if not uri:
+                  if 'DLNA.ORG_CI=' not in att[1].upper():
+                    uri = _XMLGetNodeText(ch_node)
+                    protocol_info = att[1]
+                  else:
+                    if att[1].upper().partition('DLNA.ORG_CI=')[2].split(';')[0] == 0:
+                      uri = _XMLGetNodeText(ch_node)
+                      protocol_info = att[1]
+                if not s_protocol_info and cur_uri == _XMLGetNodeText(ch_node):
+                  s_protocol_info = att[1]
+              elif not caption_info and att[0][1].lower() == 'subtitlefileuri':
+                caption_info = att[1]
+              elif not caption_type and att[0][1].lower() == 'subtitlefiletype':
+                caption_type = att[1]
+          elif ch_node.localName.lower() == 'class':
+            upnp_class = _XMLGetNodeText(ch_node)
+          elif ch_node.localName.lower().startswith('captioninfo'):
+            caption_info = _XMLGetNodeText(ch_node)
+            caption_type = next((att_v for (att_n, att_v) in ch_node.attributes.itemsNS() if att_n[1].lower() == 'type'), '')
     except:
-      try:
-        kernel32.DisconnectNamedPipe(pipe_w)
-        kernel32.CloseHandle(pipe_w)
-        kernel32.DisconnectNamedPipe(pipe_r)
-        kernel32.CloseHandle(pipe_r)
-      except:
-        pass
-      try:
-        if process.poll() == None:
-          os.system('taskkill /t /f /pid %s >nul 2>&1' % (process.pid))
-      except:
-        pass
+      uri = None
+    if not uri:
+      uri = cur_uri
+      protocol_info = s_protocol_info
+    item = MediaItem()
+    item.Title = title
+    item.UpnpClass = upnp_class
+    item.Image = 'object.item.imageItem'.lower() in upnp_class.lower()
+    rep = None
+    server = ''
+    reject_range = False
+    prefetched = None
+    if self.ImagePrefetcher and item.Image and uri:
+      prefetched = self.ImagePrefetcher.take(uri)
+    if uri:
+      if self.TrustControler or prefetched:
+        rep = True
+      elif r'://' in uri:
+        rep, reject_range = _open_url(uri, method='HEAD', test_reject_range=True)
+        if rep:
+          server = rep.getheader('Server', '')
+      else:
+        rep = os.path.isfile(uri)
+    if not rep:
       return None
-    rotated = b''
-    n = DWORD()
-    again = True
-    try:
-      while again:
-        again = kernel32.ReadFile(pipe_r, ctypes.cast(b, LPVOID), len(b), ctypes.byref(n), None)
-        again = (again or not rotated) and process.poll() == None
-        rotated = rotated + b.raw[:n.value]
-      kernel32.DisconnectNamedPipe(pipe_r)
-      kernel32.CloseHandle(pipe_r)
-    except:
+    item.URI = uri
+    if rep == True:
+      item.SubURI = caption_info
       try:
-        kernel32.DisconnectNamedPipe(pipe_r)
-        kernel32.CloseHandle(pipe_r)
+        uri_size = os.path.getsize(uri) if r'://' not in uri else None
       except:
-        pass
-      try:
-        if process.poll() == None:
-          os.system('taskkill /t /f /pid %s >nul 2>&1' % (process.pid))
-      except:
-        pass
-      return None
-    try:
-      if process.poll() == None:
-        os.system('taskkill /t /f /pid %s >nul 2>&1' % (process.pid))
-    except:
-      pass
-    if not rotated:
-      return None
+        uri_size = None
+    else:
+      item.SubURI = rep.getheader('CaptionInfo.sec', caption_info)
+      uri_size = rep.getheader('Content-Length')
+      rep.close()
+    rep = None
+    if item.SubURI and not self.TrustControler:
+      if r'://' in uri:
+        rep = _open_url(item.SubURI, method='HEAD')
+      else:
+        rep = os.path.isfile(item.SubURI)
+      if not rep:
+        item.SubURI = ""
+      elif rep != True:
+        rep.close()
+    if self.SearchSubtitles and 'object.item.videoItem'.lower() in upnp_class.lower() and not item.SubURI and r'://' in uri and 'Microsoft-HTTPAPI'.lower() not in server.lower() and "BubbleUPnP".lower() not in server.lower():
+      uri_name = uri.rsplit('.', 1)[0]
+      for sub_ext in ('.ttxt', '.txt', '.smi', '.srt', '.sub', '.ssa', '.ass', '.vtt'):
+        rep = _open_url(uri_name + sub_ext, method='HEAD', timeout=2)
+        if rep:
+          item.SubURI = uri_name + sub_ext
+          caption_type = sub_ext
+          rep.close()
+          break
+    if prefetched:
+      item.RotImage = prefetched[0]
+      item.Rotation = prefetched[1]
+      self.logger.log('Image préchargée - succès: %d/%d' % (self.ImagePrefetcher.Hits, self.ImagePrefetcher.Hits + self.ImagePrefetcher.Misses), 1)
+    elif item.Image and self.JpegRotate == 'j':
+      item.Rotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_probe(uri, ranged=not reject_range)[0], 0)
+      if item.Rotation:
+        rot_key = RotatedImageCache.key(uri, uri_size, item.Rotation)
+        cached = self.RotatedImages.get(rot_key)
+        if cached:
+          item.RotImage = cached[0]
+          self.logger.log('Image tournée trouvée en cache - taux de succès: %.0f%% - temps économisé: %.0f ms' % (self.RotatedImages.hit_rate() * 100, cached[1] * 1000), 1)
+        else:
+          item.RotImage = self.RotateExecutor.submit(self._rotation_job, uri, rot_key)
+    if item.Image and self.JpegRotate == 'k':
+      item.PlayerRotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_exif_orientation(prefetched[0] if prefetched else uri), 0)
+    item.MetaData = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/" xmlns:dlna="urn:schemas-dlna-org:metadata-1-0/" xmlns:sec="http://www.sec.co.kr/"><item><dc:title>%s</dc:title><upnp:class>%s</upnp:class><res protocolInfo="%s">%s</res>%s</item></DIDL-Lite>' % (html.escape(title), upnp_class, html.escape(protocol_info), html.escape(uri), '<sec:CaptionInfoEx sec:type="%s">%s</sec:CaptionInfoEx>' %(html.escape(caption_type), html.escape(item.SubURI)) if item.SubURI else '')
+    if 'MDEServer'.lower() in uri.lower():
+      if 'DLNA.ORG_CI' in item.MetaData and 'DLNA.ORG_CI=0' not in item.MetaData:
+        reject_range = True
+    if self.NoPartReqIntermediate and reject_range:
+      item.ProxyURI = 'http://%s:%s/proxy-%s' % (self.mpc_ip, self.Port, uri.rsplit('/' if r'://' in uri else '\\', 1)[-1])
+    durat_sec = None
+    if not item.Image:
+      durat_sec = self.DurationProbe.probe(uri, not reject_range, protocol_info.split(':')[2] if protocol_info.count(':') >= 3 else '')
+    if durat_sec is not None:
+      durat_sec = int(durat_sec)
+      item.Duration = '%d:%02d:%02d' % (durat_sec // 3600, (durat_sec % 3600) // 60, durat_sec % 60)
+      self.logger.log('Durée du contenu lue dans son en-tête: %s' % item.Duration, 2)
+    return item
+
+  def _apply_item(self, item, prev_transp_state):
+    with self.ItemLock:
+      self.AVTransportURI = item.URI
+      self.AVTransportSubURI = item.SubURI
+      self.AVTransportURIMetaData = item.MetaData
+      self.CurrentMediaDuration = item.Duration
+      self.rot_image = item.RotImage
+      self.rot_etag = '"%s"' % uuid.uuid4().hex if item.RotImage else ''
+      self.proxy_uri = item.ProxyURI
+      self.PlayerInstance.Player_subtitles = item.SubURI
+      self.PlayerInstance.Player_rotation = item.PlayerRotation
+      self.events_add('AVTransport', (('AVTransportURI', self.AVTransportURI), ('AVTransportURIMetaData', self.AVTransportURIMetaData), ('CurrentTrackMetaData', self.AVTransportURIMetaData), ('CurrentTrackURI', self.AVTransportURI), ('CurrentMediaDuration', self.CurrentMediaDuration), ('CurrentTrackDuration', self.CurrentMediaDuration)))
+      if prev_transp_state == "TRANSITIONING":
+        self.PlayerInstance.stop_playback()
+      self.PlayerInstance.Player_title = item.Title if item.Title else self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1]
+      if self.PlayerInstance.Player_status.upper() in ("NO_MEDIA_PRESENT", "STOPPED") and prev_transp_state in ("NO_MEDIA_PRESENT", "STOPPED"):
+        self.TransportState = "STOPPED"
+        self.PlayerInstance.Player_events.append(('TransportState', "STOPPED"))
+        self.PlayerInstance.Player_event_event.set()
+      else:
+        self.PlayerInstance.open((self.proxy_uri or self.AVTransportURI) if not self.rot_image else 'http://%s:%s/rotated-%s' % (self.mpc_ip, self.Port, self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1]))
+        if '<upnp:class>object.item.imageItem'.lower() in self.AVTransportURIMetaData.replace(' ','').lower():
+          self.PlayerInstance.Player_image = True
+        else:
+          self.PlayerInstance.Player_image = False
+          self.PlayerInstance.play()
+    self.logger.log(LSTRINGS['current_content'] % (LSTRINGS['video'] if 'video' in item.UpnpClass.lower() else LSTRINGS['audio'] if 'audio' in item.UpnpClass.lower() else LSTRINGS['image'] if 'image' in item.UpnpClass.lower() else '', item.Title, self.AVTransportURI + ((' + ' + self.AVTransportSubURI) if self.AVTransportSubURI else '')), 0)
+    if item.RotImage and item.Rotation:
+      self.logger.log('Rotation du contenu de %s°' % item.Rotation, 2)
+    if self.ImagePrefetcher:
+      if item.Image:
+        self.ImagePrefetcher.observe(self.AVTransportURI)
+      else:
+        self.ImagePrefetcher.reset()
+    if item.PlayerRotation:
+      self.logger.log('Rotation du contenu de %s°' % item.PlayerRotation, 2)
+
+  def _set_next(self, uri, metadata):
+    with self.NextCondition:
+      self.NextGen += 1
+      changed = (uri, metadata) != (self.NextAVTransportURI, self.NextAVTransportURIMetaData)
+      self.NextAVTransportURI = uri
+      self.NextAVTransportURIMetaData = metadata
+      self.NextItem = None
+      self.PlayerInstance.Player_next = bool(uri)
+      self.NextCondition.notify_all()
+      gen = self.NextGen
+    if changed:
+      self.events_add('AVTransport', (('NextAVTransportURI', uri), ('NextAVTransportURIMetaData', metadata)))
+    return gen
+
+  def _prepare_next(self, gen, uri, metadata):
+    prep_time = time.monotonic()
+    item = self._prepare_item(uri, metadata)
+    with self.NextCondition:
+      if gen != self.NextGen:
+        return
+      self.NextItem = item or False
+      self.NextCondition.notify_all()
+    if item:
+      self.logger.log('Contenu suivant prêt en %.0f ms: %s' % ((time.monotonic() - prep_time) * 1000, item.URI), 1)
     else:
-      return rotated
+      self.logger.log('Contenu suivant inaccessible: %s' % uri, 1)
+
+  def _advance_next(self, transport_gen):
+    end_time = time.monotonic() + DLNARenderer.NextTimeout
+    while True:
+      with self.NextCondition:
+        while self.NextItem is None and self.NextAVTransportURI and time.monotonic() < end_time:
+          self.NextCondition.wait(end_time - time.monotonic())
+        item = self.NextItem
+        gen = self.NextGen
+      with self.ActionsCondition:
+        action_id = self.ActionsReceived
+        self.ActionsReceived += 1
+        while action_id > self.ActionsProcessed and self.is_request_manager_running:
+          self.ActionsCondition.wait()
+      try:
+        if not self.is_request_manager_running or transport_gen != self.TransportGen:
+          self.logger.log('Enchaînement sur le contenu suivant annulé', 1)
+          return
+        if gen != self.NextGen:
+          continue
+        self._set_next('', '')
+        if not item:
+          self.PlayerInstance.stop_playback()
+          return
+        self.logger.log('Enchaînement sur le contenu suivant', 1)
+        self._apply_item(item, "PLAYING")
+        return
+      finally:
+        with self.ActionsCondition:
+          self.ActionsProcessed += 1
+          self.ActionsCondition.notify_all()
 
   def _process_action(self, action_id, servi, acti, args, agent):
     service = next((serv for serv in self.Services if serv.Id.lower() == ('urn:upnp-org:serviceId:' + servi).lower()), None)
@@ -3153,6 +5999,8 @@ class DLNARenderer:
     if not self.is_request_manager_running:
       return '701', None
     self.logger.log('Début du traitement de l\'action %d %s-%s' % (action_id, servi, acti), 2)
+    if acti.lower() in DLNARenderer.TransportActions:
+      self.TransportGen += 1
     if acti.lower() == 'GetProtocolInfo'.lower():
       out_args['Source'] = ""
       if "Microsoft".lower() not in agent.lower() or not self.WMPDMCHideMKV:
@@ -3163,191 +6011,67 @@ class DLNARenderer:
       prev_transp_state = self.TransportState
       self.TransportState = "TRANSITIONING"
       self.events_add('AVTransport', (('TransportState', "TRANSITIONING"), ('CurrentTransportActions', "Stop")))
-      uri = None
-      protocol_info = ''
-      title = ''
-      upnp_class = ''
-      s_protocol_info = ''
-      caption_info = ''
-      caption_type = ''
-      try:
-        didl_root = minidom.parseString(in_args['CurrentURIMetaData'.lower()])
-        node = None
-        for ch_node in didl_root.documentElement.childNodes:
-          if ch_node.nodeType == ch_node.ELEMENT_NODE:
-            if ch_node.localName.lower() == 'item':
-              node = ch_node
-              break
-        for ch_node in node.childNodes:
-          if ch_node.nodeType == ch_node.ELEMENT_NODE:
-            if ch_node.localName.lower() == 'title':
-              title = _XMLGetNodeText(ch_node)[:501]
-            elif ch_node.localName.lower() == 'res':
-              for att in ch_node.attributes.itemsNS():
-                if att[0][1].lower() == 'protocolinfo':
-                  if not uri:
-                    if 'DLNA.ORG_CI=' not in att[1].upper():
-                      uri = _XMLGetNodeText(ch_node)
-                      protocol_info = att[1]
-                    else:
-                      if att[1].upper().partition('DLNA.ORG_CI=')[2].split(';')[0] == 0:
-                        uri = _XMLGetNodeText(ch_node)
-                        protocol_info = att[1]
-                  if not s_protocol_info and in_args['CurrentURI'.lower()] == _XMLGetNodeText(ch_node):
-                    s_protocol_info = att[1]
-                elif not caption_info and att[0][1].lower() == 'subtitlefileuri':
-                  caption_info = att[1]
-                elif not caption_type and att[0][1].lower() == 'subtitlefiletype':
-                  caption_type = att[1]
-            elif ch_node.localName.lower() == 'class':
-              upnp_class = _XMLGetNodeText(ch_node)
-            elif ch_node.localName.lower().startswith('captioninfo'):
-              caption_info = _XMLGetNodeText(ch_node)
-              caption_type = next((att_v for (att_n, att_v) in ch_node.attributes.itemsNS() if att_n[1].lower() == 'type'), '')
-      except:
-        uri = None
-      if not uri:
-        uri = in_args['CurrentURI'.lower()]
-        protocol_info = s_protocol_info
-      rep = None
-      server = ''
-      reject_range = False
-      if uri:
-        if self.TrustControler:
-          rep = True
-        elif r'://' in uri:
-          rep, reject_range = _open_url(uri, method='HEAD', test_reject_range=True)
-          if rep:
-            server = rep.getheader('Server', '')
-        else:
-          rep = os.path.isfile(uri)
-      if not rep:
+      self._set_next('', '')
+      item = self._prepare_item(in_args['CurrentURI'.lower()], in_args['CurrentURIMetaData'.lower()])
+      if not item:
         self.events_add('AVTransport', (('TransportStatus', "ERROR_OCCURRED"),))
         self.events_add('AVTransport', (('TransportStatus', "OK"),))
         self.TransportState = prev_transp_state
-        self.IPCmpcControlerInstance.Player_events.append(('TransportState', prev_transp_state))
-        self.IPCmpcControlerInstance.Player_event_event.set()
+        self.PlayerInstance.Player_events.append(('TransportState', prev_transp_state))
+        self.PlayerInstance.Player_event_event.set()
         return '716', None
-      self.AVTransportURI = uri
-      if rep == True:
-        self.AVTransportSubURI = caption_info
-      else:
-        self.AVTransportSubURI = rep.getheader('CaptionInfo.sec', caption_info)
-        rep.close()
-      rep = None
-      if self.AVTransportSubURI and not self.TrustControler:
-        if r'://' in uri:
-          rep = _open_url(self.AVTransportSubURI, method='HEAD')
-        else:
-          rep = os.path.isfile(self.AVTransportSubURI)
-        if not rep:
-          self.AVTransportSubURI = ""
-        elif rep != True:
-          rep.close()
-      if self.SearchSubtitles and 'object.item.videoItem'.lower() in upnp_class.lower() and not self.AVTransportSubURI and r'://' in uri and 'Microsoft-HTTPAPI'.lower() not in server.lower() and "BubbleUPnP".lower() not in server.lower():
-        uri_name = uri.rsplit('.', 1)[0]
-        for sub_ext in ('.ttxt', '.txt', '.smi', '.srt', '.sub', '.ssa', '.ass', '.vtt'):
-          rep = _open_url(uri_name + sub_ext, method='HEAD', timeout=2)
-          if rep:
-            self.AVTransportSubURI = uri_name + sub_ext
-            caption_type = sub_ext
-            rep.close()
-            break
-      self.IPCmpcControlerInstance.Player_subtitles = self.AVTransportSubURI
-      self.rot_image = b''
-      if 'object.item.imageItem'.lower() in upnp_class.lower() and self.JpegRotate == 'j':
-        image = None
-        try:
-          if r'://' in uri:
-            f = _open_url(uri, method='GET')
-          else:
-            f = open(uri, 'rb')
-          image = f.read()
-          f.close()
-        except:
-          image = None
-        if image:
-          rotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_exif_orientation(image), 0)
-        else:
-          rotation = 0
-        if rotation:
-          self.rot_image = self._rotate_jpeg(image, rotation) or b''
-        image = b''
-      self.IPCmpcControlerInstance.Player_rotation = 0
-      if 'object.item.imageItem'.lower() in upnp_class.lower() and self.JpegRotate == 'k':
-        self.IPCmpcControlerInstance.Player_rotation = {'upper-left': 0, 'lower-right': 180, 'upper-right': 90, 'lower-left': 270}.get(_jpeg_exif_orientation(self.AVTransportURI), 0)
-      self.AVTransportURIMetaData = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/" xmlns:dlna="urn:schemas-dlna-org:metadata-1-0/" xmlns:sec="http://www.sec.co.kr/"><item><dc:title>%s</dc:title><upnp:class>%s</upnp:class><res protocolInfo="%s">%s</res>%s</item></DIDL-Lite>' % (html.escape(title), upnp_class, html.escape(protocol_info), html.escape(uri), '<sec:CaptionInfoEx sec:type="%s">%s</sec:CaptionInfoEx>' %(html.escape(caption_type), html.escape(self.AVTransportSubURI)) if self.AVTransportSubURI else '')
-      if 'MDEServer'.lower() in self.AVTransportURI.lower():
-        if 'DLNA.ORG_CI' in self.AVTransportURIMetaData and 'DLNA.ORG_CI=0' not in self.AVTransportURIMetaData:
-          reject_range = True
-      if not self.NoPartReqIntermediate or not reject_range:
-        self.proxy_uri = ''
-      else:
-        self.proxy_uri = 'http://%s:%s/proxy-%s' % (self.mpc_ip, self.Port, self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1])
-      self.events_add('AVTransport', (('AVTransportURI', self.AVTransportURI), ('AVTransportURIMetaData', self.AVTransportURIMetaData), ('CurrentTrackMetaData', self.AVTransportURIMetaData), ('CurrentTrackURI', self.AVTransportURI)))
-      if prev_transp_state == "TRANSITIONING":
-        self.send_command((0xA0000002, ''))
-      self.IPCmpcControlerInstance.Player_title = title if title else self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1]
-      if self.IPCmpcControlerInstance.Player_status.upper() in ("NO_MEDIA_PRESENT", "STOPPED") and prev_transp_state in ("NO_MEDIA_PRESENT", "STOPPED"):
-        self.TransportState = "STOPPED"
-        self.RelativeTimePosition = "0:00:00"
-        self.CurrentMediaDuration = "0:00:00"
-        self.IPCmpcControlerInstance.Player_events.append(('TransportState', "STOPPED"))
-        self.events_add('AVTransport', (('CurrentMediaDuration', "0:00:00"), ('CurrentTrackDuration', "0:00:00")))
-        self.IPCmpcControlerInstance.Player_event_event.set()
-      else:
-        self.send_command((0xA0000000, (self.proxy_uri or self.AVTransportURI) if not self.rot_image else 'http://%s:%s/rotated-%s' % (self.mpc_ip, self.Port, self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1])))
-        if '<upnp:class>object.item.imageItem'.lower() in self.AVTransportURIMetaData.replace(' ','').lower():
-          self.IPCmpcControlerInstance.Player_image = True
-        else:
-          self.IPCmpcControlerInstance.Player_image = False
-          self.send_command((0xA0000004, ''))
-      self.logger.log(LSTRINGS['current_content'] % (LSTRINGS['video'] if 'video' in upnp_class.lower() else LSTRINGS['audio'] if 'audio' in upnp_class.lower() else LSTRINGS['image'] if 'image' in upnp_class.lower() else '', title, self.AVTransportURI + ((' + ' + self.AVTransportSubURI) if self.AVTransportSubURI else '')), 0)
-      if self.rot_image:
-        self.logger.log('Rotation du contenu de %s°' % rotation, 2)
-      if self.IPCmpcControlerInstance.Player_rotation:
-        self.logger.log('Rotation du contenu de %s°' % self.IPCmpcControlerInstance.Player_rotation, 2)
+      self._apply_item(item, prev_transp_state)
+    elif acti.lower() == 'SetNextAVTransportURI'.lower():
+      if self.TransportState == "NO_MEDIA_PRESENT":
+        return '701', None
+      next_uri = in_args['NextURI'.lower()]
+      gen = self._set_next(next_uri, in_args['NextURIMetaData'.lower()])
+      if next_uri and self.ImagePrefetcher and '<upnp:class>object.item.imageItem'.lower() in in_args['NextURIMetaData'.lower()].replace(' ','').lower():
+        self.ImagePrefetcher.add(next_uri)
+      if next_uri:
+        prep_thread = threading.Thread(target=self._prepare_next, args=(gen, next_uri, in_args['NextURIMetaData'.lower()]))
+        prep_thread.start()
     elif acti.lower() == 'Play'.lower():
       if self.TransportState == "NO_MEDIA_PRESENT":
         return '701', None
-      if self.IPCmpcControlerInstance.Player_status.upper() == "STOPPED" and self.IPCmpcControlerInstance.Player_image:
+      if self.PlayerInstance.Player_status.upper() == "STOPPED" and self.PlayerInstance.Player_image:
         time.sleep(0.1)
-      if self.IPCmpcControlerInstance.Player_status.upper() in ("STOPPED", "NO_MEDIA_PRESENT"):
-        self.send_command((0xA0000000, (self.proxy_uri or self.AVTransportURI) if not self.rot_image else 'http://%s:%s/rotated-%s' % (self.mpc_ip, self.Port, self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1])))
+      if self.PlayerInstance.Player_status.upper() in ("STOPPED", "NO_MEDIA_PRESENT"):
+        self.PlayerInstance.open((self.proxy_uri or self.AVTransportURI) if not self.rot_image else 'http://%s:%s/rotated-%s' % (self.mpc_ip, self.Port, self.AVTransportURI.rsplit('/' if r'://' in self.AVTransportURI else '\\', 1)[-1]))
         if '<upnp:class>object.item.imageItem'.lower() in self.AVTransportURIMetaData.replace(' ','').lower():
-          self.IPCmpcControlerInstance.Player_image = True
+          self.PlayerInstance.Player_image = True
         else:
-          self.IPCmpcControlerInstance.Player_image = False
-          self.send_command((0xA0000004, ''))
+          self.PlayerInstance.Player_image = False
+          self.PlayerInstance.play()
         if self.Minimize:
-          self.IPCmpcControlerInstance.send_restore()
-      elif self.IPCmpcControlerInstance.Player_image:
-        self.IPCmpcControlerInstance.Player_paused = False
-        if self.IPCmpcControlerInstance.Player_status != "PLAYING":
-          self.IPCmpcControlerInstance.Player_status = "PLAYING"
-          self.IPCmpcControlerInstance.Player_events.append(('TransportState', "PLAYING"))
-          self.IPCmpcControlerInstance.Player_event_event.set()
-          self.IPCmpcControlerInstance.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PLAYING"), 1)
+          self.PlayerInstance.send_restore()
+      elif self.PlayerInstance.Player_image:
+        self.PlayerInstance.Player_paused = False
+        if self.PlayerInstance.Player_status != "PLAYING":
+          self.PlayerInstance.Player_status = "PLAYING"
+          self.PlayerInstance.Player_events.append(('TransportState', "PLAYING"))
+          self.PlayerInstance.Player_event_event.set()
+          self.PlayerInstance.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PLAYING"), 1)
       else:
-        self.send_command((0xA0000004, ''))
+        self.PlayerInstance.play()
     elif acti.lower() == 'Pause'.lower():
       if self.TransportState == "NO_MEDIA_PRESENT":
         return '701', None
-      if self.IPCmpcControlerInstance.Player_image:
-        self.IPCmpcControlerInstance.Player_paused = True
-        if self.IPCmpcControlerInstance.Player_status == "PLAYING":
-          self.IPCmpcControlerInstance.Player_status = "PAUSED_PLAYBACK"
-          self.IPCmpcControlerInstance.Player_events.append(('TransportState', "PAUSED_PLAYBACK"))
-          self.IPCmpcControlerInstance.Player_event_event.set()
-          self.IPCmpcControlerInstance.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PAUSED_PLAYBACK"), 1)
+      if self.PlayerInstance.Player_image:
+        self.PlayerInstance.Player_paused = True
+        if self.PlayerInstance.Player_status == "PLAYING":
+          self.PlayerInstance.Player_status = "PAUSED_PLAYBACK"
+          self.PlayerInstance.Player_events.append(('TransportState', "PAUSED_PLAYBACK"))
+          self.PlayerInstance.Player_event_event.set()
+          self.PlayerInstance.logger.log('Lecteur - événement enregistré: %s = "%s"' % ('TransportState', "PAUSED_PLAYBACK"), 1)
       else:
-        self.send_command((0xA0000005, ''))
+        self.PlayerInstance.pause()
     elif acti.lower() == 'Stop'.lower():
       if self.TransportState in ("PLAYING", "PAUSED_PLAYBACK", "TRANSITIONING"):
-        self.send_command((0xA0000002, ''))
+        self.PlayerInstance.stop_playback()
         if self.Minimize:
-          self.IPCmpcControlerInstance.send_minimize()
-        self.IPCmpcControlerInstance.Player_image = False
+          self.PlayerInstance.send_minimize()
+        self.PlayerInstance.Player_image = False
     elif acti.lower() == 'Seek'.lower():
       if self.TransportState == "NO_MEDIA_PRESENT":
         return '701', None
@@ -3355,7 +6079,7 @@ class DLNARenderer:
         return '701', None
       prev_transp_state = self.TransportState
       if prev_transp_state != "STOPPED":
-        self.send_command((0xA0002000, str(sum(int(t[0])*t[1] for t in zip(reversed(in_args['target'].split(':')), [1,60,3600])))))
+        self.PlayerInstance.seek(sum(int(t[0])*t[1] for t in zip(reversed(in_args['target'].split(':')), [1,60,3600])))
     elif acti.lower() == 'GetPositionInfo'.lower():
       if self.TransportState == "NO_MEDIA_PRESENT":
         out_args = {'Track': '0', 'TrackDuration': '0:00:00', 'TrackMetaData': '', 'TrackURI': '', 'RelTime': '0:00:00', 'AbsTime': '0:00:00', 'RelCount': '2147483647', 'AbsCount': '2147483647'}
@@ -3364,8 +6088,8 @@ class DLNARenderer:
         out_args['TrackDuration'] = self.CurrentMediaDuration
         out_args['TrackMetaData'] = self.AVTransportURIMetaData
         out_args['TrackURI'] = self.AVTransportURI
-        out_args['RelTime'] = self.RelativeTimePosition
-        out_args['AbsTime'] = self.RelativeTimePosition
+        out_args['RelTime'] = self.PlayerInstance.request_time_pos() or "0:00:00"
+        out_args['AbsTime'] = out_args['RelTime']
         out_args['RelCount'] = "2147483647"
         out_args['AbsCount'] = "2147483647"
     elif acti.lower() == 'GetMediaInfo'.lower():
@@ -3373,8 +6097,8 @@ class DLNARenderer:
       out_args['MediaDuration'] = self.CurrentMediaDuration
       out_args['CurrentURI'] = self.AVTransportURI
       out_args['CurrentURIMetaData'] = self.AVTransportURIMetaData
-      out_args['NextURI'] = ""
-      out_args['NextURIMetaData'] = ""
+      out_args['NextURI'] = self.NextAVTransportURI
+      out_args['NextURIMetaData'] = self.NextAVTransportURIMetaData
       out_args['PlayMedium'] = "NETWORK,NONE"
       out_args['RecordMedium'] = "NOT_IMPLEMENTED"
       out_args['WriteStatus'] = "NOT_IMPLEMENTED"
@@ -3387,9 +6111,9 @@ class DLNARenderer:
     elif acti.lower() == 'GetVolume'.lower():
       out_args['CurrentVolume'] = self.Volume
     elif acti.lower() == 'SetMute'.lower():
-      self.IPCmpcControlerInstance.set_mute(True if in_args['DesiredMute'.lower()] == "1" else False)
+      self.PlayerInstance.set_mute(True if in_args['DesiredMute'.lower()] == "1" else False)
     elif acti.lower() == 'SetVolume'.lower():
-      self.IPCmpcControlerInstance.set_volume(int(float(in_args['DesiredVolume'.lower()])))
+      self.PlayerInstance.set_volume(int(float(in_args['DesiredVolume'.lower()])))
     elif acti.lower() == 'GetCurrentTransportActions'.lower():
       out_args['Actions'] = {'TRANSITIONING': "Stop", 'STOPPED': "Play,Seek",'PAUSED_PLAYBACK': "Play,Stop,Seek" ,'PLAYING': "Pause,Stop,Seek"}.get(self.TransportState, "")
     else:
@@ -3422,13 +6146,13 @@ class DLNARenderer:
     if not self.Ip:
       self.mpc_shutdown_event.set()
       return
-    self.IPCmpcControlerInstance.start()
-    self.IPCmpcControlerInstance.Player_event_event.wait()
-    if not self.IPCmpcControlerInstance.wnd_mpc:
+    self.PlayerInstance.start()
+    self.PlayerInstance.Player_event_event.wait()
+    if not self.PlayerInstance.ready():
       self.mpc_shutdown_event.set()
       return
     if self.Minimize:
-      self.IPCmpcControlerInstance.send_minimize()
+      self.PlayerInstance.send_minimize()
     self.start_events_management()
     self.start_request_management()
     self.start_search_management()
@@ -3436,20 +6160,28 @@ class DLNARenderer:
     self.send_advertisement(True)
 
   def stop(self):
-    if not self.IPCmpcControlerInstance.wnd_ctrl:
+    if not self.PlayerInstance.launched():
       return
-    if self.IPCmpcControlerInstance.wnd_mpc:
-      self.send_command((0xA0000002,''))
+    if self.PlayerInstance.ready():
+      self.PlayerInstance.stop_playback()
       self.send_advertisement(False)
       self.send_advertisement(False)
       self.stop_search_management()
       self.stop_request_management()
       self.stop_events_management()
-    self.IPCmpcControlerInstance.stop()
+    self.PlayerInstance.stop()
+    self.RotatedImages.close()
+    self.RotateExecutor.shutdown(wait=False)
+    if self.ProxyCache:
+      self.ProxyCache.close()
+    if self.ImagePrefetcher:
+      self.ImagePrefetcher.close()
 
 
 if __name__ == '__main__':
 
+  import msvcrt
+
   print('DLNAmpcRenderer v1.3.2 (https://github.com/PCigales/DLNAmpcRenderer)    Copyright © 2022 PCigales')
   print(LSTRINGS['license'])
   print('')
@@ -3464,10 +6196,21 @@ if __name__ == '__main__':
   parser.add_argument('--minimize', '-m', help=LSTRINGS['parser_minimized'], action='store_true')
   parser.add_argument('--fullscreen', '-f', help=LSTRINGS['parser_fullscreen'], action='store_true')
   parser.add_argument('--rotate_jpeg', '-r', metavar='ROTATE_MODE', help=LSTRINGS['parser_rotation'], choices=['n', 'k', 'j'], default='n')
+  parser.add_argument('--rotate_command', '-c', metavar='ROTATE_COMMAND', help=LSTRINGS['parser_rotation_command'], default=None)
+  parser.add_argument('--rotate_cache', '-C', metavar='CACHE_SIZE', help=LSTRINGS['parser_rotation_cache'], type=int, default=64)
+  parser.add_argument('--rotate_cache_disk', '-D', metavar='CACHE_SIZE', help=LSTRINGS['parser_rotation_cache_disk'], type=int, default=0)
+  parser.add_argument('--rotate_spill', '-S', metavar='SPILL_SIZE', help=LSTRINGS['parser_rotation_spill'], type=int, default=8)
+  parser.add_argument('--rotate_pool', '-W', metavar='NUMBER', help=LSTRINGS['parser_rotation_pool'], type=int, default=2)
+  parser.add_argument('--prefetch', '-P', metavar='NUMBER', help=LSTRINGS['parser_prefetch'], type=int, default=0)
   parser.add_argument('--wmpdmc_no_mkv', '-w', help=LSTRINGS['parser_mkv'], action='store_true')
   parser.add_argument('--trust_controler', '-t', help=LSTRINGS['parser_trust'], action='store_true')
   parser.add_argument('--search_subtitles', '-s', help=LSTRINGS['parser_subtitles'], action='store_true')
   parser.add_argument('--no_part_req_intermediate', '-i', help=LSTRINGS['parser_intermediate'], action='store_true')
+  parser.add_argument('--proxy_cache', '-K', metavar='CACHE_SIZE', help=LSTRINGS['parser_proxy_cache'], type=int, default=0)
+  parser.add_argument('--proxy_cache_total', '-T', metavar='CACHE_SIZE', help=LSTRINGS['parser_proxy_cache_total'], type=int, default=2048)
+  parser.add_argument('--proxy_readahead', '-A', metavar='BUFFER_SIZE', help=LSTRINGS['parser_proxy_readahead'], type=int, default=16)
+  parser.add_argument('--proxy_readahead_time', '-a', metavar='SECONDS', help=LSTRINGS['parser_proxy_readahead_time'], type=float, default=0)
+  parser.add_argument('--mpv', '-M', metavar='MPV_PATH', help=LSTRINGS['parser_mpv'], nargs='?', const='mpv', default=None)
   parser.add_argument('--verbosity', '-v', metavar='VERBOSE', help=LSTRINGS['parser_verbosity'], type=int, choices=[0, 1, 2], default=0)
 
   args = parser.parse_args()
@@ -3475,7 +6218,7 @@ if __name__ == '__main__':
     NAME = args.name
     UDN = 'uuid:' + str(uuid.uuid5(uuid.NAMESPACE_URL, args.name))
     DLNARenderer.Device_SCPD = DLNARenderer.Device_SCPD.replace('DLNAmpcRenderer', html.escape(NAME)).replace('uuid:' + str(uuid.uuid5(uuid.NAMESPACE_URL, 'DLNAmpcRenderer')), UDN)
-  Renderer = DLNARenderer(args.bind, args.port, args.minimize, args.fullscreen, args.rotate_jpeg, args.wmpdmc_no_mkv, args.trust_controler, args.search_subtitles, args.no_part_req_intermediate, args.verbosity)
+  Renderer = DLNARenderer(args.bind, args.port, args.minimize, args.fullscreen, args.rotate_jpeg, args.wmpdmc_no_mkv, args.trust_controler, args.search_subtitles, args.no_part_req_intermediate, args.verbosity, Player=(partial(IPCmpvControler, mpv_path=args.mpv) if args.mpv else IPCmpcControler), RotateCommand=args.rotate_command, RotateCacheSize=args.rotate_cache, RotateCacheDiskSize=args.rotate_cache_disk, Prefetch=args.prefetch, RotatePool=args.rotate_pool, RotateSpillSize=args.rotate_spill, ProxyCacheSize=args.proxy_cache, ProxyCacheTotalSize=args.proxy_cache_total, ProxyReadAhead=args.proxy_readahead, ProxyReadAheadTime=args.proxy_readahead_time)
   print(LSTRINGS['keyboard_s'])
   print(LSTRINGS['keyboard_m'] % (LSTRINGS['enabled'] if Renderer.Minimize else LSTRINGS['disabled']))
   print(LSTRINGS['keyboard_f'] % (LSTRINGS['enabled'] if Renderer.FullScreen else LSTRINGS['disabled']))
@@ -3493,7 +6236,7 @@ if __name__ == '__main__':
       if k == b'M':
         Renderer.Minimize = not Renderer.Minimize
         if Renderer.TransportState in ("NO_MEDIA_PRESENT", "STOPPED"):
-          Renderer.IPCmpcControlerInstance.send_minimize()
+          Renderer.PlayerInstance.send_minimize()
         print(LSTRINGS['mode_m'] % ('activé' if Renderer.Minimize else 'désactivé'))
       elif k == b'F':
         Renderer.FullScreen = not Renderer.FullScreen
@@ -0,0 +1,479 @@
+# DLNAmpcRenderer events benchmark (https://github.com/PCigales/DLNAmpcRenderer)
+# Copyright © 2022 PCigales
+# This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
+
+import threading
+import socket
+import socketserver
+import http.server
+import time
+import re
+import gc
+import argparse
+import sys
+import json
+import os
+import tempfile
+import html
+from functools import partial
+try:
+  import resource
+except:
+  resource = None
+from DLNAmpcRenderer import DLNARenderer, IPCmpcControler, IPCmpvControler, SimulatedPlayer, HTTPMessage, HTTPRequest
+
+
+class FakeControler(socketserver.ThreadingTCPServer):
+
+  allow_reuse_address = True
+  daemon_threads = True
+  block_on_close = False
+
+  ValPattern = re.compile(rb'Volume channel=&quot;Master&quot; val=&quot;(\d+)&quot;')
+
+  def __init__(self, delay, injected):
+    self.Delay = delay
+    self.Injected = injected
+    self.Latencies = []
+    self.Received = 0
+    self.Last = None
+    self.Lock = threading.Lock()
+    super().__init__(('127.0.0.1', 0), FakeControlerHandler)
+    self.URL = 'http://127.0.0.1:%d/callback' % self.server_address[1]
+
+
+class FakeControlerHandler(socketserver.BaseRequestHandler):
+
+  def handle(self):
+    while True:
+      req = HTTPMessage(self.request, decode=None, timeout=30)
+      if req.method != 'NOTIFY':
+        return
+      rec_time = time.perf_counter()
+      if self.server.Delay:
+        time.sleep(self.server.Delay)
+      with self.server.Lock:
+        self.server.Received += 1
+        for val in FakeControler.ValPattern.findall(req.body or b''):
+          inj_time = self.server.Injected.get(int(val))
+          if inj_time is not None:
+            self.server.Latencies.append(rec_time - inj_time)
+            self.server.Last = int(val)
+      try:
+        self.request.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n' + (b'Connection: close\r\n\r\n' if req.expect_close else b'\r\n'))
+      except:
+        return
+      if req.expect_close:
+        return
+
+
+class FakeMpv(socketserver.ThreadingUnixStreamServer):
+
+  daemon_threads = True
+  block_on_close = False
+
+  def __init__(self, path, duration=600):
+    self.Duration = duration
+    super().__init__(path, FakeMpvHandler)
+
+
+class FakeMpvHandler(socketserver.StreamRequestHandler):
+
+  def send(self, msg):
+    with self.Lock:
+      try:
+        self.wfile.write(json.dumps(msg).encode('utf-8') + b'\n')
+      except:
+        pass
+
+  def position(self):
+    if self.Props['idle-active']:
+      return None
+    return min(self.Pos + ((time.monotonic() - self.Ref) if self.Ref is not None else 0), self.server.Duration)
+
+  def set(self, name, value):
+    if name == 'pause' and not self.Props['idle-active']:
+      self.Pos = self.position()
+      self.Ref = None if value else time.monotonic()
+    self.Props[name] = value
+    if name in self.Observed:
+      self.send({'event': 'property-change', 'id': self.Observed[name], 'name': name, 'data': self.position() if name == 'time-pos' else value})
+
+  def ticker(self):
+    while not self.Closed:
+      time.sleep(0.05)
+      if self.Ref is not None:
+        self.set('time-pos', None)
+        if self.position() >= self.server.Duration:
+          self.Ref = None
+          self.send({'event': 'end-file', 'reason': 'eof'})
+          self.set('idle-active', True)
+          self.set('time-pos', None)
+
+  def handle(self):
+    self.Lock = threading.Lock()
+    self.Observed = {}
+    self.Props = {'time-pos': None, 'duration': None, 'pause': False, 'mute': False, 'volume': 100.0, 'idle-active': True}
+    self.Pos = 0
+    self.Ref = None
+    self.Closed = False
+    threading.Thread(target=self.ticker, daemon=True).start()
+    for line in self.rfile:
+      try:
+        req = json.loads(line)
+        cmd = req['command']
+      except:
+        continue
+      data = None
+      if cmd[0] == 'observe_property':
+        self.Observed[cmd[2]] = cmd[1]
+        self.set(cmd[2], self.Props[cmd[2]])
+      elif cmd[0] == 'set_property':
+        self.set(cmd[1], cmd[2])
+      elif cmd[0] == 'get_property':
+        data = self.position() if cmd[1] == 'time-pos' else self.Props.get(cmd[1])
+      elif cmd[0] == 'loadfile':
+        if not self.Props['idle-active']:
+          self.send({'event': 'end-file', 'reason': 'stop'})
+        self.send({'event': 'start-file'})
+        self.Pos = 0
+        self.Ref = None
+        self.set('idle-active', False)
+        self.set('duration', self.server.Duration)
+        self.send({'event': 'file-loaded'})
+        self.Ref = None if self.Props['pause'] else time.monotonic()
+        self.set('time-pos', None)
+      elif cmd[0] == 'seek':
+        self.Pos = float(cmd[1])
+        self.Ref = None if self.Props['pause'] else time.monotonic()
+        self.send({'event': 'seek'})
+        self.set('time-pos', None)
+      elif cmd[0] == 'stop':
+        self.Ref = None
+        self.send({'event': 'end-file', 'reason': 'stop'})
+        self.set('idle-active', True)
+        self.set('time-pos', None)
+      self.send({'error': 'success', 'data': data, 'request_id': req.get('request_id')})
+      if cmd[0] == 'quit':
+        break
+    self.Closed = True
+
+
+def percentile(values, p):
+  if not values:
+    return float('nan')
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def max_rss():
+  if resource is None:
+    return None
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def current_rss():
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+  except:
+    return max_rss()
+
+SoapSetVolume = '<?xml version="1.0"?><s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body><u:SetVolume xmlns:u="urn:schemas-upnp-org:service:RenderingControl:1"><InstanceID>0</InstanceID><Channel>Master</Channel><DesiredVolume>%d</DesiredVolume></u:SetVolume></s:Body></s:Envelope>'
+
+def run(nb_controlers, nb_dead, rate, duration, delay, port, soap, mpv, verbosity):
+  fake_mpv = None
+  if mpv:
+    soap = True
+    ipc_path = os.path.join(tempfile.mkdtemp(), 'mpv')
+    fake_mpv = FakeMpv(ipc_path)
+    threading.Thread(target=fake_mpv.serve_forever, daemon=True).start()
+    renderer = DLNARenderer('127.0.0.1', port, JpegRotate='n', verbosity=verbosity, Player=partial(IPCmpvControler, ipc_path=ipc_path, launch=False))
+  else:
+    renderer = DLNARenderer('127.0.0.1', port, JpegRotate='n', verbosity=verbosity, Player=(SimulatedPlayer if soap else IPCmpcControler))
+  player = renderer.PlayerInstance
+  if soap:
+    player.start()
+    player.Player_event_event.wait()
+  injected = {}
+  controlers = [FakeControler(delay, injected) for i in range(nb_controlers)]
+  for controler in controlers:
+    threading.Thread(target=controler.serve_forever, daemon=True).start()
+  dead_urls = []
+  for i in range(nb_dead):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    dead_urls.append('http://127.0.0.1:%d/callback' % sock.getsockname()[1])
+    sock.close()
+  renderer.start_events_management()
+  renderer.start_request_management()
+  time.sleep(0.2)
+  for url in [controler.URL for controler in controlers] + dead_urls:
+    resp = HTTPRequest('http://127.0.0.1:%d/RC_E' % port, method='SUBSCRIBE', headers={'Callback': '<%s>' % url, 'NT': 'upnp:event', 'Timeout': 'Second-1800'})
+    if resp.code != '200':
+      print('Subscription failure for', url)
+  event_subs = list(renderer.EventSubscriptions.values())
+  time.sleep(0.5)
+  for controler in controlers:
+    with controler.Lock:
+      controler.Received = 0
+  gc.collect()
+  threads_max = threading.active_count()
+  nb_events = max(1, int(rate * duration))
+  cpu_start = time.process_time()
+  start = time.perf_counter()
+  for i in range(nb_events):
+    target = start + i / rate
+    now = time.perf_counter()
+    if target > now:
+      time.sleep(target - now)
+    injected[1000 + i] = time.perf_counter()
+    if soap:
+      HTTPRequest('http://127.0.0.1:%d/RC_C' % port, method='POST', headers={'Content-Type': 'text/xml; charset="utf-8"', 'SOAPACTION': '"urn:schemas-upnp-org:service:RenderingControl:1#SetVolume"'}, data=(SoapSetVolume % (1000 + i)).encode('utf-8'))
+    else:
+      player.Player_events.append(('Volume', 1000 + i))
+      player.Player_event_event.set()
+    threads_max = max(threads_max, threading.active_count())
+  expected = nb_events * nb_controlers
+  deadline = time.perf_counter() + max(10, 2 * duration)
+  while time.perf_counter() < deadline and any(c.Last != 1000 + nb_events - 1 for c in controlers):
+    threads_max = max(threads_max, threading.active_count())
+    time.sleep(0.01)
+  elapsed = time.perf_counter() - start
+  cpu = time.process_time() - cpu_start
+  received = sum(c.Received for c in controlers)
+  latencies = [l for c in controlers for l in c.Latencies]
+  merged = sum(e.EventsMerged for e in event_subs)
+  dropped = sum(e.EventsDropped for e in event_subs)
+  reused = sum(e.NotifyReused for e in event_subs)
+  notified = sum(e.NotifyCount for e in event_subs)
+  renderer.stop_request_management()
+  renderer.stop_events_management()
+  if soap:
+    player.stop()
+  if fake_mpv:
+    fake_mpv.shutdown()
+    fake_mpv.server_close()
+  for controler in controlers:
+    controler.shutdown()
+    controler.server_close()
+  print('controlers: %d (+%d dead) - %s injected: %d at %.0f/s' % (nb_controlers, nb_dead, (('SetVolume actions to mpv' if mpv else 'SetVolume actions') if soap else 'events'), nb_events, rate))
+  print('notifications received: %d/%d in %.2f s - throughput: %.0f/s' % (received, expected, elapsed, received / elapsed))
+  print('latency p50: %.2f ms - p99: %.2f ms - max: %.2f ms' % (percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000, (max(latencies) if latencies else float('nan')) * 1000))
+  print('events merged: %d - dropped: %d - connection reuse: %d/%d' % (merged, dropped, reused, notified))
+  print('player events lag max: %.2f ms - overwritten: %d - dropped: %d' % (player.Player_events.Max_lag * 1000, player.Player_events.Overwritten, player.Player_events.Dropped))
+  print('cpu: %.3f s - per event: %.3f ms - per notification: %.3f ms' % (cpu, cpu * 1000 / nb_events, cpu * 1000 / max(1, received)))
+  print('threads max: %d - max rss: %s' % (threads_max, ('%d kB' % max_rss()) if resource else 'n/a'))
+
+
+class TrackServer(http.server.ThreadingHTTPServer):
+
+  daemon_threads = True
+
+  def __init__(self, delay, size=16384):
+    self.Delay = delay
+    self.Size = size
+    http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), TrackHandler)
+    self.URL = 'http://127.0.0.1:%d/' % self.server_address[1]
+
+
+class TrackHandler(http.server.BaseHTTPRequestHandler):
+
+  def log_message(self, *args):
+    pass
+
+  def do_HEAD(self, body=False):
+    time.sleep(self.server.Delay)
+    self.send_response(200)
+    self.send_header('Content-Type', 'audio/mpeg')
+    self.send_header('Content-Length', str(self.server.Size))
+    self.end_headers()
+    if body:
+      self.wfile.write(b'\x00' * self.server.Size)
+
+  def do_GET(self):
+    self.do_HEAD(True)
+
+
+SoapAction = '<?xml version="1.0"?><s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body><u:%s xmlns:u="urn:schemas-upnp-org:service:AVTransport:1"><InstanceID>0</InstanceID>%s</u:%s></s:Body></s:Envelope>'
+TrackMetaData = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/"><item><dc:title>Track %d</dc:title><upnp:class>object.item.audioItem.musicTrack</upnp:class><res protocolInfo="http-get:*:audio/mpeg:*">%s</res></item></DIDL-Lite>'
+
+def avtransport(port, action, **args):
+  resp = HTTPRequest('http://127.0.0.1:%d/AVT_C' % port, method='POST', headers={'Content-Type': 'text/xml; charset="utf-8"', 'SOAPACTION': '"urn:schemas-upnp-org:service:AVTransport:1#%s"' % action}, data=(SoapAction % (action, ''.join('<%s>%s</%s>' % (k, html.escape(str(v)), k) for k, v in args.items()), action)).encode('utf-8'))
+  return dict((k, html.unescape(v)) for k, v in re.findall(r'<([A-Za-z]+)>([^<]*)</\1>', resp.body.decode('utf-8'))) if resp.code == '200' else None
+
+def renewals(cycles, nb_live, port, verbosity):
+  renderer = DLNARenderer('127.0.0.1', port, JpegRotate='n', verbosity=verbosity, Player=IPCmpcControler)
+  controler = FakeControler(0, {})
+  threading.Thread(target=controler.serve_forever, daemon=True).start()
+  renderer.start_events_management()
+  renderer.start_request_management()
+  time.sleep(0.2)
+  url = 'http://127.0.0.1:%d/RC_E' % port
+  def subscribe(timeout):
+    resp = HTTPRequest(url, method='SUBSCRIBE', headers={'Callback': '<%s>' % controler.URL, 'NT': 'upnp:event', 'Timeout': 'Second-%d' % timeout})
+    return resp.header('SID') if resp.code == '200' else None
+  live = [subscribe(1800) for i in range(nb_live)]
+  failures = 0
+  churned = 0
+  expiring = 0
+  table_max = len(renderer.EventSubscriptions)
+  rss_start = None
+  latencies = []
+  cpu_start = time.process_time()
+  start = time.perf_counter()
+  for i in range(cycles):
+    req_time = time.perf_counter()
+    resp = HTTPRequest(url, method='SUBSCRIBE', headers={'SID': live[i % nb_live], 'Timeout': 'Second-1800'})
+    latencies.append(time.perf_counter() - req_time)
+    if resp.code != '200':
+      failures += 1
+    if i % 100 == 99:
+      k = (i // 100) % nb_live
+      if HTTPRequest(url, method='UNSUBSCRIBE', headers={'SID': live[k]}).code != '200':
+        failures += 1
+      live[k] = subscribe(1800)
+      churned += 1
+      if subscribe(1):
+        expiring += 1
+    table_max = max(table_max, len(renderer.EventSubscriptions))
+    if i == min(cycles, 10000) - 1:
+      gc.collect()
+      rss_start = current_rss()
+  elapsed = time.perf_counter() - start
+  cpu = time.process_time() - cpu_start
+  time.sleep(3)
+  table_end = len(renderer.EventSubscriptions)
+  gc.collect()
+  rss_end = current_rss()
+  renderer.stop_request_management()
+  renderer.stop_events_management()
+  controler.shutdown()
+  controler.server_close()
+  window = min(1000, max(1, cycles // 10))
+  print('renewal cycles: %d on %d live subscriptions in %.1f s - cpu per cycle: %.0f µs - failures: %d' % (cycles, nb_live, elapsed, cpu * 1000000 / max(1, cycles), failures))
+  print('renewal latency: first %d: %.2f ms - last %d: %.2f ms' % (window, sum(latencies[:window]) * 1000 / window, window, sum(latencies[-window:]) * 1000 / window))
+  print('subscriptions replaced: %d - expiring subscriptions created: %d - subscription table: max %d, at the end %d' % (churned, expiring, table_max, table_end))
+  print('rss after warm-up: %s - at the end: %s' % (('%d kB' % rss_start) if rss_start else 'n/a', ('%d kB' % rss_end) if rss_end else 'n/a'))
+  checks = (('renewals and unsubscriptions answered', failures == 0), ('subscription table back to the live subscriptions', table_end == nb_live), ('subscription table bounded', table_max <= nb_live + 10 + 5 * expiring / elapsed), ('memory bounded', not rss_start or not rss_end or rss_end - rss_start < 16384))
+  for label, result in checks:
+    print('%s: %s' % (label, 'ok' if result else 'FAILED'))
+  return all(result for label, result in checks)
+
+
+def transitions(nb_tracks, track_duration, poll, delay, port, verbosity):
+  server = TrackServer(delay)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  tracks = [(server.URL + 'track%02d.mp3' % i, TrackMetaData % (i, server.URL + 'track%02d.mp3' % i)) for i in range(nb_tracks)]
+  results = {}
+  for gapless in (False, True):
+    renderer = DLNARenderer('127.0.0.1', port, JpegRotate='n', verbosity=verbosity, Player=partial(SimulatedPlayer, media_duration=track_duration))
+    player = renderer.PlayerInstance
+    player.start()
+    player.Player_event_event.wait()
+    renderer.start_events_management()
+    renderer.start_request_management()
+    time.sleep(0.2)
+    gaps = []
+    monitoring = [True]
+    def monitor():
+      running = False
+      stop_time = None
+      while monitoring[0]:
+        if player.Sim_clock.Running != running:
+          running = not running
+          now = time.perf_counter()
+          if running and stop_time is not None:
+            gaps.append(now - stop_time)
+          elif not running:
+            stop_time = now
+        time.sleep(0.001)
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.start()
+    avtransport(port, 'SetAVTransportURI', CurrentURI=tracks[0][0], CurrentURIMetaData=tracks[0][1])
+    avtransport(port, 'Play', Speed=1)
+    current = 0
+    if gapless and nb_tracks > 1:
+      avtransport(port, 'SetNextAVTransportURI', NextURI=tracks[1][0], NextURIMetaData=tracks[1][1])
+    deadline = time.perf_counter() + nb_tracks * (track_duration + 2 * poll + 5 * delay + 2) + 5
+    while time.perf_counter() < deadline:
+      time.sleep(poll)
+      if gapless:
+        info = avtransport(port, 'GetMediaInfo') or {}
+        if info.get('CurrentURI') != tracks[current][0]:
+          current = next((i for i in range(nb_tracks) if tracks[i][0] == info.get('CurrentURI')), current)
+          if current + 1 < nb_tracks:
+            avtransport(port, 'SetNextAVTransportURI', NextURI=tracks[current + 1][0], NextURIMetaData=tracks[current + 1][1])
+        if current == nb_tracks - 1 and renderer.TransportState == 'STOPPED':
+          break
+      elif (avtransport(port, 'GetTransportInfo') or {}).get('CurrentTransportState') == 'STOPPED':
+        current += 1
+        if current >= nb_tracks:
+          break
+        avtransport(port, 'SetAVTransportURI', CurrentURI=tracks[current][0], CurrentURIMetaData=tracks[current][1])
+        avtransport(port, 'Play', Speed=1)
+    monitoring[0] = False
+    monitor_thread.join()
+    renderer.stop_request_management()
+    renderer.stop_events_management()
+    player.stop()
+    player.join()
+    results[gapless] = gaps
+  server.shutdown()
+  server.server_close()
+  print('tracks: %d of %.1f s - media server delay: %.0f ms - controler polling: %.2f s' % (nb_tracks, track_duration, delay * 1000, poll))
+  for gapless, label in ((False, 'SetAVTransportURI + Play on STOPPED'), (True, 'SetNextAVTransportURI')):
+    gaps = results[gapless]
+    print('%s: transitions %d/%d - gap mean: %.0f ms - p50: %.0f ms - max: %.0f ms' % (label, len(gaps), nb_tracks - 1, (sum(gaps) / len(gaps) if gaps else float('nan')) * 1000, percentile(gaps, 50) * 1000, (max(gaps) if gaps else float('nan')) * 1000))
+
+
+ReplaySession = ((0x50000001, '1'), (0x50000003, 'title|author|description|file|3615.48'), (0x50000001, '2'), (0x50000002, '0')) + \
+  tuple((0x50000007, '%.3f' % (i * 0.5)) for i in range(120)) + \
+  ((0x50000002, '1'), (0x50000007, '60.012'), (0x50000002, '0'), (0x50000008, '1800.000')) + \
+  tuple((0x50000007, '%.3f' % (1800 + i * 0.5)) for i in range(120)) + \
+  ((0x50000001, '0'), (0x50000002, '2'))
+
+def replay(repeats, batch, verbosity):
+  player = IPCmpcControler(verbosity=verbosity)
+  notifications = list(ReplaySession) * repeats
+  batches = [notifications[i:i+batch] for i in range(0, len(notifications), batch)]
+  nb_events = 0
+  cpu_start = time.process_time()
+  start = time.perf_counter()
+  for notifs in batches:
+    player.dispatch_notifications(notifs)
+    nb_events += len(player.Player_events)
+    player.Player_events.clear()
+  elapsed = time.perf_counter() - start
+  cpu = time.process_time() - cpu_start
+  print('notifications replayed: %d in batches of %d - player events recorded: %d' % (len(notifications), batch, nb_events))
+  print('elapsed: %.3f s - throughput: %.0f/s - cpu per notification: %.2f µs' % (elapsed, len(notifications) / elapsed, cpu * 1000000 / len(notifications)))
+
+
+if __name__ == '__main__':
+
+  formatter = lambda prog: argparse.HelpFormatter(prog, max_help_position=50, width=119)
+  parser = argparse.ArgumentParser(formatter_class=formatter)
+  parser.add_argument('--controlers', '-c', metavar='NUMBER', help='number of local fake controlers [10 by default]', type=int, default=10)
+  parser.add_argument('--dead', '-d', metavar='NUMBER', help='number of subscriptions with an unreachable callback [0 by default]', type=int, default=0)
+  parser.add_argument('--rate', '-r', metavar='EVENTS_PER_SECOND', help='rate of the synthetic player events [50 by default]', type=float, default=50)
+  parser.add_argument('--duration', '-t', metavar='SECONDS', help='duration of the injection [5 by default]', type=float, default=5)
+  parser.add_argument('--delay', '-l', metavar='SECONDS', help='response delay of the fake controlers [0 by default]', type=float, default=0)
+  parser.add_argument('--port', '-p', metavar='RENDERER_TCP_PORT', help='TCP port of the renderer [8999 by default]', type=int, default=8999)
+  parser.add_argument('--soap', '-s', help='drive a simulated player with SetVolume actions through the HTTP/SOAP layer instead of injecting the player events', action='store_true')
+  parser.add_argument('--mpv', '-m', help='same as --soap but with the mpv backend connected to a local stand-in of the mpv JSON IPC server', action='store_true')
+  parser.add_argument('--replay', '-R', metavar='REPEATS', help='replay a recorded player notification stream through the dispatcher instead of running the events benchmark [0 by default]', type=int, default=0)
+  parser.add_argument('--next', '-N', metavar='TRACKS', help='measure the gap between consecutive tracks played by a simulated player, first with a controler polling the transport state then with SetNextAVTransportURI [0 by default]', type=int, default=0)
+  parser.add_argument('--track_duration', '-T', metavar='SECONDS', help='duration of the simulated tracks of the transition measurement [3 by default]', type=float, default=3)
+  parser.add_argument('--poll', '-o', metavar='SECONDS', help='polling interval of the controler of the transition measurement [1 by default]', type=float, default=1)
+  parser.add_argument('--renew', '-U', metavar='CYCLES', help='check the subscription table over SUBSCRIBE renewal cycles, with an unsubscription and a new subscription every 100 cycles, instead of running the events benchmark [0 by default]', type=int, default=0)
+  parser.add_argument('--batch', '-b', metavar='NUMBER', help='size of the notification batches of the replay [1 by default]', type=int, default=1)
+  parser.add_argument('--verbosity', '-v', metavar='VERBOSE', help='level of verbosity of the renderer from 0 to 2 [0 by default]', type=int, choices=[0, 1, 2], default=0)
+  args = parser.parse_args()
+  if args.replay > 0:
+    replay(args.replay, max(1, args.batch), args.verbosity)
+  elif args.renew > 0:
+    if not renewals(args.renew, max(1, args.controlers), args.port, args.verbosity):
+      sys.exit(1)
+  elif args.next > 0:
+    transitions(args.next, args.track_duration, args.poll, args.delay, args.port, args.verbosity)
+  else:
+    run(args.controlers, args.dead, args.rate, args.duration, args.delay, args.port, args.soap, args.mpv, args.verbosity)
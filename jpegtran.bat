@@ -1,3 +1,3 @@
 @setlocal enabledelayedexpansion
-@"C:\Program Files (x86)\ExifTool\jhead_jpegtran\jpegtran.exe" -copy none -rotate !jpegtrans_rot! !jpegtrans_input! !jpegtrans_output!
+@"C:\Program Files (x86)\ExifTool\jhead_jpegtran\jpegtran.exe" -copy none -rotate !jpegtrans_rot!
 @endlocal
\ No newline at end of file
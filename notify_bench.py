@@ -0,0 +1,81 @@
+# DLNAmpcRenderer notifications serialization benchmark (https://github.com/PCigales/DLNAmpcRenderer)
+# Copyright © 2022 PCigales
+# This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
+
+import time
+import uuid
+import html
+import argparse
+from DLNAmpcRenderer import EventSubscription
+
+
+class Service:
+
+  def __init__(self, name):
+    self.Id = 'urn:upnp-org:serviceId:' + name
+
+
+def legacy_notify(service, event, sid, seq):
+  msg_headers= {
+    'Content-Type': 'text/xml; charset="utf-8"',
+    'NT': 'upnp:event',
+    'NTS': 'upnp:propchange',
+    'SID': sid,
+    'SEQ': str(seq),
+    'Connection': 'close',
+    'User-Agent': 'DLNAmpcRenderer',
+    'Cache-Control': 'no-cache'
+  }
+  if service.Id[23:].lower() == 'ConnectionManager'.lower():
+    msg_body = '<?xml version="1.0"?>\n' \
+  '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0">##prop##</e:propertyset>'
+    for prop_name, prop_value in event:
+      msg_body = msg_body.replace('##prop##', '<e:property><' + prop_name + '>' + html.escape(prop_value) + '</' + prop_name + '></e:property>' + '##prop##')
+    msg_body = msg_body.replace('##prop##', '').encode('UTF-8')
+  else:
+    msg_body = '<?xml version="1.0"?>\n' \
+  '<e:propertyset xmlns:e="urn:schemas-upnp-org:event-1-0"><e:property><LastChange>&lt;Event xmlns=&quot;urn:schemas-upnp-org:metadata-1-0/%s/&quot;&gt;&lt;InstanceID val=&quot;0&quot;&gt;##prop##&lt;/InstanceID&gt;&lt;/Event&gt;</LastChange></e:property></e:propertyset>' % ('AVT' if 'AVTransport'.lower() in service.Id.lower() else 'RCS')
+    for prop_name, prop_value in event:
+      msg_body = msg_body.replace('##prop##', html.escape('<' + prop_name + ' val="' + html.escape(prop_value) + '"/>##prop##'))
+    msg_body = msg_body.replace('##prop##', '').encode('UTF-8')
+  msg_headers['Content-Length'] = str(len(msg_body))
+  return msg_headers, msg_body
+
+
+def shared_notify(msg_body, sid, seq):
+  return {**EventSubscription.NotifyHeaders, 'SID': sid, 'SEQ': str(seq), 'Content-Length': str(len(msg_body))}, msg_body
+
+
+def run(subscribers, events):
+  service = Service('AVTransport')
+  uri = 'http://192.168.1.10:8200/MediaItems/1234.mkv'
+  metadata = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/"><item><dc:title>Film &amp; making of</dc:title><upnp:class>object.item.videoItem</upnp:class><res protocolInfo="http-get:*:video/x-matroska:*">%s</res></item></DIDL-Lite>' % uri
+  event = (('TransportState', 'PLAYING'), ('CurrentTransportActions', 'Pause,Stop,Seek'), ('AVTransportURI', uri), ('AVTransportURIMetaData', metadata), ('CurrentTrackURI', uri), ('CurrentTrackMetaData', metadata), ('CurrentMediaDuration', '1:32:05'), ('CurrentTrackDuration', '1:32:05'))
+  if legacy_notify(service, event, 'uuid:0', 0)[1] != shared_notify(EventSubscription.build_notify_body(service, event), 'uuid:0', 0)[1]:
+    print('error: the shared body differs from the per-subscriber body')
+    return
+  print('event: %d properties - body: %d bytes - %d events per measure' % (len(event), len(legacy_notify(service, event, 'uuid:0', 0)[1]), events))
+  for n in subscribers:
+    sids = ['uuid:' + str(uuid.uuid4()) for i in range(n)]
+    start = time.process_time()
+    for seq in range(events):
+      for sid in sids:
+        legacy_notify(service, event, sid, seq)
+    legacy = (time.process_time() - start) / events
+    start = time.process_time()
+    for seq in range(events):
+      msg_body = EventSubscription.build_notify_body(service, event)
+      for sid in sids:
+        shared_notify(msg_body, sid, seq)
+    shared = (time.process_time() - start) / events
+    print('%d subscriber(s): cpu per event: %.1f µs serialized per subscriber - %.1f µs serialized once - ratio: %.1f' % (n, legacy * 1000000, shared * 1000000, legacy / shared if shared else 0))
+
+
+if __name__ == '__main__':
+
+  formatter = lambda prog: argparse.HelpFormatter(prog, max_help_position=50, width=119)
+  parser = argparse.ArgumentParser(formatter_class=formatter)
+  parser.add_argument('--subscribers', '-n', metavar='NUMBERS', help='comma separated numbers of subscribers to the service [1,10,100 by default]', default='1,10,100')
+  parser.add_argument('--events', '-e', metavar='NUMBER', help='number of events serialized for each number of subscribers [2000 by default]', type=int, default=2000)
+  args = parser.parse_args()
+  run([int(n) for n in args.subscribers.split(',') if n.strip()], args.events)
@@ -0,0 +1,299 @@
+# DLNAmpcRenderer probes benchmark (https://github.com/PCigales/DLNAmpcRenderer)
+# Copyright © 2022 PCigales
+# This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
+
+import threading
+import socketserver
+import http.server
+import urllib.request
+import struct
+import time
+import re
+import os
+import random
+import argparse
+import html
+from DLNAmpcRenderer import DLNARenderer, SimulatedPlayer, HTTPRequest, _jpeg_probe
+
+
+def legacy_jpeg_exif_orientation(image):
+  f = None
+  try:
+    f = urllib.request.urlopen(urllib.request.Request(image, headers={'User-Agent': 'Lavf'}))
+    if f.read(2) != b'\xff\xd8':
+      raise
+    t = b''
+    l = 2
+    while t != b'\xff\xe1':
+      f.read(l - 2)
+      t = f.read(2)
+      if t[:1] != b'\xff' or t == b'\xff\xda':
+        raise
+      l = struct.unpack('!H', f.read(2))[0]
+    if f.read(6) != b'Exif\x00\x00':
+      raise
+    ba = {b'MM': '>', b'II': '<'}.get(f.read(2),'')
+    if ba == '':
+      raise
+    if f.read(2) != (b'\x00\x2a' if ba == '>' else b'\x2a\x00') :
+      raise
+    f.read(struct.unpack(ba + 'I', f.read(4))[0] - 8)
+    ne = struct.unpack(ba + 'H', f.read(2))[0]
+    for i in range(ne):
+      e = f.read(12)
+      if struct.unpack(ba + 'H', e[0:2])[0] == 0x0112:
+        nb = {1: 1, 3: 2, 4: 4}.get(struct.unpack(ba + 'H', e[2:4])[0], 0)
+        if nb == 0 or struct.unpack(ba + 'I', e[4:8])[0] != 1:
+          raise
+        return {1: 'upper-left', 3: 'lower-right', 6: 'upper-right', 8: 'lower-left'}.get(struct.unpack(ba + {1: 'B', 2: 'H', 4: 'I'}[nb], e[8:8+nb])[0], None)
+    return None
+  except:
+    return None
+  finally:
+    if f:
+      try:
+        f.close()
+      except:
+        pass
+
+
+def segment(marker, payload):
+  return b'\xff' + bytes((marker,)) + struct.pack('>H', len(payload) + 2) + payload
+
+def make_jpeg(orientation, width, height, icc, app13, scan, exif_first, big_endian):
+  bo = '>' if big_endian else '<'
+  ifd = struct.pack(bo + 'H', 2) + struct.pack(bo + 'HHII', 0x010f, 2, 4, 0) + struct.pack(bo + 'HHIH', 0x0112, 3, 1, orientation) + b'\x00\x00' + b'\x00\x00\x00\x00'
+  exif = segment(0xe1, b'Exif\x00\x00' + (b'MM\x00\x2a' if big_endian else b'II\x2a\x00') + struct.pack(bo + 'I', 8) + ifd)
+  apps = b''.join(segment(0xe2, b'ICC_PROFILE\x00' + bytes((i + 1, icc)) + os.urandom(65000)) for i in range(icc))
+  apps += segment(0xed, b'Photoshop 3.0\x00' + os.urandom(app13)) if app13 else b''
+  sof = segment(0xc0, struct.pack('>BHHB', 8, height, width, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01')
+  return b'\xff\xd8' + segment(0xe0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00') + ((exif + apps) if exif_first else (apps + exif)) + segment(0xdb, bytes(65)) + sof + segment(0xc4, bytes(30)) + segment(0xda, bytes(10)) + os.urandom(scan) + b'\xff\xd9'
+
+
+class CorpusServer(socketserver.ThreadingTCPServer):
+
+  allow_reuse_address = True
+  daemon_threads = True
+  block_on_close = False
+
+  def __init__(self, corpus, reject_range, delay=0):
+    self.Corpus = corpus
+    self.RejectRange = reject_range
+    self.Delay = delay
+    self.Sent = 0
+    self.Requests = 0
+    self.Lock = threading.Lock()
+    super().__init__(('127.0.0.1', 0), CorpusHandler)
+
+
+class CorpusHandler(http.server.BaseHTTPRequestHandler):
+
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, *args):
+    pass
+
+  def do_HEAD(self):
+    time.sleep(self.server.Delay)
+    try:
+      data = self.server.Corpus[int(self.path.rsplit('/', 1)[-1].split('.')[0])]
+    except:
+      self.send_error(404)
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', 'image/jpeg')
+    self.send_header('Content-Length', str(len(data)))
+    self.send_header('Accept-Ranges', 'bytes')
+    self.send_header('Connection', 'close')
+    self.end_headers()
+
+  def do_GET(self):
+    time.sleep(self.server.Delay)
+    try:
+      data = self.server.Corpus[int(self.path.rsplit('/', 1)[-1].split('.')[0])]
+    except:
+      self.send_error(404)
+      return
+    m = None if self.server.RejectRange else re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+    if m:
+      s, e = m.groups()
+      if not s:
+        s, e = max(len(data) - int(e), 0), len(data) - 1
+      else:
+        s, e = int(s), min(int(e) if e else len(data) - 1, len(data) - 1)
+      self.send_response(206)
+      self.send_header('Content-Range', 'bytes %d-%d/%d' % (s, e, len(data)))
+      body = memoryview(data)[s:e + 1]
+    else:
+      self.send_response(200)
+      body = memoryview(data)
+    self.send_header('Content-Length', str(len(body)))
+    self.send_header('Connection', 'close')
+    self.end_headers()
+    sent = 0
+    try:
+      for i in range(0, len(body), 16384):
+        self.wfile.write(body[i:i + 16384])
+        sent += len(body[i:i + 16384])
+    except:
+      pass
+    with self.server.Lock:
+      self.server.Requests += 1
+      self.server.Sent += sent
+
+
+def current_rss():
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except:
+    return None
+
+
+def fetch(url):
+  try:
+    rep = urllib.request.urlopen(url)
+  except:
+    return None, 0
+  length = 0
+  with rep:
+    while True:
+      chunk = rep.read(262144)
+      if not chunk:
+        break
+      length += len(chunk)
+  return rep.status, length
+
+
+def run(nb_images, icc, app13, scan, reject_range):
+  random.seed(0)
+  params = [(random.choice((1, 3, 6, 8)), random.randint(640, 6000), random.randint(480, 4000), random.choice((True, False)), random.choice((True, False))) for i in range(nb_images)]
+  corpus = [make_jpeg(o, w, h, icc, app13, scan, ef, be) for (o, w, h, ef, be) in params]
+  server = CorpusServer(corpus, reject_range)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = 'http://127.0.0.1:%d/%%d.jpg' % server.server_address[1]
+  print('images: %d - size: %.1f kB - APP segments: %.1f kB%s' % (nb_images, sum(map(len, corpus)) / nb_images / 1024, (icc * 65020 + (app13 + 18 if app13 else 0)) / 1024, ' - ranges rejected' if reject_range else ''))
+  names = {1: 'upper-left', 3: 'lower-right', 6: 'upper-right', 8: 'lower-left'}
+  for name, probe in (('legacy', lambda u: (legacy_jpeg_exif_orientation(u), None, None)), ('ranged', _jpeg_probe), ('in memory', None)):
+    server.Sent = server.Requests = 0
+    errors = 0
+    t = time.perf_counter()
+    for i, (o, w, h, ef, be) in enumerate(params):
+      if probe is None:
+        r = _jpeg_probe(corpus[i])
+      else:
+        r = probe(url % i)
+      if r[0] != names[o] or r[1] not in (w, None) or r[2] not in (h, None) or (name != 'legacy' and r[1:] != (w, h)):
+        errors += 1
+    t = time.perf_counter() - t
+    time.sleep(0.2)
+    print('%s: %.2f ms per image - requests: %d - sent: %.1f kB per image - errors: %d' % (name, t * 1000 / nb_images, server.Requests, server.Sent / nb_images / 1024, errors))
+  server.shutdown()
+  server.server_close()
+
+
+def slideshow(nb_images, icc, app13, scan, loops, command, cache, cache_disk, prefetch, spill, dwell, delay, port, verbosity):
+  random.seed(0)
+  corpus = [make_jpeg(random.choice((3, 6, 8)), 4000, 3000, icc, app13, scan, True, True) for i in range(nb_images)]
+  server = CorpusServer(corpus, False, delay)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = 'http://127.0.0.1:%d/%%d.jpg' % server.server_address[1]
+  renderer = DLNARenderer('127.0.0.1', port, JpegRotate='j', verbosity=verbosity, Player=SimulatedPlayer, RotateCommand=command, RotateCacheSize=cache, RotateCacheDiskSize=cache_disk, Prefetch=prefetch, RotateSpillSize=spill)
+  renderer.PlayerInstance.start()
+  renderer.PlayerInstance.Player_event_event.wait()
+  renderer.start_events_management()
+  renderer.start_request_management()
+  time.sleep(0.2)
+  body = '<?xml version="1.0"?><s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body><u:SetAVTransportURI xmlns:u="urn:schemas-upnp-org:service:AVTransport:1"><InstanceID>0</InstanceID><CurrentURI>%s</CurrentURI><CurrentURIMetaData>%s</CurrentURIMetaData></u:SetAVTransportURI></s:Body></s:Envelope>'
+  didl = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/"><item><dc:title>%d</dc:title><upnp:class>object.item.imageItem.photo</upnp:class><res protocolInfo="http-get:*:image/jpeg:*">%s</res></item></DIDL-Lite>'
+  print('images: %d - size: %.1f kB - loops: %d - memory cache: %d MB - disk cache: %d MB - prefetch: %d - spill: %d MB - dwell: %.2f s - server delay: %.0f ms - command: %s' % (nb_images, sum(map(len, corpus)) / nb_images / 1024, loops, cache, cache_disk, prefetch, spill, dwell, delay * 1000, command))
+  failures = 0
+  rss = [current_rss()] * 2
+  def monitor():
+    while rss[0] is not None and not server.Stop:
+      rss[1] = max(rss[1], current_rss() or 0)
+      time.sleep(0.002)
+  server.Stop = False
+  threading.Thread(target=monitor, daemon=True).start()
+  for l in range(loops):
+    server.Sent = server.Requests = 0
+    transitions = []
+    actions = []
+    for i in range(nb_images):
+      t = time.perf_counter()
+      resp = HTTPRequest('http://127.0.0.1:%d/AVT_C' % port, method='POST', headers={'Content-Type': 'text/xml; charset="utf-8"', 'SOAPACTION': '"urn:schemas-upnp-org:service:AVTransport:1#SetAVTransportURI"'}, data=(body % (url % i, html.escape(didl % (i, url % i)))).encode('utf-8'))
+      actions.append(time.perf_counter() - t)
+      status, length = fetch(('http://127.0.0.1:%d/rotated-%d.jpg' % (port, i)) if renderer.rot_image else (url % i))
+      transitions.append(time.perf_counter() - t)
+      if resp.code != '200' or status != 200 or not renderer.rot_image:
+        failures += 1
+      time.sleep(dwell)
+    transitions.sort()
+    print('loop %d: transition: %.1f ms mean - %.1f ms p90 - action: %.1f ms mean - sent by the server: %.1f kB per image' % (l + 1, sum(transitions) * 1000 / nb_images, transitions[int(0.9 * (nb_images - 1))] * 1000, sum(actions) * 1000 / nb_images, server.Sent / nb_images / 1024))
+  server.Stop = True
+  if rss[0] is not None:
+    print('peak rss above the corpus: %.1f MB' % ((rss[1] - rss[0]) / 1048576))
+  c = renderer.RotatedImages
+  print('rotation cache hits: %d (memory) + %d (disk) - misses: %d - hit rate: %.0f%% - time saved: %.1f ms per hit - failures: %d' % (c.Hits, c.Disk_hits, c.Misses, c.hit_rate() * 100, c.Saved * 1000 / max(c.Hits + c.Disk_hits, 1), failures))
+  if renderer.ImagePrefetcher:
+    p = renderer.ImagePrefetcher
+    print('prefetch hits: %d - misses: %d - fetched: %d - failed: %d' % (p.Hits, p.Misses, p.Fetched, p.Failed))
+    p.close()
+  renderer.stop_request_management()
+  renderer.stop_events_management()
+  renderer.PlayerInstance.stop()
+  renderer.RotatedImages.close()
+  renderer.RotateExecutor.shutdown()
+  server.shutdown()
+  server.server_close()
+
+
+def throughput(nb_images, icc, app13, scan, command, pools, delay, verbosity):
+  random.seed(0)
+  corpus = [make_jpeg(random.choice((3, 6, 8)), 4000, 3000, icc, app13, scan, True, True) for i in range(nb_images)]
+  server = CorpusServer(corpus, False, delay)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  url = 'http://127.0.0.1:%d/%%d.jpg' % server.server_address[1]
+  print('images: %d - size: %.1f kB - server delay: %.0f ms - command: %s' % (nb_images, sum(map(len, corpus)) / nb_images / 1024, delay * 1000, command))
+  for pool in pools:
+    renderer = DLNARenderer('127.0.0.1', 0, JpegRotate='j', verbosity=verbosity, Player=SimulatedPlayer, RotateCommand=command, RotateCacheSize=0, RotatePool=pool)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    jobs = [renderer.RotateExecutor.submit(renderer._rotation_job, url % i, (url % i, None, 90)) for i in range(nb_images)]
+    rotated = sum(1 for job in jobs if job.result())
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    print('pool: %d - rotated: %d/%d in %.2f s - throughput: %.1f images/s - renderer cpu: %.1f ms per image' % (pool, rotated, nb_images, elapsed, rotated / elapsed, cpu * 1000 / nb_images))
+    renderer.RotateExecutor.shutdown()
+    renderer.RotatedImages.close()
+  server.shutdown()
+  server.server_close()
+
+
+if __name__ == '__main__':
+
+  formatter = lambda prog: argparse.HelpFormatter(prog, max_help_position=50, width=119)
+  parser = argparse.ArgumentParser(formatter_class=formatter)
+  parser.add_argument('--images', '-n', metavar='NUMBER', help='number of images of the corpus [50 by default]', type=int, default=50)
+  parser.add_argument('--icc', '-i', metavar='NUMBER', help='number of 64 kB APP2 (ICC profile) segments per image [3 by default]', type=int, default=3)
+  parser.add_argument('--app13', '-a', metavar='BYTES', help='size of the APP13 (Photoshop) segment of each image [40000 by default]', type=int, default=40000)
+  parser.add_argument('--scan', '-s', metavar='BYTES', help='size of the entropy coded data of each image [3000000 by default]', type=int, default=3000000)
+  parser.add_argument('--reject_range', '-r', help='make the server ignore the Range header', action='store_true')
+  parser.add_argument('--slideshow', '-S', metavar='LOOPS', help='loop a slideshow of the corpus through SetAVTransportURI with rotation by jpegtrans instead of benchmarking the probe [0 by default]', type=int, default=0)
+  parser.add_argument('--pools', '-W', metavar='SIZES', help='measure instead the throughput of rotation of the corpus by the command for each of the comma separated sizes of the rotation pool [none by default]', default='')
+  parser.add_argument('--command', '-c', metavar='ROTATE_COMMAND', help='command of rotation of the slideshow [cat by default]', default='cat')
+  parser.add_argument('--cache', '-C', metavar='CACHE_SIZE', help='size in MB of the memory cache of rotated images of the slideshow [64 by default]', type=int, default=64)
+  parser.add_argument('--cache_disk', '-D', metavar='CACHE_SIZE', help='size in MB of the disk cache of rotated images of the slideshow [0 by default]', type=int, default=0)
+  parser.add_argument('--prefetch', '-P', metavar='NUMBER', help='number of images prefetched ahead by the renderer during the slideshow [0 by default]', type=int, default=0)
+  parser.add_argument('--spill', '-X', metavar='SPILL_SIZE', help='size in MB beyond which the renderer keeps a rotated image of the slideshow in a temporary file [8 by default, 0 to disable]', type=int, default=8)
+  parser.add_argument('--dwell', '-w', metavar='SECONDS', help='display time of each image of the slideshow [0.5 by default]', type=float, default=0.5)
+  parser.add_argument('--delay', '-l', metavar='SECONDS', help='response delay of the server of the corpus [0 by default]', type=float, default=0)
+  parser.add_argument('--port', '-p', metavar='RENDERER_TCP_PORT', help='TCP port of the renderer of the slideshow [8998 by default]', type=int, default=8998)
+  parser.add_argument('--verbosity', '-v', metavar='VERBOSE', help='level of verbosity of the renderer from 0 to 2 [0 by default]', type=int, choices=[0, 1, 2], default=0)
+  args = parser.parse_args()
+  if args.pools:
+    throughput(args.images, args.icc, args.app13, args.scan, args.command, [int(p) for p in args.pools.split(',')], args.delay, args.verbosity)
+  elif args.slideshow > 0:
+    slideshow(args.images, args.icc, args.app13, args.scan, args.slideshow, args.command, args.cache, args.cache_disk, args.prefetch, args.spill, args.dwell, args.delay, args.port, args.verbosity)
+  else:
+    run(args.images, args.icc, args.app13, args.scan, args.reject_range)
@@ -0,0 +1,282 @@
+# DLNAmpcRenderer proxy benchmark (https://github.com/PCigales/DLNAmpcRenderer)
+# Copyright © 2022 PCigales
+# This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
+
+import threading
+import socket
+import socketserver
+import http.server
+import urllib.request, urllib.parse
+import shutil
+import time
+import os
+import argparse
+from DLNAmpcRenderer import DLNARenderer, SimulatedPlayer, _open_url
+
+
+class MediaServer(socketserver.ThreadingTCPServer):
+
+  allow_reuse_address = True
+  daemon_threads = True
+  block_on_close = False
+
+  def __init__(self, size, rate, pause=0, pause_every=0):
+    self.Size = size
+    self.Rate = rate
+    self.Pause = pause
+    self.PauseEvery = pause_every
+    self.Block = memoryview(os.urandom(65536))
+    self.Closed = []
+    self.Served = 0
+    self.Lock = threading.Lock()
+    super().__init__(('127.0.0.1', 0), MediaHandler)
+    self.URL = 'http://127.0.0.1:%d/media.mkv' % self.server_address[1]
+
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+
+  protocol_version = 'HTTP/1.1'
+
+  def log_message(self, *args):
+    pass
+
+  def do_HEAD(self, body=False):
+    if self.headers.get('Range'):
+      self.send_response(406)
+      self.send_header('Content-Length', '0')
+      self.send_header('Connection', 'close')
+      self.end_headers()
+      return
+    self.send_response(200)
+    self.send_header('Content-Type', 'video/x-matroska')
+    self.send_header('Content-Length', str(self.server.Size))
+    self.send_header('Connection', 'close')
+    self.end_headers()
+    if not body:
+      return
+    if self.server.Pause:
+      self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 65536)
+    sent = 0
+    start = time.monotonic()
+    try:
+      while sent < self.server.Size:
+        block = self.server.Block[:min(len(self.server.Block), self.server.Size - sent)]
+        self.wfile.write(block)
+        sent += len(block)
+        if self.server.Pause and self.server.PauseEvery and sent // self.server.PauseEvery != (sent - len(block)) // self.server.PauseEvery:
+          time.sleep(self.server.Pause)
+          start += self.server.Pause
+        if self.server.Rate:
+          delay = start + sent / self.server.Rate - time.monotonic()
+          if delay > 0:
+            time.sleep(delay)
+    except:
+      with self.server.Lock:
+        self.server.Closed.append(time.monotonic())
+    with self.server.Lock:
+      self.server.Served += sent
+
+  def do_GET(self):
+    self.do_HEAD(True)
+
+
+class LegacyProxy(socketserver.ThreadingTCPServer):
+
+  allow_reuse_address = True
+  daemon_threads = True
+  block_on_close = False
+
+  def __init__(self, uri):
+    self.URI = uri
+    super().__init__(('127.0.0.1', 0), LegacyProxyHandler)
+    self.URL = 'http://127.0.0.1:%d/proxy-media.mkv' % self.server_address[1]
+
+
+class LegacyProxyHandler(socketserver.StreamRequestHandler):
+
+  def handle(self):
+    while self.rfile.readline().strip():
+      pass
+    rep = _open_url(self.server.URI, method='GET')
+    if not rep:
+      return
+    try:
+      self.wfile.write(('HTTP/1.1 %d %s\r\n' % (rep.status, rep.reason) + ''.join('%s: %s\r\n' % (k, v) for (k, v) in rep.getheaders()) + '\r\n').encode('ISO-8859-1'))
+      shutil.copyfileobj(rep, self.wfile, 256 * 1024)
+    except:
+      pass
+    finally:
+      rep.close()
+
+
+def current_rss():
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except:
+    return None
+
+
+def transfer(url, limit=None):
+  start = time.monotonic()
+  rep = urllib.request.urlopen(url)
+  first = None
+  length = 0
+  while limit is None or length < limit:
+    chunk = rep.read1(262144)
+    if not chunk:
+      break
+    if first is None:
+      first = time.monotonic() - start
+    length += len(chunk)
+  closed = time.monotonic()
+  rep.close()
+  return length, first, closed - start, closed
+
+
+def seek(url, offset, length):
+  start = time.monotonic()
+  rep = urllib.request.urlopen(urllib.request.Request(url, headers={'Range': 'bytes=%d-' % offset}))
+  skip = 0 if rep.status == 206 else offset
+  received = 0
+  while received < skip + length:
+    chunk = rep.read1(262144)
+    if not chunk:
+      break
+    received += len(chunk)
+  elapsed = time.monotonic() - start
+  rep.close()
+  return rep.status, elapsed
+
+
+def playback(url, rate, buffer, preroll, limit):
+  url = urllib.parse.urlsplit(url)
+  start = time.monotonic()
+  sock = socket.socket()
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 262144)
+  sock.connect((url.hostname, url.port))
+  sock.sendall(('GET %s HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n\r\n' % (url.path, url.netloc)).encode('ISO-8859-1'))
+  head = b''
+  while b'\r\n\r\n' not in head:
+    chunk = sock.recv(65536)
+    if not chunk:
+      break
+    head += chunk
+  pending = head.partition(b'\r\n\r\n')[2]
+  received = 0
+  stalled = 0
+  rebuffers = 0
+  while received < limit:
+    now = time.monotonic()
+    played = max(now - start - preroll - stalled, 0) * rate
+    if received - played > buffer:
+      time.sleep((received - played - buffer) / rate)
+      continue
+    chunk = pending or sock.recv(65536)
+    pending = b''
+    if not chunk:
+      break
+    received += len(chunk)
+    lateness = time.monotonic() - start - preroll - stalled - (received - len(chunk)) / rate
+    if lateness > 0:
+      stalled += lateness
+      if lateness > 0.05:
+        rebuffers += 1
+  sock.close()
+  return received, rebuffers, stalled
+
+
+def run(size, rate, abort, seeks, pause, pause_every, bitrate, port, verbosity):
+  server = MediaServer(size, rate)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  legacy = LegacyProxy(server.URL)
+  threading.Thread(target=legacy.serve_forever, daemon=True).start()
+  renderer = DLNARenderer('127.0.0.1', port, JpegRotate='n', NoPartReqIntermediate=True, verbosity=verbosity, Player=SimulatedPlayer, ProxyCacheSize=1024)
+  renderer.AVTransportURI = server.URL
+  renderer.proxy_uri = 'http://127.0.0.1:%d/proxy-media.mkv' % port
+  cache = renderer.ProxyCache
+  renderer.ProxyCache = None
+  renderer.start_request_management()
+  time.sleep(0.2)
+  print('media: %.1f MB - server rate: %s - abort after: %.1f MB' % (size / 1048576, ('%.1f MB/s' % (rate / 1048576)) if rate else 'unlimited', abort / 1048576))
+  for label, url in (('copyfileobj of a urllib response', legacy.URL), ('proxy engine', renderer.proxy_uri)):
+    rss = [current_rss()] * 2
+    sampling = [True]
+    def monitor():
+      while rss[0] is not None and sampling[0]:
+        rss[1] = max(rss[1], current_rss() or 0)
+        time.sleep(0.002)
+    monitor_thread = threading.Thread(target=monitor)
+    monitor_thread.start()
+    cpu_start = time.process_time()
+    length, first, elapsed, closed = transfer(url)
+    cpu = time.process_time() - cpu_start
+    sampling[0] = False
+    monitor_thread.join()
+    with server.Lock:
+      server.Closed.clear()
+    a_length, a_first, a_elapsed, a_closed = transfer(url, abort)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and not server.Closed:
+      time.sleep(0.001)
+    print('%s: %.1f MB in %.2f s - throughput: %.1f MB/s - first bytes: %.1f ms - cpu: %.2f s - peak rss: %s' % (label, length / 1048576, elapsed, length / elapsed / 1048576, (first or 0) * 1000, cpu, ('+%.1f MB' % ((rss[1] - rss[0]) / 1048576)) if rss[0] is not None else 'n/a'))
+    print('%s: client disconnect seen by the server after %s' % (label, ('%.0f ms' % ((server.Closed[0] - a_closed) * 1000)) if server.Closed else 'more than 10 s'))
+  p = renderer.MediaProxy
+  print('proxy engine: sent: %.1f MB - aborted transfers: %d - pooled buffers: %d' % (p.Sent / 1048576, p.Aborted, len(p.Pool)))
+  if seeks:
+    print('seeks (fractions of the media, 1 MB read at each position, after 4 MB played from the start): %s' % ', '.join('%g' % s for s in seeks))
+    for label, url, proxy_cache in (('copyfileobj of a urllib response', legacy.URL, None), ('proxy engine', renderer.proxy_uri, None), ('proxy engine with disk cache', renderer.proxy_uri, cache)):
+      renderer.ProxyCache = proxy_cache
+      transfer(url, 4194304)
+      results = []
+      for s in seeks:
+        code, elapsed = seek(url, int(size * s), 1048576)
+        results.append('%.0f ms (%d)' % (elapsed * 1000, code))
+      print('%s: %s' % (label, ' - '.join(results)))
+    print('proxy engine with disk cache: requests served from the cache: %d - waiting for the download: %d - restarts of the download: %d - direct downloads: %d' % (cache.Hits, cache.Waits, cache.Restarts, cache.Directs))
+    cache.close()
+  if pause and bitrate:
+    server.Pause = pause
+    server.PauseEvery = pause_every
+    renderer.CurrentMediaDuration = '%d:%02d:%02d' % (size / bitrate // 3600, (size / bitrate % 3600) // 60, size / bitrate % 60)
+    print('server stalls: %.1f s every %.1f MB - playback of %.1f MB at %.1f MB/s with a 1 MB player buffer, a 256 kB socket buffer and a 1 s preroll' % (pause, pause_every / 1048576, min(size, 50331648) / 1048576, bitrate / 1048576))
+    renderer.ProxyCache = None
+    for label, readahead, readahead_time in (('proxy engine without read-ahead', 0, 0), ('proxy engine with a 16 MB read-ahead', 16777216, 0), ('proxy engine with a 10 s read-ahead', 16777216, 10)):
+      p.ReadAhead = readahead
+      p.ReadAheadTime = readahead_time
+      stalls = p.Stalls
+      peak = [0]
+      sampling = [True]
+      def monitor():
+        while sampling[0]:
+          with p.Lock:
+            peak[0] = max([peak[0]] + [b.fill_level() for b in p.Buffers])
+          time.sleep(0.01)
+      monitor_thread = threading.Thread(target=monitor)
+      monitor_thread.start()
+      length, rebuffers, stalled = playback(renderer.proxy_uri, bitrate, 1048576, 1, min(size, 50331648))
+      sampling[0] = False
+      monitor_thread.join()
+      print('%s: %.1f MB played - rebuffering of the player: %d for %.1f s - server stalls seen by the proxy: %d - peak fill: %.1f MB' % (label, length / 1048576, rebuffers, stalled, p.Stalls - stalls, peak[0] / 1048576))
+  renderer.stop_request_management()
+  legacy.shutdown()
+  legacy.server_close()
+  server.shutdown()
+  server.server_close()
+
+
+if __name__ == '__main__':
+
+  formatter = lambda prog: argparse.HelpFormatter(prog, max_help_position=50, width=119)
+  parser = argparse.ArgumentParser(formatter_class=formatter)
+  parser.add_argument('--size', '-s', metavar='MB', help='size of the media served by the stand-in server [200 by default]', type=float, default=200)
+  parser.add_argument('--rate', '-r', metavar='MB_PER_SECOND', help='throttling rate of the stand-in server [0 by default, unlimited]', type=float, default=0)
+  parser.add_argument('--abort', '-a', metavar='MB', help='amount read by the client before disconnecting in the disconnect test [4 by default]', type=float, default=4)
+  parser.add_argument('--seeks', '-k', metavar='FRACTIONS', help='comma separated positions, as fractions of the media, of the seeks of the seek test, empty to skip it [0.5,0.1,0.8,0.3 by default]', default='0.5,0.1,0.8,0.3')
+  parser.add_argument('--pause', '-P', metavar='SECONDS', help='duration of the stalls injected by the stand-in server in the read-ahead test, 0 to skip it [8 by default]', type=float, default=8)
+  parser.add_argument('--pause_every', '-e', metavar='MB', help='amount served by the stand-in server between two stalls [16 by default]', type=float, default=16)
+  parser.add_argument('--bitrate', '-b', metavar='MB_PER_SECOND', help='playback rate of the simulated player in the read-ahead test [1 by default]', type=float, default=1)
+  parser.add_argument('--port', '-p', metavar='RENDERER_TCP_PORT', help='TCP port of the renderer [8997 by default]', type=int, default=8997)
+  parser.add_argument('--verbosity', '-v', metavar='VERBOSE', help='level of verbosity of the renderer from 0 to 2 [0 by default]', type=int, choices=[0, 1, 2], default=0)
+  args = parser.parse_args()
+  run(int(args.size * 1048576), args.rate * 1048576, int(args.abort * 1048576), [float(s) for s in args.seeks.split(',') if s.strip()], args.pause, int(args.pause_every * 1048576), args.bitrate * 1048576, args.port, args.verbosity)
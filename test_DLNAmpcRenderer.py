@@ -0,0 +1,552 @@
+# DLNAmpcRenderer unit tests (https://github.com/PCigales/DLNAmpcRenderer)
+# Copyright © 2022 PCigales
+# This program is licensed under the GNU GPLv3 copyleft license (see https://www.gnu.org/licenses)
+
+import unittest
+import tempfile
+import socket
+import threading
+import http.server
+import time
+import html
+from functools import partial
+from DLNAmpcRenderer import RotatedImageCache, SpilledImage, ImagePrefetcher, MediaProxy, ProxySegmentCache, DLNARenderer, SimulatedPlayer, HTTPRequest, PlayerCommandQueue, PlaybackClock, HousekeepingScheduler
+
+
+def spilled(data):
+  f = tempfile.TemporaryFile(prefix='DLNAmpcRenderer_')
+  f.write(data)
+  f.flush()
+  return SpilledImage(f, len(data))
+
+def received(image):
+  a, b = socket.socketpair()
+  try:
+    image.send(a)
+    a.close()
+    data = b''
+    while True:
+      chunk = b.recv(65536)
+      if not chunk:
+        return data
+      data += chunk
+  finally:
+    a.close()
+    b.close()
+
+
+class RotatedImageCacheTest(unittest.TestCase):
+
+  def test_key_size_is_normalized(self):
+    self.assertEqual(RotatedImageCache.key('u', '2000', 90), ('u', 2000, 90))
+    self.assertEqual(RotatedImageCache.key('u', 2000, 90), ('u', 2000, 90))
+    self.assertEqual(RotatedImageCache.key('u', None, 90), ('u', None, 90))
+    self.assertEqual(RotatedImageCache.key('u', '', 90), ('u', None, 90))
+    cache = RotatedImageCache()
+    cache.put(RotatedImageCache.key('u', '2000', 90), b'a' * 2000, 0.5)
+    self.assertEqual(cache.get(RotatedImageCache.key('u', 2000, 90))[0], b'a' * 2000)
+
+  def test_spilled_image_survives_eviction(self):
+    cache = RotatedImageCache(budget=1000, disk_budget=2500)
+    a = spilled(b'a' * 2000)
+    cache.put('a', a, 0.5)
+    got = cache.get('a')[0]
+    cache.put('b', spilled(b'b' * 2000), 0.5)
+    self.assertNotIn('a', cache.Disk)
+    self.assertEqual(cache.Disk_size, 2000)
+    self.assertEqual(received(a), b'a' * 2000)
+    self.assertEqual(received(got), b'a' * 2000)
+    self.assertEqual(got.read(), b'a' * 2000)
+    cache.close()
+
+  def test_spilled_image_survives_replacement_and_close(self):
+    cache = RotatedImageCache(budget=1000, disk_budget=2500)
+    a = spilled(b'a' * 2000)
+    cache.put('k', a, 0.5)
+    got = cache.get('k')[0]
+    cache.put('k', spilled(b'c' * 1500), 0.5)
+    self.assertEqual(received(got), b'a' * 2000)
+    cache.close()
+    self.assertEqual(received(a), b'a' * 2000)
+    self.assertEqual(cache.Disk_size, 0)
+
+  def test_spilled_image_over_disk_budget(self):
+    cache = RotatedImageCache(budget=1000, disk_budget=0)
+    a = spilled(b'a' * 2000)
+    cache.put('a', a, 0.5)
+    self.assertIsNone(cache.get('a'))
+    self.assertEqual(cache.Size, 0)
+    self.assertEqual(received(a), b'a' * 2000)
+
+
+class ImageServer(http.server.ThreadingHTTPServer):
+
+  daemon_threads = True
+
+  def __init__(self, delay=0):
+    self.Delay = delay
+    self.Served = []
+    http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), ImageHandler)
+    self.URL = 'http://127.0.0.1:%d/' % self.server_address[1]
+    threading.Thread(target=self.serve_forever, daemon=True).start()
+
+  @staticmethod
+  def image(path):
+    return b'\xff\xd8' + path.encode('utf-8') * 100 + b'\xff\xd9'
+
+  def stop(self):
+    self.shutdown()
+    self.server_close()
+
+
+class ImageHandler(http.server.BaseHTTPRequestHandler):
+
+  def log_message(self, *args):
+    pass
+
+  def do_HEAD(self, body=False):
+    time.sleep(self.server.Delay)
+    data = ImageServer.image(self.path)
+    self.send_response(200)
+    self.send_header('Content-Type', 'image/jpeg')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    if body:
+      self.server.Served.append(self.path)
+      self.wfile.write(data)
+
+  def do_GET(self):
+    self.do_HEAD(True)
+
+
+class FakeRenderer:
+
+  JpegRotate = 'n'
+
+
+class ImagePrefetcherTest(unittest.TestCase):
+
+  def setUp(self):
+    self.server = ImageServer(0.2)
+    self.prefetcher = ImagePrefetcher(FakeRenderer())
+
+  def tearDown(self):
+    self.prefetcher.close()
+    self.server.stop()
+
+  def test_take_waits_for_queued_added_images(self):
+    self.prefetcher.add(self.server.URL + 'x.jpg')
+    time.sleep(0.05)
+    self.prefetcher.add(self.server.URL + 'a.jpg')
+    self.prefetcher.add(self.server.URL + 'b.jpg')
+    self.assertEqual(self.prefetcher.take(self.server.URL + 'a.jpg'), (ImageServer.image('/a.jpg'), 0))
+    self.assertEqual(self.prefetcher.take(self.server.URL + 'b.jpg'), (ImageServer.image('/b.jpg'), 0))
+    self.assertEqual(self.prefetcher.Hits, 2)
+    self.assertEqual(sorted(self.server.Served), ['/a.jpg', '/b.jpg', '/x.jpg'])
+
+  def test_take_of_image_not_added(self):
+    self.assertIsNone(self.prefetcher.take(self.server.URL + 'c.jpg'))
+    self.assertEqual(self.server.Served, [])
+
+
+class MediaServer(http.server.ThreadingHTTPServer):
+
+  daemon_threads = True
+
+  def __init__(self, size):
+    self.Media = (bytes(range(251)) * (size // 251 + 1))[:size]
+    self.Gets = 0
+    http.server.ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), MediaHandler)
+    self.URL = 'http://127.0.0.1:%d/media.mkv' % self.server_address[1]
+    threading.Thread(target=self.serve_forever, daemon=True).start()
+
+  def stop(self):
+    self.shutdown()
+    self.server_close()
+
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+
+  def log_message(self, *args):
+    pass
+
+  def do_GET(self):
+    self.server.Gets += 1
+    self.send_response(200)
+    self.send_header('Content-Type', 'video/x-matroska')
+    self.send_header('Content-Length', str(len(self.server.Media)))
+    self.end_headers()
+    try:
+      self.wfile.write(self.server.Media)
+    except:
+      pass
+
+
+class FakeRequest:
+
+  method = 'GET'
+
+  def __init__(self, range=None):
+    self.Range = range
+
+  def header(self, name, default=None):
+    return self.Range if name == 'Range' else default
+
+
+class ProxySegmentCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.server = MediaServer(4194304)
+    self.cache = ProxySegmentCache(MediaProxy(readahead=0), cap=262144)
+
+  def tearDown(self):
+    self.cache.close()
+    self.server.stop()
+
+  def reader(self, range=None):
+    a, b = socket.socketpair()
+    def serve():
+      try:
+        self.cache.serve(self.server.URL, FakeRequest(range), a)
+      finally:
+        a.close()
+    threading.Thread(target=serve, daemon=True).start()
+    return b
+
+  @staticmethod
+  def body(sock, length=None):
+    data = b''
+    while b'\r\n\r\n' not in data:
+      data += sock.recv(65536)
+    data = data.partition(b'\r\n\r\n')[2]
+    while length is None or len(data) < length:
+      chunk = sock.recv(65536)
+      if not chunk:
+        break
+      data += chunk
+    return data
+
+  def entry(self, condition):
+    end_time = time.monotonic() + 10
+    while time.monotonic() < end_time:
+      entry = self.cache.Entries.get(self.server.URL)
+      if entry and condition(entry):
+        return entry
+      time.sleep(0.01)
+    self.fail()
+
+  def test_rewind_of_one_reader_keeps_the_shared_window(self):
+    first = self.reader()
+    data = self.body(first, 65536)
+    entry = self.entry(lambda e: e.Readers)
+    while not entry.Low:
+      data += first.recv(65536)
+    low = entry.Low
+    second = self.reader('bytes=0-999')
+    self.assertEqual(self.body(second), self.server.Media[:1000])
+    second.close()
+    self.assertEqual((self.cache.Directs, self.cache.Restarts), (1, 0))
+    self.assertGreaterEqual(entry.Low, low)
+    while True:
+      chunk = first.recv(65536)
+      if not chunk:
+        break
+      data += chunk
+    first.close()
+    self.assertEqual(data, self.server.Media)
+    self.assertEqual(self.server.Gets, 2)
+
+  def test_rewind_of_single_reader_restarts_the_download(self):
+    first = self.reader('bytes=3145728-')
+    self.assertEqual(self.body(first), self.server.Media[3145728:])
+    first.close()
+    self.entry(lambda e: not e.Readers and e.Low > 0)
+    second = self.reader('bytes=0-999')
+    self.assertEqual(self.body(second), self.server.Media[:1000])
+    second.close()
+    self.assertEqual((self.cache.Directs, self.cache.Restarts), (0, 1))
+
+
+class PlayerCommandQueueTest(unittest.TestCase):
+
+  def setUp(self):
+    self.queue = PlayerCommandQueue()
+
+  def test_same_command_is_coalesced(self):
+    self.queue.put(0xA0002000, '10')
+    self.queue.put(0xA0002000, '20')
+    self.queue.put('volume', 30)
+    self.queue.put('volume', 40)
+    self.assertEqual(self.queue.get_all(0), [(0xA0002000, '20'), ('volume', 40)])
+    self.assertEqual(self.queue.Coalesced, 2)
+
+  def test_same_kind_keeps_last_command(self):
+    self.queue.put(0xA0000004, '')
+    self.queue.put(0xA0002000, '10')
+    self.queue.put(0xA0000005, '')
+    self.assertEqual(self.queue.get_all(0), [(0xA0002000, '10'), (0xA0000005, '')])
+
+  def test_different_commands_keep_their_order(self):
+    cmds = [(0xA0000000, 'uri'), (0xA0000004, ''), (0xA0002000, '10'), ('volume', 50), (0xA0000002, '')]
+    for cmd in cmds:
+      self.queue.put(*cmd)
+    self.assertEqual(self.queue.get_all(0), cmds)
+    self.assertEqual(self.queue.Coalesced, 0)
+
+  def test_barrier_stops_coalescing(self):
+    cmds = [(0xA0002000, '10'), (0xA0000000, 'uri'), (0xA0002000, '20')]
+    for cmd in cmds:
+      self.queue.put(*cmd)
+    self.assertEqual(self.queue.get_all(0), cmds)
+
+  def test_no_coalescing(self):
+    queue = PlayerCommandQueue(coalesce=False)
+    queue.put(0xA0002000, '10')
+    queue.put(0xA0002000, '20')
+    self.assertEqual(queue.get_all(0), [(0xA0002000, '10'), (0xA0002000, '20')])
+
+  def test_close_drains(self):
+    self.queue.put(0xA0000004, '')
+    self.queue.put(0xA0002000, '10')
+    self.queue.close()
+    self.assertFalse(self.queue.put(0xA0000002, ''))
+    start = time.monotonic()
+    self.assertEqual(self.queue.get_all(), [(0xA0000004, ''), (0xA0002000, '10')])
+    self.assertEqual(self.queue.get_all(), [])
+    self.assertLess(time.monotonic() - start, PlayerCommandQueue.SettleDelay)
+
+  def test_close_wakes_waiting_consumer(self):
+    items = []
+    consumer = threading.Thread(target=lambda: items.append(self.queue.get_all()))
+    consumer.start()
+    time.sleep(0.05)
+    self.queue.close()
+    consumer.join(1)
+    self.assertFalse(consumer.is_alive())
+    self.assertEqual(items, [[]])
+
+
+class FakeClock:
+
+  def __init__(self):
+    self.Now = 1000.0
+
+  def __call__(self):
+    return self.Now
+
+  def advance(self, delay):
+    self.Now += delay
+
+
+class PlaybackClockTest(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.pclock = PlaybackClock(self.clock)
+
+  def test_unknown_position(self):
+    self.assertIsNone(self.pclock.position())
+    self.pclock.set_running(True)
+    self.clock.advance(5)
+    self.assertIsNone(self.pclock.position())
+
+  def test_extrapolation_while_playing(self):
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.clock.advance(2.5)
+    self.assertEqual(self.pclock.position(), 12.5)
+    self.clock.advance(2.5)
+    self.assertEqual(self.pclock.position(), 15)
+
+  def test_extrapolation_stops_at_duration(self):
+    self.pclock.Duration = 12
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.clock.advance(5)
+    self.assertEqual(self.pclock.position(), 12)
+
+  def test_freeze_on_pause(self):
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.clock.advance(3)
+    self.pclock.set_running(False)
+    self.clock.advance(20)
+    self.assertEqual(self.pclock.position(), 13)
+    self.assertFalse(self.pclock.request_resync())
+    self.pclock.sync(13)
+    self.clock.advance(PlaybackClock.DriftInterval)
+    self.assertFalse(self.pclock.resync_due())
+    self.pclock.set_running(True)
+    self.clock.advance(1)
+    self.assertEqual(self.pclock.position(), 14)
+
+  def test_drift(self):
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.clock.advance(4)
+    self.pclock.sync(13.5)
+    self.assertEqual(self.pclock.Drift, -0.5)
+
+  def test_resync_threshold(self):
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.pclock.sync(10)
+    self.assertFalse(self.pclock.resync_due())
+    self.clock.advance(PlaybackClock.MinResyncInterval / 2)
+    self.assertFalse(self.pclock.request_resync())
+    self.clock.advance(PlaybackClock.MinResyncInterval / 2)
+    self.assertFalse(self.pclock.resync_due())
+    self.clock.advance(PlaybackClock.DriftInterval - PlaybackClock.MinResyncInterval - 0.1)
+    self.assertFalse(self.pclock.resync_due())
+    self.clock.advance(0.1)
+    self.assertTrue(self.pclock.resync_due())
+
+  def test_requested_resync_is_due(self):
+    self.pclock.sync(10)
+    self.clock.advance(PlaybackClock.MinResyncInterval)
+    self.assertTrue(self.pclock.request_resync())
+    self.assertTrue(self.pclock.resync_due())
+    self.assertFalse(self.pclock.request_resync())
+    self.pclock.sync(11)
+    self.assertFalse(self.pclock.resync_due())
+
+  def test_one_request_per_resync(self):
+    self.pclock.sync(10)
+    self.pclock.set_running(True)
+    self.assertTrue(self.pclock.resync_due())
+    self.pclock.request_sent()
+    self.clock.advance(0.5)
+    self.assertFalse(self.pclock.resync_due())
+    self.assertFalse(self.pclock.request_resync())
+    self.clock.advance(0.2)
+    self.pclock.sync(10.7)
+    self.assertFalse(self.pclock.resync_due())
+    self.clock.advance(PlaybackClock.MinResyncInterval)
+    self.assertTrue(self.pclock.request_resync())
+    self.assertTrue(self.pclock.resync_due())
+
+  def test_lost_request_is_sent_again(self):
+    self.pclock.sync(0)
+    self.pclock.set_running(True)
+    self.pclock.request_sent()
+    self.assertFalse(self.pclock.resync_due())
+    self.clock.advance(PlaybackClock.MinResyncInterval)
+    self.assertTrue(self.pclock.resync_due())
+
+
+class HousekeepingSchedulerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    self.scheduler = HousekeepingScheduler(self.clock)
+    self.runs = []
+    self.active = False
+    self.scheduler.add('task', self.task, 0.5, 4)
+
+  def task(self):
+    self.runs.append(self.clock())
+    return self.active
+
+  def test_backoff_to_max_interval(self):
+    delays = []
+    for i in range(6):
+      delays.append(self.scheduler.run_due())
+      self.clock.advance(delays[-1])
+    self.assertEqual(delays, [1, 2, 4, 4, 4, 4])
+    self.assertEqual(len(self.runs), 6)
+
+  def test_active_task_stays_at_min_interval(self):
+    self.active = True
+    for i in range(3):
+      self.assertEqual(self.scheduler.run_due(), 0.5)
+      self.clock.advance(0.5)
+    self.assertEqual(len(self.runs), 3)
+
+  def test_not_due_task_does_not_run(self):
+    self.scheduler.run_due()
+    self.clock.advance(0.2)
+    self.assertAlmostEqual(self.scheduler.run_due(), 0.8)
+    self.assertEqual(len(self.runs), 1)
+
+  def test_kick_resets_interval(self):
+    for i in range(3):
+      self.clock.advance(self.scheduler.run_due())
+    self.assertEqual(self.scheduler.run_due(), 4)
+    self.clock.advance(1)
+    self.scheduler.kick('task')
+    self.assertEqual(self.scheduler.next_delay(), 0)
+    self.assertEqual(self.scheduler.run_due(), 1)
+    self.assertEqual(len(self.runs), 5)
+
+  def test_pause_and_resume(self):
+    for i in range(3):
+      self.clock.advance(self.scheduler.run_due())
+    self.scheduler.pause('task')
+    self.assertIsNone(self.scheduler.next_delay())
+    self.clock.advance(100)
+    self.assertIsNone(self.scheduler.run_due())
+    self.assertEqual(len(self.runs), 3)
+    self.scheduler.pause('task', False)
+    self.assertEqual(self.scheduler.next_delay(), 0)
+    self.assertEqual(self.scheduler.run_due(), 1)
+    self.assertEqual(len(self.runs), 4)
+
+  def test_pause_of_paused_task_keeps_schedule(self):
+    self.scheduler.run_due()
+    self.scheduler.pause('task', False)
+    self.assertEqual(self.scheduler.next_delay(), 1)
+
+  def test_failing_task_backs_off(self):
+    self.scheduler.add('failing', lambda: 1 / 0, 0.5, 4)
+    self.scheduler.pause('task')
+    self.assertEqual(self.scheduler.run_due(), 1)
+    self.clock.advance(1)
+    self.assertEqual(self.scheduler.run_due(), 2)
+
+
+SoapAction = '<?xml version="1.0"?><s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" s:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body><u:%s xmlns:u="urn:schemas-upnp-org:service:AVTransport:1"><InstanceID>0</InstanceID>%s</u:%s></s:Body></s:Envelope>'
+ImageMetaData = '<DIDL-Lite xmlns="urn:schemas-upnp-org:metadata-1-0/DIDL-Lite/" xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:upnp="urn:schemas-upnp-org:metadata-1-0/upnp/"><item><dc:title>%s</dc:title><upnp:class>object.item.imageItem.photo</upnp:class><res protocolInfo="http-get:*:image/jpeg:*">%s</res></item></DIDL-Lite>'
+
+def avtransport(port, action, **args):
+  return HTTPRequest('http://127.0.0.1:%d/AVT_C' % port, method='POST', headers={'Content-Type': 'text/xml; charset="utf-8"', 'SOAPACTION': '"urn:schemas-upnp-org:service:AVTransport:1#%s"' % action}, data=(SoapAction % (action, ''.join('<%s>%s</%s>' % (k, html.escape(str(v)), k) for k, v in args.items()), action)).encode('utf-8')).code
+
+
+class NextImageTest(unittest.TestCase):
+
+  Port = 18997
+
+  def setUp(self):
+    self.server = ImageServer()
+    self.renderer = DLNARenderer('127.0.0.1', NextImageTest.Port, JpegRotate='n', Prefetch=2, Player=partial(SimulatedPlayer, media_duration=60))
+    self.renderer.PlayerInstance.start()
+    self.renderer.PlayerInstance.Player_event_event.wait()
+    self.renderer.start_events_management()
+    self.renderer.start_request_management()
+    end_time = time.monotonic() + 5
+    while not hasattr(self.renderer, 'DLNARequestManager') and self.renderer.is_request_manager_running and time.monotonic() < end_time:
+      time.sleep(0.01)
+
+  def tearDown(self):
+    self.renderer.stop_request_management()
+    self.renderer.stop_events_management()
+    self.renderer.ImagePrefetcher.close()
+    self.renderer.PlayerInstance.stop()
+    self.renderer.PlayerInstance.join()
+    self.renderer.RotatedImages.close()
+    self.server.stop()
+
+  def test_next_image_is_prefetched(self):
+    current, following = self.server.URL + 'holidays.jpg', self.server.URL + 'zz-portrait.jpg'
+    self.assertEqual(avtransport(NextImageTest.Port, 'SetAVTransportURI', CurrentURI=current, CurrentURIMetaData=ImageMetaData % ('current', current)), '200')
+    self.assertEqual(avtransport(NextImageTest.Port, 'SetNextAVTransportURI', NextURI=following, NextURIMetaData=ImageMetaData % ('next', following)), '200')
+    end_time = time.monotonic() + 10
+    while not self.renderer.NextItem and time.monotonic() < end_time:
+      time.sleep(0.05)
+    self.assertTrue(self.renderer.NextItem)
+    self.assertEqual(self.renderer.NextItem.RotImage, ImageServer.image('/zz-portrait.jpg'))
+    self.assertEqual(self.renderer.ImagePrefetcher.Hits, 1)
+    self.assertEqual(self.server.Served, ['/zz-portrait.jpg'])
+
+
+if __name__ == '__main__':
+  unittest.main()